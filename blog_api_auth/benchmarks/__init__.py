@@ -0,0 +1,13 @@
+"""Benchmarks for the blog API.
+
+Every module is runnable on its own from the project root, against a
+throwaway test database, eg:
+
+    python -m benchmarks.auth
+
+benchmarks.load is the end to end suite, whose JSON results can be compared
+between commits:
+
+    python -m benchmarks.load --output before.json
+    python -m benchmarks.load --compare before.json
+"""
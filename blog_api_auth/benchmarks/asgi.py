@@ -0,0 +1,142 @@
+"""Throughput and latency of 500 concurrent readers of /api/entries pages,
+through the WSGI application on one thread per reader (a threaded WSGI
+server) and through blog_api_auth/asgi.py, which serves them all from an
+event loop plus ASGI_THREADS threads. Also reports the threads the
+process peaked at.
+
+Both run in this process without a network server, so only the cost of
+dispatching the requests is compared. The response cache is off unless
+--response-cache is given.
+
+    python -m benchmarks.asgi [--readers 500] [--requests 10]
+"""
+from __future__ import print_function
+
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.utils import setup, seed_entries, create_user
+
+
+class ThreadCounter(object):
+    """Samples threading.active_count() until stopped, keeps the peak"""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.sample)
+        self.thread.start()
+
+    def sample(self):
+        while not self.stopped.wait(0.01):
+            self.peak = max(self.peak, threading.active_count())
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self.peak
+
+
+def get_scope(user, page):
+    query = 'accesskey={}&limit=10&offset={}'.format(
+        user.accesskey, page * 10)
+    return {
+        'type': 'http', 'method': 'GET', 'path': '/api/entries',
+        'query_string': query.encode('ascii'), 'scheme': 'http',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+        'headers': [(b'host', b'testserver')],
+    }
+
+
+def run_wsgi(handler, user, readers, count):
+    def read(reader):
+        latencies = []
+        for i in range(count):
+            environ = handler.get_environ(
+                get_scope(user, (reader + i) % 100), b'')
+            start = time.time()
+            response = handler.application(
+                environ, lambda status, headers, exc_info=None: None)
+            b''.join(response)
+            response.close()
+            assert response.status_code == 200, response.status_code
+            latencies.append(time.time() - start)
+        return latencies
+
+    with ThreadPoolExecutor(readers) as executor:
+        return sum(executor.map(read, range(readers)), [])
+
+
+def run_asgi(handler, user, readers, count):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def read(reader):
+        latencies = []
+        for i in range(count):
+            messages = []
+            incoming = asyncio.Queue()
+            incoming.put_nowait({'type': 'http.request'})
+
+            async def send(message):
+                messages.append(message)
+
+            start = time.time()
+            await handler(get_scope(user, (reader + i) % 100),
+                          incoming.get, send)
+            assert messages[0]['status'] == 200, messages
+            latencies.append(time.time() - start)
+        return latencies
+
+    try:
+        results = loop.run_until_complete(asyncio.gather(
+            *[read(reader) for reader in range(readers)]))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    return sum(results, [])
+
+
+def run(readers, count, response_cache=False):
+    from django.core.wsgi import get_wsgi_application
+
+    from blog import mixins
+    from blog.asgi import ASGIHandler
+    from benchmarks.load import percentile
+
+    if not response_cache:
+        mixins.response_cache = None
+    seed_entries(1000)
+    user = create_user()
+    handler = ASGIHandler(get_wsgi_application())
+
+    print('{:<8}{:>14}{:>12}{:>12}{:>10}'.format(
+        'server', 'requests/sec', 'p50 ms', 'p99 ms', 'threads'))
+    for name, func in (('wsgi', run_wsgi), ('asgi', run_asgi)):
+        counter = ThreadCounter()
+        start = time.time()
+        latencies = sorted(func(handler, user, readers, count))
+        elapsed = time.time() - start
+        threads = counter.stop()
+        print('{:<8}{:>14.1f}{:>12.2f}{:>12.2f}{:>10}'.format(
+            name, len(latencies) / elapsed,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000, threads))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=10,
+                        help='requests per reader')
+    parser.add_argument('--response-cache', action='store_true')
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.readers, args.requests, args.response_cache)
+    finally:
+        teardown()
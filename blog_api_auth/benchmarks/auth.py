@@ -0,0 +1,90 @@
+"""Queries per unsafe request, sequential AK then SK authentication classes
+vs the combined UserAccesskeySecretkeyAuthentication.
+
+    python -m benchmarks.auth
+"""
+from __future__ import print_function
+
+from benchmarks.utils import setup, capture_queries, timeit
+
+
+def run():
+    from rest_framework.test import APIClient
+
+    from blog import authentication
+    from blog.models import User, Blog, Entry
+    from blog.views import UserViewSet, BlogViewSet, EntryViewSet
+
+    configs = (
+        ('sequential', (authentication.UserAccesskeyAuthentication,
+                        authentication.UserSecretkeyAuthentication)),
+        ('combined', (authentication.UserAccesskeySecretkeyAuthentication,)),
+    )
+
+    user = User.objects.create_user(
+        username='larrypage', password='abc123', accesskey='a' * 32,
+        secretkey='b' * 32)
+    blog = Blog.objects.create(name='Blog', tagline='Some tagline')
+    client = APIClient()
+    client.credentials(HTTP_X_SECRET_KEY=user.secretkey)
+    qs = '?accesskey={}'.format(user.accesskey)
+
+    def new_entry():
+        entry = Entry.objects.create(
+            blog=blog, headline='Some headline', body_text='Some body text',
+            number_comments=0, scoring=1)
+        entry.users.add(user)
+        return entry
+
+    payload = {
+        'blog': 'http://testserver/api/blogs/{}'.format(blog.id),
+        'users': ['http://testserver/api/users/{}'.format(user.id)],
+        'headline': 'New entry',
+        'body_text': 'Some body text',
+        'number_comments': 15,
+        'scoring': 4.25
+    }
+    # (method, url factory run outside the measurement, request)
+    requests = (
+        ('POST', lambda: '/api/entries' + qs,
+         lambda url: client.post(url, payload, format='json')),
+        ('PATCH', lambda: '/api/entries/{}{}'.format(new_entry().id, qs),
+         lambda url: client.patch(url, {'headline': 'New'}, format='json')),
+        ('DELETE', lambda: '/api/entries/{}{}'.format(new_entry().id, qs),
+         lambda url: client.delete(url)),
+    )
+
+    print('{:<12}{:<8}{:>14}{:>14}{:>12}'.format(
+        'auth', 'method', 'auth queries', 'total queries', 'ms/request'))
+    for name, classes in configs:
+        for viewset in (UserViewSet, BlogViewSet, EntryViewSet):
+            viewset.authentication_classes = classes
+
+        for method, make_url, request in requests:
+            url = make_url()
+            authentication.user_cache.clear()
+            with capture_queries() as queries:
+                response = request(url)
+            assert response.status_code < 300, response.content
+            auth_queries = [q for q in queries
+                            if 'FROM "blog_user"' in q['sql'] and
+                            '"accesskey" =' in q['sql']]
+
+            urls = [make_url() for _ in range(50)]
+
+            def cold_request():
+                authentication.user_cache.clear()
+                request(urls.pop())
+
+            elapsed = timeit(cold_request, repeat=50)
+            print('{:<12}{:<8}{:>14}{:>14}{:>12.2f}'.format(
+                name, method, len(auth_queries), len(queries),
+                elapsed * 1000))
+
+
+if __name__ == '__main__':
+    teardown = setup()
+    try:
+        run()
+    finally:
+        teardown()
@@ -0,0 +1,60 @@
+"""A page of blogs with their entry count, total comments and average
+scoring: aggregated over Entry with annotate() vs read from the stats
+stored on Blog (blog.stats). Also times an entry create, which now updates
+the stats of its blog.
+
+    python -m benchmarks.blog_stats [--blogs 100] [--entries 10000]
+"""
+from __future__ import print_function
+
+import argparse
+
+from benchmarks.utils import setup, seed_entries, timeit
+
+
+def run(blogs, entries):
+    from django.db.models import Avg, Count, Sum
+
+    from blog.models import Blog, Entry
+    from blog.stats import rebuild_blog_stats
+
+    for _ in range(blogs):
+        seed_entries(entries)
+    # seed_entries() bulk inserts
+    rebuild_blog_stats()
+
+    def annotated():
+        list(Blog.objects.annotate(
+            entry_count_=Count('entry'),
+            total_comments_=Sum('entry__number_comments'),
+            average_scoring=Avg('entry__scoring'),
+        ).order_by('id').values()[:100])
+
+    def stored():
+        list(Blog.objects.order_by('id').values()[:100])
+
+    blog = Blog.objects.first()
+
+    def create():
+        Entry.objects.create(blog=blog, headline='Headline',
+                             body_text='Some body text', number_comments=1,
+                             scoring='1.00')
+
+    print('{:<12}{:>12}'.format('', 'ms'))
+    for name, func in (('annotate', annotated), ('stored', stored),
+                       ('create', create)):
+        print('{:<12}{:>12.2f}'.format(name, timeit(func, repeat=20) * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--blogs', type=int, default=100)
+    parser.add_argument('--entries', type=int, default=10000,
+                        help='entries per blog')
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.blogs, args.entries)
+    finally:
+        teardown()
@@ -0,0 +1,104 @@
+"""Per-request latency of GET and PATCH /api/entries/<id> through the WSGI
+application, with a new database connection per request (CONN_MAX_AGE = 0),
+with a persistent one and with a persistent one plus SQLITE_PRAGMAS.
+
+On SQLite the test database is a file in a temporary directory, so the
+journal and sync settings apply. On PostgreSQL run it once with the
+default backend and once with blog.backends.postgresql_pool.
+
+    python -m benchmarks.connections [--requests 500]
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.utils import setup, seed_entries, create_user
+
+# journal_mode can only change while no other connection is open
+NO_PRAGMAS = (('journal_mode', 'DELETE'),)
+
+
+def call(application, environ):
+    response = application(dict(environ), lambda status, headers: None)
+    b''.join(response)
+    response.close()
+    assert response.status_code == 200, response.status_code
+
+
+def run(count):
+    from io import BytesIO
+
+    from django.conf import settings
+    from django.core.wsgi import get_wsgi_application
+    from django.db import connection
+
+    from blog import mixins
+    from benchmarks.load import percentile
+
+    mixins.response_cache = None
+    blog = seed_entries(100)
+    entry = blog.entry_set.order_by('id').first()
+    user = create_user()
+    entry.users.add(user)
+    application = get_wsgi_application()
+
+    environ = {
+        'PATH_INFO': '/api/entries/{}'.format(entry.id),
+        'QUERY_STRING': 'accesskey={}'.format(user.accesskey),
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80',
+        'HTTP_X_SECRET_KEY': user.secretkey,
+        'wsgi.url_scheme': 'http', 'wsgi.errors': BytesIO(),
+    }
+    body = b'{"headline": "Patched headline"}'
+
+    def get():
+        call(application, dict(environ, REQUEST_METHOD='GET',
+                               **{'wsgi.input': BytesIO()}))
+
+    def patch():
+        call(application, dict(
+            environ, REQUEST_METHOD='PATCH', CONTENT_TYPE='application/json',
+            CONTENT_LENGTH=str(len(body)), **{'wsgi.input': BytesIO(body)}))
+
+    scenarios = (
+        ('connection per request', 0, NO_PRAGMAS),
+        ('persistent', 60, NO_PRAGMAS),
+        ('persistent + pragmas', 60, settings.SQLITE_PRAGMAS),
+    )
+    print('{:<26}{:>12}{:>12}{:>12}{:>12}'.format(
+        'scenario', 'GET p50', 'GET p99', 'PATCH p50', 'PATCH p99'))
+    for name, max_age, pragmas in scenarios:
+        connection.close()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        settings.SQLITE_PRAGMAS = pragmas
+        line = '{:<26}'.format(name)
+        for func in (get, patch):
+            func()  # warm up
+            latencies = []
+            for _ in range(count):
+                start = time.time()
+                func()
+                latencies.append(time.time() - start)
+            latencies.sort()
+            line += '{:>10.3f}ms{:>10.3f}ms'.format(
+                percentile(latencies, 50) * 1000,
+                percentile(latencies, 99) * 1000)
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    teardown = setup(os.path.join(directory, 'benchmark.sqlite3'))
+    try:
+        run(args.requests)
+    finally:
+        teardown()
+        shutil.rmtree(directory)
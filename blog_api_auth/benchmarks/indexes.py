@@ -0,0 +1,84 @@
+"""Query plans and latency of the indexed Entry access patterns (first
+page of each `?ordering=`, the entries of a user) without and with the
+indexes of migration 0006_entry_indexes.
+
+    python -m benchmarks.indexes [--rows 1000000]
+"""
+from __future__ import print_function
+
+import argparse
+
+from benchmarks.utils import setup, seed_entries, create_user, timeit
+
+ORDERINGS = ('pub_date', '-mod_date', '-scoring', 'number_comments')
+
+
+def explain(queryset):
+    from django.db import connection
+
+    sql, params = queryset.query.sql_with_params()
+    prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+              else 'EXPLAIN ')
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return [' '.join(str(column) for column in row)
+                for row in cursor.fetchall()]
+
+
+def measure(client, user, limit):
+    from blog.models import Entry
+
+    url = '/api/entries?accesskey={}&limit={}&count=none&ordering='.format(
+        user.accesskey, limit)
+    cases = []
+    for ordering in ORDERINGS:
+        tie_breaker = '-id' if ordering.startswith('-') else 'id'
+        queryset = Entry.objects.order_by(ordering, tie_breaker)[:limit]
+        cases.append(('?ordering=' + ordering, queryset,
+                      lambda o=ordering: client.get(url + o)))
+    owned = Entry.objects.filter(users=user).values_list('id', flat=True)
+    cases.append(('owned by user', owned, lambda: list(owned.all())))
+
+    for name, queryset, func in cases:
+        elapsed = timeit(func, repeat=10)
+        print('{:<28}{:>10.2f} ms'.format(name, elapsed * 1000))
+        for line in explain(queryset):
+            print('    ' + line)
+
+
+def run(rows, limit=100):
+    from django.core.management import call_command
+    from rest_framework.test import APIClient
+
+    from blog import mixins
+    from blog.models import Entry
+
+    mixins.response_cache = None
+    seed_entries(rows)
+    user = create_user()
+    ids = Entry.objects.values_list('id', flat=True)[::100]
+    Entry.users.through.objects.bulk_create(
+        Entry.users.through(entry_id=entry_id, user_id=user.pk)
+        for entry_id in ids)
+    client = APIClient()
+    client.get('/api/entries?accesskey={}'.format(user.accesskey))
+
+    call_command('migrate', 'blog', '0005', verbosity=0)
+    print('without indexes')
+    measure(client, user, limit)
+
+    call_command('migrate', 'blog', '0006', verbosity=0)
+    print('\nwith indexes')
+    measure(client, user, limit)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.rows)
+    finally:
+        teardown()
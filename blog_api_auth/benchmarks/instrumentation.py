@@ -0,0 +1,50 @@
+"""Overhead of InstrumentationMiddleware on a 100 entries page, for
+sample rates 0 (off), INSTRUMENTATION_SAMPLE_RATE and 1 (every request).
+The response cache is turned off so every request does the full work.
+
+    python -m benchmarks.instrumentation [--repeat 500]
+"""
+from __future__ import print_function
+
+import argparse
+
+from benchmarks.utils import setup, seed_entries, create_user, timeit
+
+
+def run(repeat):
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+
+    from blog import mixins
+
+    mixins.response_cache = None
+    seed_entries(1000)
+    user = create_user()
+    client = APIClient()
+    url = '/api/entries?accesskey={}&limit=100'.format(user.accesskey)
+    assert client.get(url).status_code == 200
+
+    rates = (0, settings.INSTRUMENTATION_SAMPLE_RATE, 1)
+    baseline = None
+    print('{:<14}{:>12}{:>12}'.format('sample rate', 'ms/request',
+                                      'overhead'))
+    for rate in rates:
+        with override_settings(INSTRUMENTATION_SAMPLE_RATE=rate):
+            elapsed = timeit(lambda: client.get(url), repeat=repeat)
+        if baseline is None:
+            baseline = elapsed
+        print('{:<14}{:>12.3f}{:>11.1f}%'.format(
+            rate, elapsed * 1000, (elapsed / baseline - 1) * 100))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.repeat)
+    finally:
+        teardown()
@@ -0,0 +1,249 @@
+"""Load test of the authenticated API: list, detail, search, create, patch
+and delete on /api/entries, list, detail, prefix search, create and patch
+on /api/blogs and list, detail and prefix search on /api/users (reads with
+AK, writes with AK + SK) over rows seeded with the factories of
+blog/tests/fixtures.py. Reports p50/p95/p99 latency, requests/sec and
+queries per request for each scenario.
+
+User writes are left out: password hashing makes up nearly all of their
+time, and benchmarks/users.py measures it.
+
+Requests run one after the other in this process, through the test
+client, so results only compare between runs on the same machine. The
+response cache is off unless --response-cache is given.
+
+    python -m benchmarks.load [--rows 10000] [--requests 200]
+        [--output results.json] [--compare baseline.json]
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import OrderedDict
+
+import django
+
+from benchmarks.utils import (
+    setup, capture_queries, create_user, seed_users)
+
+# headline words, each one matching ~1/len(WORDS) of the entries
+WORDS = ('python', 'django', 'rest', 'cache', 'index', 'query', 'async',
+         'queue', 'thread', 'socket', 'shard', 'replica', 'bloom', 'heap',
+         'trie', 'graph', 'vector', 'matrix', 'kernel', 'buffer')
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_sec',
+           'queries_per_request')
+
+
+def seed(rows, user, owned, batch_size=10000):
+    """Seeds `rows` entries over rows / 1000 blogs, built by the factories
+       and bulk inserted, then as many blogs again and rows / 10 users.
+       `user` owns the first `owned` entries. Returns the blogs and the
+       entry ids."""
+    from factory.fuzzy import reseed_random
+
+    from blog.models import Blog, Entry, fold
+    from blog.stats import rebuild_blog_stats
+    from blog.tests.fixtures import BlogFactory, EntryFactory
+
+    reseed_random(0)
+    blogs = BlogFactory.create_batch(rows // 1000 + 1)
+    created = 0
+    while created < rows:
+        size = min(batch_size, rows - created)
+        Entry.objects.bulk_create(
+            EntryFactory.build(
+                blog=blogs[(created + i) % len(blogs)],
+                headline='Headline {} {}'.format(
+                    created + i, WORDS[(created + i) % len(WORDS)]))
+            for i in range(size))
+        created += size
+
+    ids = list(Entry.objects.order_by('id').values_list('id', flat=True))
+    Entry.users.through.objects.bulk_create(
+        Entry.users.through(entry_id=entry_id, user_id=user.pk)
+        for entry_id in ids[:owned])
+    # bulk_create skips Blog.save() and the stats signals
+    rebuild_blog_stats()
+
+    empty_blogs = BlogFactory.build_batch(len(blogs))
+    for blog in empty_blogs:
+        blog.name_folded = fold(blog.name)
+    Blog.objects.bulk_create(empty_blogs)
+    seed_users(rows // 10)
+    return list(Blog.objects.order_by('id')), ids
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a sorted list"""
+    index = int(round(percent / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+def measure(make_request, count):
+    """Runs `count` requests, the first one counting queries only (the
+       query log slows requests down). Returns the metrics."""
+    with capture_queries() as queries:
+        response = make_request()
+    assert response.status_code < 400, response.content
+
+    latencies = []
+    start = time.time()
+    for _ in range(count):
+        request_start = time.time()
+        response = make_request()
+        latencies.append(time.time() - request_start)
+        assert response.status_code < 400, response.content
+    elapsed = time.time() - start
+
+    latencies.sort()
+    return OrderedDict([
+        ('p50_ms', round(percentile(latencies, 50) * 1000, 3)),
+        ('p95_ms', round(percentile(latencies, 95) * 1000, 3)),
+        ('p99_ms', round(percentile(latencies, 99) * 1000, 3)),
+        ('requests_per_sec', round(count / elapsed, 1)),
+        ('queries_per_request', len(queries)),
+    ])
+
+
+def run(rows, count, response_cache=False):
+    from rest_framework.test import APIClient
+
+    from blog import mixins
+
+    if not response_cache:
+        mixins.response_cache = None
+
+    user = create_user()
+    # every patch and delete (plus the query counting ones) needs its own
+    owned = 2 * (count + 1)
+    blogs, ids = seed(max(rows, owned), user, owned)
+    owned_ids = ids[:owned]
+    client = APIClient()
+    ak = '?accesskey={}'.format(user.accesskey)
+    client.credentials(HTTP_X_SECRET_KEY=user.secretkey)
+    rng = random.Random(0)
+
+    def entry_url(pk):
+        return '/api/entries/{}{}'.format(pk, ak)
+
+    def create():
+        return client.post('/api/entries' + ak, {
+            'blog': 'http://testserver/api/blogs/{}'.format(
+                rng.choice(blogs).id),
+            'users': ['http://testserver/api/users/{}'.format(user.id)],
+            'headline': 'New entry',
+            'body_text': 'Some body text',
+            'number_comments': 0,
+            'scoring': 4.25,
+        }, format='json')
+
+    def create_blog():
+        return client.post('/api/blogs' + ak, {
+            'name': 'New blog',
+            'tagline': 'Some tagline',
+        }, format='json')
+
+    def page(resource='entries', **params):
+        url = '/api/{}{}&limit=100'.format(resource, ak)
+        for name, value in params.items():
+            url += '&{}={}'.format(name, value)
+        return client.get(url)
+
+    def prefix():
+        # matches ~1/10, ~1/100 or ~1/1000 of the rows
+        return str(rng.randrange(1, 10 ** rng.randint(1, 3)))
+
+    users = rows // 10
+    scenarios = (
+        ('list', lambda: page(offset=rng.randrange(max(1, len(ids) - 100)))),
+        ('detail', lambda: client.get(entry_url(rng.choice(ids)))),
+        ('search', lambda: page(search=rng.choice(WORDS))),
+        ('create', create),
+        ('patch', lambda: client.patch(
+            entry_url(owned_ids.pop()),
+            {'headline': 'Patched headline'}, format='json')),
+        ('delete', lambda: client.delete(entry_url(owned_ids.pop()))),
+        ('blog_list', lambda: page(
+            'blogs', offset=rng.randrange(max(1, len(blogs) - 100)))),
+        ('blog_detail', lambda: client.get('/api/blogs/{}{}'.format(
+            rng.choice(blogs).id, ak))),
+        ('blog_search', lambda: page('blogs', search='^blog ' + prefix())),
+        ('blog_create', create_blog),
+        ('blog_patch', lambda: client.patch(
+            '/api/blogs/{}{}'.format(rng.choice(blogs).id, ak),
+            {'tagline': 'Patched tagline'}, format='json')),
+        ('user_list', lambda: page(
+            'users', offset=rng.randrange(max(1, users - 100)))),
+        ('user_detail', lambda: client.get('/api/users/{}{}'.format(
+            rng.randint(user.id + 1, user.id + users), ak))),
+        ('user_search', lambda: page('users', search='^user' + prefix())),
+    )
+
+    client.get('/api/entries' + ak)  # warm up the accesskey cache
+    results = OrderedDict()
+    for name, make_request in scenarios:
+        results[name] = measure(make_request, count)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD']).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    print('{:<12}'.format('scenario') + ''.join(
+        '{:>22}'.format(metric) for metric in METRICS))
+    for name, metrics in results.items():
+        line = '{:<12}'.format(name)
+        for metric in METRICS:
+            value = '{:g}'.format(metrics[metric])
+            base = (baseline or {}).get(name, {}).get(metric)
+            if base:
+                value += ' ({:+.1f}%)'.format(
+                    (metrics[metric] / float(base) - 1) * 100)
+            line += '{:>22}'.format(value)
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--response-cache', action='store_true')
+    parser.add_argument('--output', help='file to save the results to')
+    parser.add_argument('--compare', help='results file of a previous run')
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        results = run(args.rows, args.requests, args.response_cache)
+    finally:
+        teardown()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['scenarios']
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(OrderedDict([
+                ('commit', git_commit()),
+                ('timestamp', int(time.time())),
+                ('python', platform.python_version()),
+                ('django', django.get_version()),
+                ('rows', args.rows),
+                ('requests', args.requests),
+                ('response_cache', args.response_cache),
+                ('scenarios', results),
+            ]), f, indent=2)
@@ -0,0 +1,63 @@
+"""Entries page latency, LimitOffsetPagination vs ?pagination=cursor, at the
+start of the table and deep into it.
+
+    python -m benchmarks.pagination [--rows 1000100] [--offset 1000000]
+"""
+from __future__ import print_function
+
+import argparse
+
+from benchmarks.utils import setup, seed_entries, create_user, timeit
+
+
+def run(rows, offset, limit=100):
+    from rest_framework.pagination import Cursor
+    from rest_framework.test import APIClient
+
+    from blog.models import Entry
+    from blog.pagination import IdCursorPagination
+
+    seed_entries(rows)
+    user = create_user()
+    client = APIClient()
+    base_url = '/api/entries?accesskey={}&limit={}'.format(
+        user.accesskey, limit)
+
+    def cursor_url(position):
+        paginator = IdCursorPagination()
+        paginator.base_url = base_url + '&pagination=cursor'
+        paginator.ordering = ('id',)
+        return paginator.encode_cursor(Cursor(0, False, position))
+
+    # the id right before the row at `offset`, for the equivalent keyset page
+    deep_id = Entry.objects.order_by('id').values_list(
+        'id', flat=True)[offset - 1]
+    urls = (
+        ('limit-offset', 0, '{}&offset=0'.format(base_url)),
+        ('limit-offset', offset, '{}&offset={}'.format(base_url, offset)),
+        ('cursor', 0, base_url + '&pagination=cursor'),
+        ('cursor', offset, cursor_url(deep_id)),
+    )
+
+    client.get(base_url)  # warm up the accesskey cache
+    print('{:<14}{:>10}{:>12}'.format('pagination', 'offset', 'ms/page'))
+    for name, page_offset, url in urls:
+        response = client.get(url)
+        assert response.status_code == 200, response.content
+        assert len(response.json()['results']) == limit
+        elapsed = timeit(lambda: client.get(url), repeat=20)
+        print('{:<14}{:>10}{:>12.2f}'.format(name, page_offset,
+                                             elapsed * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000100)
+    parser.add_argument('--offset', type=int, default=1000000)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.rows, args.offset)
+    finally:
+        teardown()
@@ -0,0 +1,42 @@
+"""Per-keystroke latency of an autocomplete on /api/users: the unanchored
+`?search=foo` (icontains) vs the indexed `?search=^foo` prefix mode.
+
+    python -m benchmarks.prefix_search [--rows 1000000]
+"""
+from __future__ import print_function
+
+import argparse
+
+from benchmarks.utils import setup, seed_users, create_user, timeit
+
+
+def run(rows, typed='user4242', limit=10):
+    from rest_framework.test import APIClient
+
+    seed_users(rows)
+    user = create_user(accesskey='z' * 32)
+    client = APIClient()
+    # autocomplete never needs the total
+    url = '/api/users?accesskey={}&limit={}&count=none&search='.format(
+        user.accesskey, limit)
+    client.get(url)  # warm up the accesskey cache
+
+    print('{:<12}{:>16}{:>16}'.format('typed', 'contains ms', 'prefix ms'))
+    for i in range(1, len(typed) + 1):
+        term = typed[:i]
+        contains = timeit(lambda: client.get(url + term), repeat=10)
+        prefix = timeit(lambda: client.get(url + '^' + term), repeat=10)
+        print('{:<12}{:>16.2f}{:>16.2f}'.format(
+            term, contains * 1000, prefix * 1000))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.rows)
+    finally:
+        teardown()
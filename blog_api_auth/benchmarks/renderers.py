@@ -0,0 +1,48 @@
+"""Time to render a 100 entries page (as served by /api/entries) to JSON,
+JSONRenderer vs FastJSONRenderer (orjson when installed).
+
+    python -m benchmarks.renderers
+"""
+from __future__ import print_function
+
+from benchmarks.utils import setup, seed_entries, create_user, timeit
+
+
+def run(size=100):
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+
+    from blog import renderers
+    from blog.models import Entry
+
+    seed_entries(size)
+    user = create_user()
+    Entry.users.through.objects.bulk_create(
+        Entry.users.through(entry_id=entry_id, user_id=user.pk)
+        for entry_id in Entry.objects.values_list('id', flat=True))
+
+    response = APIClient().get('/api/entries', {
+        'accesskey': user.accesskey, 'limit': size})
+    assert response.status_code == 200, response.content
+    data = response.data
+
+    configs = (
+        ('JSONRenderer', JSONRenderer()),
+        ('FastJSONRenderer', renderers.FastJSONRenderer()),
+    )
+    expected = JSONRenderer().render(data)
+    print('orjson: {}'.format(
+        renderers.orjson.__version__ if renderers.orjson else 'missing'))
+    print('{:<18}{:>12}'.format('renderer', 'ms/page'))
+    for name, renderer in configs:
+        assert renderer.render(data) == expected
+        elapsed = timeit(lambda: renderer.render(data), repeat=1000)
+        print('{:<18}{:>12.3f}'.format(name, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    teardown = setup()
+    try:
+        run()
+    finally:
+        teardown()
@@ -0,0 +1,63 @@
+"""Time to serialize a list of entries (two users each), EntrySerializer
+over prefetched instances vs CompactListSerializer over `.values()` rows.
+
+    python -m benchmarks.serializers [--sizes 100 1000 10000]
+"""
+from __future__ import print_function
+
+import argparse
+
+from benchmarks.utils import setup, seed_entries, create_user, timeit
+
+
+def run(sizes):
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from blog.models import Entry
+    from blog.serializers import EntrySerializer, CompactListSerializer
+    from blog.views import EntryViewSet
+
+    seed_entries(max(sizes))
+    users = [create_user(), create_user('benchmark2', 'c' * 32)]
+    Entry.users.through.objects.bulk_create(
+        Entry.users.through(entry_id=entry_id, user_id=user.pk)
+        for entry_id in Entry.objects.values_list('id', flat=True)
+        for user in users)
+
+    request = Request(APIRequestFactory().get('/api/entries'))
+    context = {'request': request, 'format': None, 'view': None}
+    queryset = EntryViewSet.queryset.order_by('id')
+
+    def regular(size):
+        return EntrySerializer(
+            queryset[:size], many=True, context=context).data
+
+    def compact(size):
+        serializer = CompactListSerializer(EntrySerializer, context)
+        return serializer.to_representation(
+            serializer.get_queryset(queryset)[:size])
+
+    print('{:<10}{:>14}{:>14}{:>10}'.format(
+        'rows', 'regular ms', 'compact ms', 'speedup'))
+    for size in sizes:
+        assert regular(size) == compact(size)
+        repeat = max(1, 1000 // size)
+        regular_elapsed = timeit(lambda: regular(size), repeat=repeat)
+        compact_elapsed = timeit(lambda: compact(size), repeat=repeat)
+        print('{:<10}{:>14.2f}{:>14.2f}{:>9.1f}x'.format(
+            size, regular_elapsed * 1000, compact_elapsed * 1000,
+            regular_elapsed / compact_elapsed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.sizes)
+    finally:
+        teardown()
@@ -0,0 +1,95 @@
+"""Users/sec importing users through /api/users/bulk (BULK_MAX_ITEMS per
+request) with passwords hashed in the request thread and by a pool of
+threads, next to one POST /api/users per user.
+
+    python -m benchmarks.users [--users 10000] [--threads 0,4]
+        [--hasher pbkdf2|argon2|bcrypt]
+"""
+from __future__ import print_function
+
+import argparse
+import multiprocessing
+import time
+
+from benchmarks.utils import setup, create_user
+
+HASHERS = {
+    'pbkdf2': 'blog.hashers.PBKDF2PasswordHasher',
+    'argon2': 'blog.hashers.Argon2PasswordHasher',
+    'bcrypt': 'blog.hashers.BCryptSHA256PasswordHasher',
+}
+
+
+def payload(i):
+    return {
+        'username': 'user{}'.format(i),
+        'accesskey': '{:032x}'.format(i),
+        'secretkey': 'b' * 32,
+        'password': 'password{}'.format(i),
+    }
+
+
+def run(users, threads, hasher, single):
+    from django.conf import settings
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+
+    from blog.models import User
+
+    admin = create_user(accesskey='z' * 32)
+    client = APIClient()
+    client.credentials(HTTP_X_SECRET_KEY=admin.secretkey)
+    ak = '?accesskey={}'.format(admin.accesskey)
+    batch_size = getattr(settings, 'BULK_MAX_ITEMS', 1000)
+    hashers = [HASHERS[hasher]] + [
+        path for path in settings.PASSWORD_HASHERS if path != HASHERS[hasher]]
+
+    def import_users(count, start):
+        begin = time.time()
+        for offset in range(0, count, batch_size):
+            response = client.post('/api/users/bulk' + ak, [
+                payload(start + i)
+                for i in range(offset, min(count, offset + batch_size))
+            ], format='json')
+            assert response.status_code == 201, response.content
+        return count / (time.time() - begin)
+
+    def create_users(count, start):
+        begin = time.time()
+        for i in range(count):
+            response = client.post('/api/users' + ak, payload(start + i),
+                                   format='json')
+            assert response.status_code == 201, response.content
+        return count / (time.time() - begin)
+
+    print('{:<28}{:>12}'.format('import', 'users/sec'))
+    with override_settings(PASSWORD_HASHERS=hashers):
+        start = 0
+        for count in threads:
+            with override_settings(PASSWORD_HASHING_THREADS=count):
+                rate = import_users(users, start)
+            print('{:<28}{:>12.1f}'.format(
+                'bulk, {} threads'.format(count), rate))
+            start += users
+        rate = create_users(single, start)
+        print('{:<28}{:>12.1f}'.format('one POST per user', rate))
+    assert User.objects.count() == start + single + 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--threads', default='0,{}'.format(
+        multiprocessing.cpu_count()))
+    parser.add_argument('--hasher', choices=sorted(HASHERS),
+                        default='pbkdf2')
+    parser.add_argument('--single', type=int, default=200,
+                        help='users created one POST at a time')
+    args = parser.parse_args()
+
+    teardown = setup()
+    try:
+        run(args.users, [int(count) for count in args.threads.split(',')],
+            args.hasher, args.single)
+    finally:
+        teardown()
@@ -0,0 +1,98 @@
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup(database=None):
+    """Configures Django and creates a throwaway test database. On SQLite
+       it is a file at the `database` path if given, in memory otherwise.
+       Returns a callable that destroys it again.
+    """
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog_api_auth.settings')
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    # like the test runner: no query log outside of capture_queries()
+    settings.DEBUG = False
+    old_name = connection.settings_dict['NAME']
+    if database is not None and connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = database
+    connection.creation.create_test_db(verbosity=0)
+
+    def teardown():
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    return teardown
+
+
+@contextmanager
+def capture_queries():
+    """Yields a list that holds the queries run inside the block once it
+       exits. Unlike CaptureQueriesContext alone, it keeps counting once
+       the connection's bounded query log is full."""
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    queries = []
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        yield queries
+    queries.extend(ctx.captured_queries)
+
+
+def timeit(func, repeat=100):
+    """Returns the mean seconds per call of func over `repeat` calls"""
+    start = time.time()
+    for _ in range(repeat):
+        func()
+    return (time.time() - start) / repeat
+
+
+def seed_entries(count, blog=None, batch_size=10000):
+    """Bulk inserts `count` entries (without users) into given blog, or a
+       new one. Returns the blog."""
+    from blog.models import Blog, Entry
+
+    if blog is None:
+        blog = Blog.objects.create(name='Benchmark', tagline='Some tagline')
+    while count > 0:
+        size = min(count, batch_size)
+        Entry.objects.bulk_create(
+            Entry(blog=blog, headline='Headline {}'.format(i),
+                  body_text='Some body text', number_comments=i % 100,
+                  scoring='{:.2f}'.format((i % 1000) / 100.0))
+            for i in range(size))
+        count -= size
+    return blog
+
+
+def create_user(username='benchmark', accesskey='a' * 32,
+                secretkey='b' * 32):
+    """Creates an API user, skipping the (slow) password hashing"""
+    from blog.models import User
+
+    return User.objects.create(username=username, accesskey=accesskey,
+                               secretkey=secretkey)
+
+
+def seed_users(count, batch_size=10000):
+    """Bulk inserts `count` users named user<n> (bulk_create skips
+       User.save(), so derived columns are filled in here)."""
+    from blog.models import User, fold
+
+    start = 0
+    while start < count:
+        users = []
+        for i in range(start, min(count, start + batch_size)):
+            username = 'User{}'.format(i)
+            users.append(User(
+                username=username, username_folded=fold(username),
+                accesskey='{:032x}'.format(i), secretkey='b' * 32))
+        User.objects.bulk_create(users)
+        start += batch_size
@@ -4,7 +4,7 @@ from blog.models import Blog, User, Entry
 
 @admin.register(Blog)
 class BlogAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name')
+    list_display = ('id', 'name', 'entry_count', 'total_comments')
     search_fields = ('id', 'name')
 
 
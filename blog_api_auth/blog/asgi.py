@@ -0,0 +1,166 @@
+"""ASGI (3.0) front end for the WSGI application, for Python 3.5+, so the
+project can be served by an ASGI server.
+
+Django 1.9 and Django REST framework 3.4 have no async views nor an async
+ORM, so requests still run the regular, blocking handler, on a pool of
+ASGI_THREADS threads; it is no faster than a threaded WSGI server. The
+event loop only does the network I/O.
+
+Everything about a request, authentication included, runs on one thread
+of the pool, so the database connection it opens is closed by Django's
+request_finished handling as usual. Response bodies are sent as they are
+produced, streaming ones included.
+"""
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# body chunks buffered between a request's thread and the event loop
+QUEUE_SIZE = 16
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+class ASGIHandler(object):
+    """ASGI application running `wsgi_application` (see module docstring)"""
+
+    def __init__(self, wsgi_application, threads=None):
+        self.application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            threads or getattr(settings, 'ASGI_THREADS', 32))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError(
+                'Unsupported ASGI scope type {}'.format(scope['type']))
+
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        environ = self.get_environ(scope, body)
+
+        loop = asyncio.get_event_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        disconnected = threading.Event()
+        future = loop.run_in_executor(
+            self.executor, self.run, environ, loop, queue, disconnected)
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                await send(message)
+        except BaseException:
+            # eg: the client went away, let the request's thread finish
+            disconnected.set()
+            while (await queue.get()) is not None:
+                pass
+            raise
+        finally:
+            await future
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Returns the request body, None if the client went away"""
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    def get_environ(self, scope, body):
+        """Returns the WSGI environ of an ASGI http scope"""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            # WSGI wants the raw bytes as latin-1 native strings
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'SERVER_PROTOCOL': 'HTTP/{}'.format(
+                scope.get('http_version', '1.1')),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = 'HTTP_' + name
+            value = value.decode('latin-1')
+            if name in environ:
+                value = environ[name] + ',' + value
+            environ[name] = value
+        # the whole body is read already, whatever the transfer encoding
+        environ['CONTENT_LENGTH'] = str(len(body))
+        return environ
+
+    def run(self, environ, loop, queue, disconnected):
+        """Runs the WSGI application on the calling (pool) thread, handing
+           the response messages over to the event loop through `queue`,
+           which gets None once done"""
+        def put(message):
+            if disconnected.is_set():
+                raise ClientDisconnected()
+            asyncio.run_coroutine_threadsafe(
+                queue.put(message), loop).result()
+
+        status_headers = []
+
+        def start_response(status, headers, exc_info=None):
+            status_headers[:] = [status, headers]
+
+        try:
+            response = self.application(environ, start_response)
+            try:
+                status, headers = status_headers
+                put({
+                    'type': 'http.response.start',
+                    'status': int(status.split(' ', 1)[0]),
+                    'headers': [
+                        (name.lower().encode('latin-1'),
+                         value.encode('latin-1'))
+                        for name, value in headers],
+                })
+                for chunk in response:
+                    if chunk:
+                        put({'type': 'http.response.body', 'body': chunk,
+                             'more_body': True})
+                put({'type': 'http.response.body', 'body': b''})
+            finally:
+                # fires request_finished, which closes this thread's
+                # database connection
+                if hasattr(response, 'close'):
+                    response.close()
+        except ClientDisconnected:
+            pass
+        finally:
+            asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
@@ -1,16 +1,164 @@
+import copy
+import hashlib
+
 from rest_framework import exceptions, authentication, permissions
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.crypto import constant_time_compare
+
+from blog import routers
+from blog.cache import LRUCache
+from blog.models import User, validate_authkey, digest_secretkey
+
+
+# query param carrying the accesskey
+ACCESSKEY_PARAM = 'accesskey'
+
+# the only User fields authentication needs, for both AK and AK + SK checks
+AUTH_USER_FIELDS = ('id', 'accesskey', 'secretkey', 'secretkey_digest',
+                    'is_active')
+
+# user pk -> accesskey currently cached, so a rotated key can be evicted;
+# entries leave along with those of user_cache
+_cached_accesskeys = {}
+
+
+def _forget_accesskey(accesskey, user):
+    if _cached_accesskeys.get(user.pk) == accesskey:
+        del _cached_accesskeys[user.pk]
+
+
+# accesskey -> User, so safe requests don't hit the database once warm.
+# Each process only drops its own copy on writes: the short TTL bounds how
+# long the other processes let a deactivated or rotated user in.
+user_cache = LRUCache(
+    max_size=getattr(settings, 'ACCESSKEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'ACCESSKEY_CACHE_TTL', 5),
+    on_evict=_forget_accesskey)
+
+# accesskeys recently seen not to exist, so junk keys don't hit the database
+unknown_accesskey_cache = LRUCache(
+    max_size=getattr(settings, 'ACCESSKEY_NEGATIVE_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'ACCESSKEY_NEGATIVE_CACHE_TTL', 30))
+
+# (accesskey, stored secretkey digest) -> SHA-256 of the secretkey that
+# verified against it
+verified_secretkeys = LRUCache(
+    max_size=getattr(settings, 'SECRETKEY_VERIFIED_CACHE_SIZE', 1024))
+
+
+def get_user_by_accesskey(accesskey):
+    """Returns the active User owning given accesskey, going through the
+       in-process cache first. Malformed and recently unknown accesskeys
+       are rejected without a database query. Only AUTH_USER_FIELDS are
+       loaded; any other field is fetched lazily on access. Accesskeys
+       missing from the replica (see blog.routers) are looked up again on
+       the primary. Raises AuthenticationFailed otherwise.
+    """
+    try:
+        validate_authkey(accesskey)
+    except ValidationError:
+        raise exceptions.AuthenticationFailed('Invalid Accesskey')
+
+    user = user_cache.get(accesskey)
+    if user is None:
+        if unknown_accesskey_cache.get(accesskey):
+            raise exceptions.AuthenticationFailed('Invalid Accesskey')
+        user = find_user(accesskey)
+        if user is None and routers.reading_replica():
+            # a new user may not have reached the replica yet
+            user = find_user(accesskey, DEFAULT_DB_ALIAS)
+        if user is None:
+            unknown_accesskey_cache.set(accesskey, True)
+            raise exceptions.AuthenticationFailed('Invalid Accesskey')
+        if not routers.may_be_stale((User,)):
+            user_cache.set(accesskey, user)
+            _cached_accesskeys[user.pk] = accesskey
+
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+    # hand out a copy so a request can't mutate the cached instance
+    return copy.copy(user)
+
+
+def find_user(accesskey, using=None):
+    """Returns the User owning given accesskey, None if there is none"""
+    try:
+        return User.objects.using(using).only(*AUTH_USER_FIELDS).get(
+            accesskey=accesskey)
+    except User.DoesNotExist:
+        return None
+
 
-from blog.models import User, validate_authkey
+def check_secretkey(user, secretkey):
+    """Verifies given secretkey against the user's stored HMAC digest in
+       constant time. Successful verifications are memoized per
+       (accesskey, digest) as a plain SHA-256 of the secretkey, so the HMAC
+       is computed once per key pair, the secretkey itself is not kept in
+       memory and a rotated secretkey never matches a stale memo.
+    """
+    stored = user.secretkey_digest
+    if not stored:
+        # rows written without User.save() (eg: bulk_create) have no digest
+        return constant_time_compare(user.secretkey, secretkey)
+
+    key = (user.accesskey, stored)
+    fingerprint = hashlib.sha256(secretkey.encode('utf-8')).hexdigest()
+    verified = verified_secretkeys.get(key)
+    if verified is not None:
+        return constant_time_compare(verified, fingerprint)
+
+    if constant_time_compare(digest_secretkey(secretkey), stored):
+        verified_secretkeys.set(key, fingerprint)
+        return True
+    return False
+
+
+def invalidate_user(user):
+    """Drops given user from the accesskey cache, both under its current
+       accesskey and under the one it was cached with (if rotated), and
+       forgets its accesskey as unknown.
+    """
+    user_cache.delete(user.accesskey)
+    unknown_accesskey_cache.delete(user.accesskey)
+    accesskey = _cached_accesskeys.pop(user.pk, None)
+    if accesskey is not None:
+        user_cache.delete(accesskey)
+
+
+def authenticate_accesskey(request):
+    accesskey = request.query_params.get(ACCESSKEY_PARAM)
+    if not accesskey:
+        return None
+
+    return (get_user_by_accesskey(accesskey), None)
+
+
+def authenticate_secretkey(request):
+    accesskey = request.query_params.get(ACCESSKEY_PARAM)
+    secretkey = request.META.get('HTTP_X_SECRET_KEY')
+    if not accesskey or not secretkey:
+        return None
+
+    user = get_user_by_accesskey(accesskey)
+    if not check_secretkey(user, secretkey):
+        raise exceptions.AuthenticationFailed('Invalid Secretkey')
+
+    return (user, None)
 
 
 class UserAccesskeyAuthentication(authentication.BaseAuthentication):
     """Authentication against User accesskey using GET parameters"""
 
     def authenticate(self, request):
-        # implement your logic here
-        pass
+        if request.method not in permissions.SAFE_METHODS:
+            # non-safe methods require AK + SK, see UserSecretkeyAuthentication
+            return None
+
+        return authenticate_accesskey(request)
 
 
 class UserSecretkeyAuthentication(authentication.BaseAuthentication):
@@ -20,5 +168,22 @@ class UserSecretkeyAuthentication(authentication.BaseAuthentication):
     """
 
     def authenticate(self, request):
-        # implement your logic here
-        pass
+        if request.method in permissions.SAFE_METHODS:
+            return None
+
+        return authenticate_secretkey(request)
+
+
+class UserAccesskeySecretkeyAuthentication(
+        authentication.BaseAuthentication):
+    """Combined AK / AK + SK authentication in a single pass.
+       Behaves like UserAccesskeyAuthentication followed by
+       UserSecretkeyAuthentication, but the user is resolved once per request
+       and no other authentication class needs to be consulted.
+    """
+
+    def authenticate(self, request):
+        if request.method in permissions.SAFE_METHODS:
+            return authenticate_accesskey(request)
+
+        return authenticate_secretkey(request)
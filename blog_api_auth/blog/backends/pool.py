@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+
+
+class ConnectionPool(object):
+    """Thread-safe pool of DB-API connections.
+
+       - `connect()` opens a new connection, `check(conn)` tells whether a
+         connection still works (eg: runs SELECT 1) and `reset(conn)`
+         readies a returned one for its next user, or raises.
+       - At most `max_idle` connections are kept; more can be checked out
+         at once, the extra ones are closed when put back.
+       - Connections idle for more than `check_interval` seconds are
+         checked before being handed out, and the broken ones discarded.
+       - Connections older than `max_lifetime` seconds are closed instead
+         of reused.
+    """
+
+    def __init__(self, connect, check, reset=None, max_idle=10,
+                 check_interval=30, max_lifetime=3600):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        # (connection, created at, idle since), most recently used last
+        self.idle = deque()
+        # id(connection) -> created at, for the checked out ones
+        self.created = {}
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.discarded = 0
+
+    def get(self):
+        """Returns an idle connection that works, or a new one"""
+        while True:
+            with self.lock:
+                if not self.idle:
+                    self.misses += 1
+                    break
+                connection, created, idle_since = self.idle.pop()
+
+            now = time.time()
+            if (now - created > self.max_lifetime or
+                    (now - idle_since > self.check_interval and
+                     not self.check(connection))):
+                self.discard(connection)
+                continue
+            with self.lock:
+                self.hits += 1
+                self.created[id(connection)] = created
+            return connection
+
+        connection = self.connect()
+        with self.lock:
+            self.created[id(connection)] = time.time()
+        return connection
+
+    def put(self, connection):
+        """Takes back a connection got from get()"""
+        with self.lock:
+            created = self.created.pop(id(connection), 0)
+        if time.time() - created > self.max_lifetime:
+            self.discard(connection)
+            return
+        if self.reset is not None:
+            try:
+                self.reset(connection)
+            except Exception:
+                self.discard(connection)
+                return
+
+        with self.lock:
+            if len(self.idle) < self.max_idle:
+                self.idle.append((connection, created, time.time()))
+                return
+        self.discard(connection)
+
+    def discard(self, connection):
+        with self.lock:
+            self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Closes every idle connection"""
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for connection, created, idle_since in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'idle': len(self.idle),
+                'in_use': len(self.created),
+                'hits': self.hits,
+                'misses': self.misses,
+                'discarded': self.discarded,
+            }
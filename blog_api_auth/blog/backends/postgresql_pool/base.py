@@ -0,0 +1,89 @@
+"""PostgreSQL backend whose connections come from a per process pool
+(blog.backends.pool.ConnectionPool) instead of being opened on connect and
+closed on close, configured by the POOL dict of the database settings:
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'blog.backends.postgresql_pool',
+            ...
+            # back to the pool at the end of each request
+            'CONN_MAX_AGE': 0,
+            'POOL': {
+                'MAX_IDLE': 10,
+                'CHECK_INTERVAL': 30,  # seconds idle before a health check
+                'MAX_LIFETIME': 3600,  # seconds
+            },
+        }
+    }
+"""
+import threading
+
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from blog.backends.pool import ConnectionPool
+
+Database = base.Database
+
+# (alias, connection parameters) -> ConnectionPool
+pools = {}
+pools_lock = threading.Lock()
+
+
+def check(connection):
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Database.Error:
+        return False
+    return True
+
+
+def reset(connection):
+    """Ends whatever transaction a returned connection was left in"""
+    if connection.closed:
+        raise Database.InterfaceError('connection already closed')
+    status = connection.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        raise Database.InterfaceError('connection lost')
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_pool(self, conn_params):
+        key = (self.alias, repr(sorted(conn_params.items())))
+        with pools_lock:
+            pool = pools.get(key)
+            if pool is None:
+                options = self.settings_dict.get('POOL') or {}
+                pool = pools[key] = ConnectionPool(
+                    lambda: Database.connect(**conn_params), check, reset,
+                    max_idle=options.get('MAX_IDLE', 10),
+                    check_interval=options.get('CHECK_INTERVAL', 30),
+                    max_lifetime=options.get('MAX_LIFETIME', 3600))
+            return pool
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection = self.pool.get()
+
+        # as the parent's, minus the connect
+        options = self.settings_dict['OPTIONS']
+        try:
+            self.isolation_level = options['isolation_level']
+        except KeyError:
+            self.isolation_level = connection.isolation_level
+        else:
+            if self.isolation_level != connection.isolation_level:
+                connection.set_session(isolation_level=self.isolation_level)
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.put(self.connection)
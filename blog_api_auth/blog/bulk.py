@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.db import connections, router
+from django.db.models.deletion import Collector
+
+from blog.models import Entry, User, fold, digest_secretkey
+from blog.stats import batched_blog_stats, update_blog_stats
+
+
+def reserve_sqlite_ids(connection, cursor, table, column, count):
+    # AUTOINCREMENT tables never reuse an id up to sqlite_sequence, and
+    # bumping it takes the write lock until the transaction ends, so the
+    # ids stay ours
+    update = 'UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s'
+    select = 'SELECT seq FROM sqlite_sequence WHERE name = %s'
+    if connection.Database.sqlite_version_info >= (3, 35):
+        cursor.execute(update + ' RETURNING seq', [count, table])
+        row = cursor.fetchone()
+    else:
+        cursor.execute(update, [count, table])
+        row = None
+        if cursor.rowcount:
+            cursor.execute(select, [table])
+            row = cursor.fetchone()
+    if row is None:
+        # nothing was ever inserted into the table
+        cursor.execute(
+            'INSERT INTO sqlite_sequence (name, seq) '
+            'SELECT %s, COALESCE(MAX({}), 0) + %s FROM {}'.format(
+                connection.ops.quote_name(column),
+                connection.ops.quote_name(table)),
+            [table, count])
+        cursor.execute(select, [table])
+        row = cursor.fetchone()
+    return list(range(row[0] - count + 1, row[0] + 1))
+
+
+def reserve_ids(connection, model, count):
+    """Takes `count` unused ids for `model` from the database, which no
+       other insert can be given afterwards, or None if the backend has no
+       way to reserve them."""
+    table = model._meta.db_table
+    column = model._meta.pk.column
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT nextval(pg_get_serial_sequence(%s, %s)) '
+                'FROM generate_series(1, %s)', [table, column, count])
+            return [row[0] for row in cursor.fetchall()]
+        if connection.vendor == 'sqlite':
+            return reserve_sqlite_ids(connection, cursor, table, column,
+                                      count)
+    return None
+
+
+def bulk_insert(model, objs):
+    """bulk_create() that also sets the pk of every object, which Django
+       only does for backends able to return ids from a bulk insert.
+       Must run inside a transaction.
+
+       Elsewhere the ids are reserved from the table's sequence first (see
+       reserve_ids()) and inserted along with the rows, or, without a way
+       to reserve them, each object is saved on its own. Blog stats are
+       updated for new entries either way (see blog.stats).
+    """
+    if not objs:
+        return objs
+
+    db = router.db_for_write(model)
+    connection = connections[db]
+    if getattr(connection.features, 'can_return_ids_from_bulk_insert', False):
+        return _bulk_create(model, objs, db)
+
+    ids = reserve_ids(connection, model, len(objs))
+    if ids is None:
+        # save() sends post_save, which updates the stats
+        for obj in objs:
+            obj.save(using=db, force_insert=True)
+        return objs
+
+    for obj, pk in zip(objs, ids):
+        obj.pk = pk
+    return _bulk_create(model, objs, db)
+
+
+def _bulk_create(model, objs, db):
+    objs = model.objects.using(db).bulk_create(objs)
+    if model is Entry:
+        # bulk_create() sends no post_save
+        update_blog_stats(added=[obj.get_stats() for obj in objs], using=db)
+    return objs
+
+
+def bulk_delete(model, objs):
+    """Deletes loaded objects like QuerySet.delete(), cascades and signals
+       included, without selecting them again; the way Model.delete()
+       does for one. Updates the blog stats once per blog."""
+    db = router.db_for_write(model)
+    with batched_blog_stats(db):
+        collector = Collector(using=db)
+        collector.collect(objs)
+        return collector.delete()
+
+
+def bulk_set_entry_users(users_by_entry, clear=True):
+    """Replaces the users of many entries with two queries: one DELETE and
+       one batched INSERT on the through-table. Pass clear=False for new
+       entries, which have no users to delete yet.
+       `users_by_entry` maps entry ids to iterables of users.
+       Entry.updated_at is left alone: callers save the entries too.
+    """
+    through = Entry.users.through
+    if clear and users_by_entry:
+        # QuerySet.delete() would select the rows first, because of
+        # blog.signals' m2m_changed receivers
+        connection = connections[router.db_for_write(through)]
+        entry_ids = list(users_by_entry)
+        batch_size = connection.ops.bulk_batch_size(['entry_id'], entry_ids)
+        sql = 'DELETE FROM {} WHERE {} IN ({{}})'.format(
+            connection.ops.quote_name(through._meta.db_table),
+            connection.ops.quote_name(
+                through._meta.get_field('entry').column))
+        with connection.cursor() as cursor:
+            for start in range(0, len(entry_ids), batch_size):
+                batch = entry_ids[start:start + batch_size]
+                cursor.execute(sql.format(', '.join(['%s'] * len(batch))),
+                               batch)
+    through.objects.bulk_create(
+        through(entry_id=entry_id, user_id=user.pk)
+        for entry_id, users in users_by_entry.items()
+        for user in set(users))
+
+
+def bulk_insert_users(users):
+    """bulk_insert() for users, filling in the columns User.save() derives
+       from the others. Passwords must be hashed already."""
+    for user in users:
+        user.username_folded = fold(user.username)
+        if user.secretkey:
+            user.secretkey_digest = digest_secretkey(user.secretkey)
+            if getattr(settings, 'SECRETKEY_STORAGE', 'raw') == 'hmac':
+                user.secretkey = ''
+    return bulk_insert(User, users)
@@ -0,0 +1,255 @@
+import errno
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """Thread-safe, bounded in-process cache with LRU eviction and an
+       optional per-entry TTL (in seconds).
+
+       Keeps `hits`, `misses` and `evictions` counters so callers can
+       confirm the cache is actually absorbing traffic. `on_evict(key,
+       value)`, if given, is called (under the cache lock) for every entry
+       dropped other than by delete(): evicted, expired or cleared.
+    """
+
+    def __init__(self, max_size=1024, ttl=None, on_evict=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._lookup(key) is not None
+
+    def _lookup(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= time.time():
+            del self._data[key]
+            self._evicted(key, value)
+            return None
+        return entry
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            # re-insert to mark the key as most recently used
+            del self._data[key]
+            self._data[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, expires)
+            while len(self._data) > self.max_size:
+                evicted_key, (evicted, _) = self._data.popitem(last=False)
+                self.evictions += 1
+                self._evicted(evicted_key, evicted)
+
+    def _evicted(self, key, value):
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            items = list(self._data.items())
+            self._data.clear()
+            for key, (value, _) in items:
+                self._evicted(key, value)
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class FileCache(object):
+    """LRUCache's interface over one file per entry in `directory`, so the
+       entries are shared by every process of a host. Recency is the file
+       mtime, refreshed on reads. Keys must have a stable repr() and values
+       must be picklable.
+
+       The counters are per process.
+    """
+
+    def __init__(self, directory, max_size=1024, ttl=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def __len__(self):
+        return len(self._files())
+
+    def __contains__(self, key):
+        return self._load(key) is not None
+
+    def _path(self, key):
+        digest = hashlib.md5(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.cache')
+
+    def _files(self):
+        return [os.path.join(self.directory, name)
+                for name in os.listdir(self.directory)
+                if name.endswith('.cache')]
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, value, expires = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        if expires is not None and expires <= time.time():
+            self._remove(path)
+            return None
+        return path, value
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, key, default=None):
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        path, value = entry
+        try:
+            os.utime(path, None)  # mark as most recently used
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else None
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((key, value, expires), f, pickle.HIGHEST_PROTOCOL)
+        # atomic, readers see the old file or the new one
+        os.rename(tmp_path, self._path(key))
+        self._cull()
+
+    def _cull(self):
+        files = self._files()
+        if len(files) <= self.max_size:
+            return
+        by_age = []
+        for path in files:
+            try:
+                by_age.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        by_age.sort()
+        for mtime, path in by_age[:len(by_age) - self.max_size]:
+            self._remove(path)
+            with self._lock:
+                self.evictions += 1
+
+    def delete(self, key):
+        self._remove(self._path(key))
+
+    def clear(self):
+        for path in self._files():
+            self._remove(path)
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {
+            'size': len(self),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class TaggedCache(object):
+    """Wraps a cache (`entries`) so its entries can be dropped by tag.
+       Keys embed the current token of each of their tags, kept in the
+       `tokens` cache; invalidating a tag replaces its token, leaving the
+       old entries unreachable until they are evicted or expire. A lost
+       token only orphans entries too, so both caches may evict freely.
+
+       Build the key with key() before reading the data to cache, so a
+       write invalidating it in between isn't missed.
+    """
+
+    def __init__(self, entries, tokens):
+        self.entries = entries
+        self.tokens = tokens
+
+    def token(self, tag):
+        token = self.tokens.get(tag)
+        if token is None:
+            token = uuid.uuid4().hex
+            self.tokens.set(tag, token)
+        return token
+
+    def key(self, key, tags):
+        return (key,) + tuple(self.token(tag) for tag in tags)
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def set(self, key, value):
+        self.entries.set(key, value)
+
+    def invalidate(self, tag):
+        self.tokens.set(tag, uuid.uuid4().hex)
+
+    def clear(self):
+        self.entries.clear()
+        self.tokens.clear()
+
+    def stats(self):
+        return self.entries.stats()
@@ -0,0 +1,156 @@
+from django.db import connections
+from django.utils import six
+
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from blog.models import fold
+
+
+# must match the expression indexed by migration 0003_entry_search_index
+POSTGRESQL_ENTRY_DOCUMENT = (
+    "to_tsvector('english', blog_entry.headline || ' ' || "
+    "blog_entry.body_text)")
+
+# database alias -> whether blog_entry_fts exists there
+_sqlite_fts_tables = {}
+
+
+def sqlite_fts_query(terms):
+    """Builds an FTS5 query matching entries that contain every term (as a
+       prefix), quoting terms so user input can't inject FTS5 syntax."""
+    return ' '.join(
+        '"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def postgresql_tsquery(terms):
+    """Builds a to_tsquery() query matching entries that contain every term
+       (as a prefix), like sqlite_fts_query(). Terms are quoted so user
+       input can't inject tsquery syntax."""
+    return ' & '.join(
+        "'{}':*".format(term.replace('\\', '\\\\').replace("'", "''"))
+        for term in terms)
+
+
+def has_sqlite_fts_table(connection):
+    if connection.alias not in _sqlite_fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'blog_entry_fts'")
+            _sqlite_fts_tables[connection.alias] = bool(cursor.fetchone())
+    return _sqlite_fts_tables[connection.alias]
+
+
+class EntrySearchFilter(filters.SearchFilter):
+    """`?search=` over Entry headline and body_text backed by the full-text
+       index of migration 0003_entry_search_index: an FTS5 table on SQLite, a
+       GIN tsvector index on PostgreSQL. Results come ranked by relevance
+       unless an explicit `?ordering=` is given. Both match every term as
+       a word prefix; PostgreSQL also stems the terms with the 'english'
+       configuration and drops stop words, so it may match a few more
+       entries than SQLite. Falls back to SearchFilter LIKE lookups on
+       `search_fields` when there is no index.
+
+       Must be listed after OrderingFilter so the ranking is kept.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        connection = connections[queryset.db]
+        rank = api_settings.ORDERING_PARAM not in request.query_params
+        if connection.vendor == 'sqlite' and has_sqlite_fts_table(connection):
+            return self.filter_sqlite(queryset, terms, rank)
+        if connection.vendor == 'postgresql':
+            return self.filter_postgresql(queryset, terms, rank)
+        return super(EntrySearchFilter, self).filter_queryset(
+            request, queryset, view)
+
+    def filter_sqlite(self, queryset, terms, rank):
+        queryset = queryset.extra(
+            tables=['blog_entry_fts'],
+            where=['blog_entry_fts.rowid = blog_entry.id',
+                   'blog_entry_fts MATCH %s'],
+            params=[sqlite_fts_query(terms)])
+        if rank:
+            # bm25() based, lower is more relevant
+            queryset = queryset.extra(
+                select={'search_rank': 'blog_entry_fts.rank'},
+                order_by=['search_rank', 'id'])
+        return queryset
+
+    def filter_postgresql(self, queryset, terms, rank):
+        query = postgresql_tsquery(terms)
+        queryset = queryset.extra(
+            where=["{} @@ to_tsquery('english', %s)".format(
+                POSTGRESQL_ENTRY_DOCUMENT)],
+            params=[query])
+        if rank:
+            queryset = queryset.extra(
+                select={'search_rank': "ts_rank({}, to_tsquery("
+                                       "'english', %s))".format(
+                                           POSTGRESQL_ENTRY_DOCUMENT)},
+                select_params=[query],
+                order_by=['-search_rank', 'id'])
+        return queryset
+
+
+class PrefixSearchFilter(filters.SearchFilter):
+    """SearchFilter with an extra prefix mode: `?search=^foo` matches
+       objects whose view.prefix_search_field starts with `foo`,
+       case-insensitively. That field holds a case-folded, indexed copy of
+       the searched column, and the lookup is bounded to an index range
+       (`>= 'foo' AND < 'fop'`) so it never scans the table. Matches come
+       in index order unless an explicit `?ordering=` is given, so a page
+       is read straight off the index without sorting every match.
+       Any other search behaves like SearchFilter.
+
+       Must be listed after OrderingFilter so the index order is kept.
+    """
+    prefix = '^'
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, '').strip()
+        field = getattr(view, 'prefix_search_field', None)
+        if not field or not search.startswith(self.prefix):
+            return super(PrefixSearchFilter, self).filter_queryset(
+                request, queryset, view)
+
+        prefix = fold(search[len(self.prefix):])
+        if not prefix:
+            return queryset
+        upper_bound = prefix[:-1] + six.unichr(ord(prefix[-1]) + 1)
+        queryset = queryset.filter(**{
+            '{}__gte'.format(field): prefix,
+            '{}__lt'.format(field): upper_bound,
+            # the range alone may not be exact under non-C collations
+            '{}__startswith'.format(field): prefix,
+        })
+        if api_settings.ORDERING_PARAM not in request.query_params:
+            queryset = queryset.order_by(field, 'pk')
+        return queryset
+
+
+class IndexedOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter taking a single `?ordering=` field, with ties broken
+       by id in the same direction, so every one of `ordering_fields` reads
+       a page straight off a (field, id) index of the model (see Entry's
+       index_together) and pages are stable. Other fields are ignored.
+    """
+    tie_breaker = 'id'
+
+    def get_ordering(self, request, queryset, view):
+        params = request.query_params.get(self.ordering_param)
+        if params:
+            fields = self.remove_invalid_fields(
+                queryset, [param.strip() for param in params.split(',')],
+                view)
+            if fields:
+                field = fields[0]
+                if field.lstrip('-') in (self.tie_breaker, 'pk'):
+                    return (field,)
+                direction = '-' if field.startswith('-') else ''
+                return (field, direction + self.tie_breaker)
+        return self.get_default_ordering(view)
@@ -0,0 +1,126 @@
+import multiprocessing
+import threading
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.encoding import force_bytes
+from django.utils.translation import ugettext_noop as _
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """Django's PBKDF2 hasher with PASSWORD_PBKDF2_ITERATIONS iterations.
+       Hashes of any other count are upgraded on the next login."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS',
+                       hashers.PBKDF2PasswordHasher.iterations)
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """Django's bcrypt hasher (needs `bcrypt`) with PASSWORD_BCRYPT_ROUNDS
+       rounds. Hashes of any other cost are upgraded on the next login."""
+
+    @property
+    def rounds(self):
+        return getattr(settings, 'PASSWORD_BCRYPT_ROUNDS',
+                       hashers.BCryptSHA256PasswordHasher.rounds)
+
+
+class Argon2PasswordHasher(hashers.BasePasswordHasher):
+    """Argon2i (needs `argon2-cffi`), in the format of the hasher Django
+       ships from 1.10 on. The cost comes from PASSWORD_ARGON2_TIME_COST,
+       PASSWORD_ARGON2_MEMORY_COST (KiB) and PASSWORD_ARGON2_PARALLELISM;
+       hashes of any other cost are upgraded on the next login.
+    """
+    algorithm = 'argon2'
+    library = 'argon2'
+
+    def get_params(self):
+        return OrderedDict([
+            ('m', getattr(settings, 'PASSWORD_ARGON2_MEMORY_COST', 512)),
+            ('t', getattr(settings, 'PASSWORD_ARGON2_TIME_COST', 2)),
+            ('p', getattr(settings, 'PASSWORD_ARGON2_PARALLELISM', 2)),
+        ])
+
+    def decode(self, encoded):
+        """Returns the (params, salt, hash) of an encoded password"""
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        raw_params, salt, data = rest.rsplit('$', 3)[-3:]
+        params = dict((name, int(value)) for name, value in (
+            item.split('=') for item in raw_params.split(',')))
+        return params, salt, data
+
+    def encode(self, password, salt):
+        argon2 = self._load_library()
+        params = self.get_params()
+        data = argon2.low_level.hash_secret(
+            force_bytes(password), force_bytes(salt),
+            time_cost=params['t'], memory_cost=params['m'],
+            parallelism=params['p'], hash_len=16,
+            type=argon2.low_level.Type.I)
+        return self.algorithm + data.decode('ascii')
+
+    def verify(self, password, encoded):
+        argon2 = self._load_library()
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        try:
+            return argon2.low_level.verify_secret(
+                force_bytes('$' + rest), force_bytes(password),
+                type=argon2.low_level.Type.I)
+        except argon2.exceptions.VerificationError:
+            return False
+
+    def safe_summary(self, encoded):
+        params, salt, data = self.decode(encoded)
+        return OrderedDict([
+            (_('algorithm'), self.algorithm),
+            (_('memory cost'), params['m']),
+            (_('time cost'), params['t']),
+            (_('parallelism'), params['p']),
+            (_('salt'), hashers.mask_hash(salt)),
+            (_('hash'), hashers.mask_hash(data)),
+        ])
+
+    def must_update(self, encoded):
+        params, salt, data = self.decode(encoded)
+        return params != dict(self.get_params())
+
+
+_pool = None
+_pool_threads = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(threads):
+    global _pool, _pool_threads
+    with _pool_lock:
+        if _pool is None or _pool_threads != threads:
+            if _pool is not None:
+                _pool.close()
+            _pool = ThreadPool(threads)
+            _pool_threads = threads
+        return _pool
+
+
+def make_passwords(passwords):
+    """make_password() for many passwords, spread over a pool of
+       PASSWORD_HASHING_THREADS threads (one per CPU when None, none when 0)
+       so a bulk import isn't bound to a single core. The PBKDF2 (hashlib),
+       bcrypt and argon2 hashers all release the GIL while hashing, and
+       threads don't fork the web server process.
+    """
+    passwords = list(passwords)
+    threads = getattr(settings, 'PASSWORD_HASHING_THREADS', None)
+    if threads is None:
+        threads = multiprocessing.cpu_count()
+    if threads < 2 or len(passwords) < 2:
+        return [hashers.make_password(password) for password in passwords]
+
+    chunksize = max(1, len(passwords) // (threads * 4))
+    return get_pool(threads).map(hashers.make_password, passwords,
+                                 chunksize)
@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+# upper bounds (in ms) of the latency histogram buckets, the last one is open
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+PHASES = ('authentication', 'permissions', 'serialization', 'rendering')
+
+# most recent sampled requests, one dict each (see Record.sample)
+samples = deque(maxlen=getattr(settings, 'INSTRUMENTATION_BUFFER_SIZE',
+                               10000))
+
+_local = threading.local()
+
+
+class Record(object):
+    """Timings of one sampled request"""
+
+    def __init__(self):
+        self.start = time.time()
+        self.phases = dict((phase, 0.0) for phase in PHASES)
+        self.depths = dict((phase, 0) for phase in PHASES)
+        self.render_start = None
+        # alias -> (connection, previous queries_log, previous debug flag)
+        self.connections = {}
+
+    def capture_queries(self):
+        """Logs the queries of this request apart, without disturbing the
+           connection's own log (eg: DEBUG or assertNumQueries)"""
+        for connection in connections.all():
+            self.connections[connection.alias] = (
+                connection, connection.queries_log,
+                connection.force_debug_cursor)
+            connection.queries_log = deque(
+                maxlen=connection.queries_log.maxlen)
+            connection.force_debug_cursor = True
+
+    def release_queries(self):
+        """Restores the connections, returns the queries run meanwhile"""
+        queries = []
+        for connection, queries_log, force_debug_cursor in (
+                self.connections.values()):
+            queries.extend(connection.queries_log)
+            queries_log.extend(connection.queries_log)
+            connection.queries_log = queries_log
+            connection.force_debug_cursor = force_debug_cursor
+        self.connections = {}
+        return queries
+
+    def sample(self, request, response):
+        queries = self.release_queries()
+        resolver_match = getattr(request, 'resolver_match', None)
+        if self.render_start is not None:
+            self.phases['rendering'] += time.time() - self.render_start
+        return {
+            'route': resolver_match.view_name if resolver_match else None,
+            'method': request.method,
+            'status': response.status_code,
+            'duration': time.time() - self.start,
+            'queries': len(queries),
+            'sql_time': sum(float(query['time']) for query in queries),
+            'phases': self.phases,
+        }
+
+
+@contextmanager
+def timed(phase):
+    """Adds the time spent in the block to `phase` of the current request,
+       when it is sampled. Nested blocks of the same phase count once."""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        yield
+        return
+
+    record.depths[phase] += 1
+    start = time.time()
+    try:
+        yield
+    finally:
+        record.depths[phase] -= 1
+        if not record.depths[phase]:
+            record.phases[phase] += time.time() - start
+
+
+class InstrumentationMiddleware(object):
+    """Records the duration, query count, SQL time and the time spent in
+       each of PHASES of a random INSTRUMENTATION_SAMPLE_RATE share of the
+       requests, into `samples`. Unsampled requests only cost a random().
+
+       Should come first in MIDDLEWARE_CLASSES. Queries run while a
+       streaming response is consumed aren't counted.
+    """
+
+    def process_request(self, request):
+        _local.record = None
+        rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0.01)
+        if not rate or random.random() >= rate:
+            return None
+        record = Record()
+        record.capture_queries()
+        request._instrumentation = _local.record = record
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this, before
+        # process_response()
+        record = getattr(request, '_instrumentation', None)
+        if record is not None:
+            record.render_start = time.time()
+        return response
+
+    def process_response(self, request, response):
+        record = getattr(request, '_instrumentation', None)
+        if record is None:
+            return response
+        _local.record = None
+        del request._instrumentation
+        samples.append(record.sample(request, response))
+        return response
+
+
+def get_stats():
+    """Aggregates `samples` per route and method"""
+    routes = OrderedDict()
+    for sample in sorted(list(samples),
+                         key=lambda s: (s['route'] or '', s['method'])):
+        key = '{} {}'.format(sample['method'], sample['route'])
+        stats = routes.get(key)
+        if stats is None:
+            stats = routes[key] = OrderedDict([
+                ('count', 0),
+                ('latency_histogram', OrderedDict(
+                    [(str(bound), 0) for bound in LATENCY_BUCKETS] +
+                    [('inf', 0)])),
+                ('latency_ms', 0.0),
+                ('queries', 0),
+                ('sql_ms', 0.0),
+                ('phases_ms', OrderedDict(
+                    (phase, 0.0) for phase in PHASES)),
+            ])
+
+        duration = sample['duration'] * 1000
+        stats['count'] += 1
+        bucket = next((str(bound) for bound in LATENCY_BUCKETS
+                       if duration <= bound), 'inf')
+        stats['latency_histogram'][bucket] += 1
+        stats['latency_ms'] += duration
+        stats['queries'] += sample['queries']
+        stats['sql_ms'] += sample['sql_time'] * 1000
+        for phase in PHASES:
+            stats['phases_ms'][phase] += sample['phases'][phase] * 1000
+
+    # totals -> means per request
+    for stats in routes.values():
+        count = stats['count']
+        stats['latency_ms'] = round(stats['latency_ms'] / count, 3)
+        stats['queries'] = round(float(stats['queries']) / count, 3)
+        stats['sql_ms'] = round(stats['sql_ms'] / count, 3)
+        for phase in PHASES:
+            stats['phases_ms'][phase] = round(
+                stats['phases_ms'][phase] / count, 3)
+
+    return OrderedDict([
+        ('sample_rate', getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE',
+                                0.01)),
+        ('samples', len(samples)),
+        ('routes', routes),
+    ])
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from blog.stats import rebuild_blog_stats
+
+
+class Command(BaseCommand):
+    help = ('Recomputes the entry count, total comments and total scoring '
+            'of every blog from its entries.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to rebuild the stats of. Defaults to "default".')
+
+    def handle(self, *args, **options):
+        count = rebuild_blog_stats(options['database'])
+        if options['verbosity'] > 0:
+            self.stdout.write(
+                'Rebuilt the stats of {} blogs with entries.'.format(count))
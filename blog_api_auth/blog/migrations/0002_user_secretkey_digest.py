@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9 on 2026-10-17 22:07
+from __future__ import unicode_literals
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import migrations, models
+
+
+def digest_secretkey(value):
+    """blog.models.digest_secretkey as of this migration"""
+    key = getattr(settings, 'SECRETKEY_HMAC_KEY', None)
+    if not key:
+        raise ImproperlyConfigured(
+            'SECRETKEY_HMAC_KEY must be set in the environment to a key of '
+            'its own.')
+    return hmac.new(key.encode('utf-8'), value.encode('utf-8'),
+                    hashlib.sha256).hexdigest()
+
+
+def backfill_secretkey_digest(apps, schema_editor):
+    User = apps.get_model('blog', 'User')
+    for user in User.objects.exclude(secretkey='').only('id', 'secretkey'):
+        User.objects.filter(id=user.id).update(
+            secretkey_digest=digest_secretkey(user.secretkey))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='secretkey_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.RunPython(backfill_secretkey_digest,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, transaction, DatabaseError
+
+
+SQLITE_TRIGGERS = (
+    "CREATE TRIGGER blog_entry_fts_insert AFTER INSERT ON blog_entry BEGIN "
+    "INSERT INTO blog_entry_fts(rowid, headline, body_text) "
+    "VALUES (new.id, new.headline, new.body_text); END",
+    "CREATE TRIGGER blog_entry_fts_delete AFTER DELETE ON blog_entry BEGIN "
+    "INSERT INTO blog_entry_fts(blog_entry_fts, rowid, headline, body_text) "
+    "VALUES ('delete', old.id, old.headline, old.body_text); END",
+    # only edits of the indexed columns need the index rewritten
+    "CREATE TRIGGER blog_entry_fts_update "
+    "AFTER UPDATE OF headline, body_text ON blog_entry BEGIN "
+    "INSERT INTO blog_entry_fts(blog_entry_fts, rowid, headline, body_text) "
+    "VALUES ('delete', old.id, old.headline, old.body_text); "
+    "INSERT INTO blog_entry_fts(rowid, headline, body_text) "
+    "VALUES (new.id, new.headline, new.body_text); END",
+)
+
+SQLITE_FORWARD = (
+    # external content table: the text itself stays in blog_entry
+    "CREATE VIRTUAL TABLE blog_entry_fts USING fts5("
+    "headline, body_text, content='blog_entry', content_rowid='id')",
+) + SQLITE_TRIGGERS + (
+    "INSERT INTO blog_entry_fts(blog_entry_fts) VALUES ('rebuild')",
+)
+
+SQLITE_BACKWARD = (
+    "DROP TRIGGER IF EXISTS blog_entry_fts_insert",
+    "DROP TRIGGER IF EXISTS blog_entry_fts_delete",
+    "DROP TRIGGER IF EXISTS blog_entry_fts_update",
+    "DROP TABLE IF EXISTS blog_entry_fts",
+)
+
+POSTGRESQL_FORWARD = (
+    "CREATE INDEX blog_entry_search_idx ON blog_entry USING gin("
+    "to_tsvector('english', headline || ' ' || body_text))",
+)
+
+POSTGRESQL_BACKWARD = (
+    "DROP INDEX IF EXISTS blog_entry_search_idx",
+)
+
+
+def run(statements, schema_editor):
+    for sql in statements.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    statements = {
+        'sqlite': SQLITE_FORWARD,
+        'postgresql': POSTGRESQL_FORWARD,
+    }
+    connection = schema_editor.connection
+    try:
+        with transaction.atomic(using=connection.alias):
+            run(statements, schema_editor)
+    except DatabaseError as e:
+        # SQLite built without FTS5: search falls back to LIKE scans
+        if (connection.vendor != 'sqlite' or
+                'no such module: fts5' not in str(e)):
+            raise
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {
+        'sqlite': SQLITE_BACKWARD,
+        'postgresql': POSTGRESQL_BACKWARD,
+    }
+    run(statements, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_user_secretkey_digest'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+from blog.models import fold
+
+
+def backfill_folded_columns(apps, schema_editor):
+    using = schema_editor.connection.alias
+    for model, field, folded in (('User', 'username', 'username_folded'),
+                                 ('Blog', 'name', 'name_folded')):
+        objects = apps.get_model('blog', model).objects.using(using)
+        objects.update(**{folded: Lower(field)})
+        if schema_editor.connection.vendor == 'sqlite':
+            # SQLite's lower() only folds ASCII letters
+            non_ascii = objects.extra(
+                where=["{} GLOB '*[^ -~]*'".format(field)])
+            for pk, value in non_ascii.values_list('pk', field):
+                objects.filter(pk=pk).update(**{folded: fold(value)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_entry_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='name_folded',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='username_folded',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=30),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_folded_columns,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from importlib import import_module
+
+from django.db import migrations
+
+updated_at = import_module('blog.migrations.0005_updated_at')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_updated_at'),
+    ]
+
+    operations = [
+        # SQLite rebuilds blog_entry to alter index_together, either way
+        migrations.RunPython(migrations.RunPython.noop,
+                             updated_at.restore_search_triggers),
+        migrations.AlterIndexTogether(
+            name='entry',
+            index_together=set([('pub_date', 'id'), ('mod_date', 'id'), ('scoring', 'id'), ('number_comments', 'id')]),
+        ),
+        migrations.RunPython(updated_at.restore_search_triggers,
+                             migrations.RunPython.noop),
+        # the entries of a user (eg: on user delete) straight off the
+        # index; the unique (entry_id, user_id) one only serves per entry
+        # lookups such as IsOwnerOrReadOnly's
+        migrations.RunSQL(
+            ['CREATE INDEX blog_entry_users_user_id_entry_id '
+             'ON blog_entry_users (user_id, entry_id)'],
+            ['DROP INDEX blog_entry_users_user_id_entry_id']),
+    ]
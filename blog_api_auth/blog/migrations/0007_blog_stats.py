@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_blog_stats(apps, schema_editor):
+    """As blog.stats.rebuild_blog_stats, on the historical models"""
+    Blog = apps.get_model('blog', 'Blog')
+    Entry = apps.get_model('blog', 'Entry')
+    using = schema_editor.connection.alias
+    rows = Entry.objects.using(using).order_by().values('blog_id').annotate(
+        count=Count('pk'), comments=Sum('number_comments'),
+        scoring=Sum('scoring'))
+    for row in rows:
+        Blog.objects.using(using).filter(pk=row['blog_id']).update(
+            entry_count=row['count'], total_comments=row['comments'],
+            total_scoring=row['scoring'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_entry_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='entry_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='total_comments',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blog',
+            name='total_scoring',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(fill_blog_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from importlib import import_module
+
+from django.db import migrations
+
+search_index = import_module('blog.migrations.0003_entry_search_index')
+
+OLD_SQLITE_UPDATE_TRIGGER = (
+    "CREATE TRIGGER blog_entry_fts_update AFTER UPDATE ON blog_entry BEGIN "
+    "INSERT INTO blog_entry_fts(blog_entry_fts, rowid, headline, body_text) "
+    "VALUES ('delete', old.id, old.headline, old.body_text); "
+    "INSERT INTO blog_entry_fts(rowid, headline, body_text) "
+    "VALUES (new.id, new.headline, new.body_text); END")
+
+
+def replace_update_trigger(sql):
+    def replace(apps, schema_editor):
+        """Swaps the blog_entry_fts_update trigger of databases migrated
+           before it was limited to headline and body_text updates"""
+        connection = schema_editor.connection
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND "
+                "name = 'blog_entry_fts_update'")
+            if cursor.fetchone() is None:
+                return
+        schema_editor.execute("DROP TRIGGER blog_entry_fts_update")
+        schema_editor.execute(sql)
+    return replace
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_blog_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            replace_update_trigger(search_index.SQLITE_TRIGGERS[2]),
+            replace_update_trigger(OLD_SQLITE_UPDATE_TRIGGER)),
+    ]
@@ -0,0 +1,310 @@
+import calendar
+import hashlib
+import os
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import six
+from django.utils.cache import get_conditional_response
+from django.utils.http import (
+    http_date, quote_etag, parse_etags, parse_http_date_safe, urlencode)
+
+from rest_framework import mixins, permissions
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+
+from blog import routers
+from blog.authentication import ACCESSKEY_PARAM
+from blog.cache import LRUCache, FileCache, TaggedCache
+from blog.instrumentation import timed
+from blog.serializers import CompactListSerializer
+
+
+def get_response_cache():
+    """Returns the cache for RESPONSE_CACHE_BACKEND: 'file' (in
+       RESPONSE_CACHE_DIR, shared by the processes of a host), 'memory' (per
+       process, only invalidated by the writes of that process) or None
+       (disabled)"""
+    backend = getattr(settings, 'RESPONSE_CACHE_BACKEND', 'file')
+    size = getattr(settings, 'RESPONSE_CACHE_SIZE', 1024)
+    ttl = getattr(settings, 'RESPONSE_CACHE_TTL', 60)
+    if backend == 'memory':
+        return TaggedCache(LRUCache(size, ttl), LRUCache(size))
+    if backend == 'file':
+        directory = settings.RESPONSE_CACHE_DIR
+        return TaggedCache(
+            FileCache(os.path.join(directory, 'responses'), size, ttl),
+            FileCache(os.path.join(directory, 'tokens'), size))
+    return None
+
+
+# rendered responses of CachedResponseMixin views, tagged by model label
+response_cache = get_response_cache()
+
+
+def invalidate_responses(model, using=None):
+    """Drops the cached responses depending on model"""
+    if response_cache is None:
+        return
+    tag = model._meta.label_lower
+    response_cache.invalidate(tag)
+    # again once committed: a concurrent reader may have cached the rows
+    # as they were before this write
+    transaction.on_commit(lambda: response_cache.invalidate(tag), using)
+
+
+def wrote_recently(request):
+    """Tells whether, with a DATABASE_REPLICA, the client made a write in
+       the last DATABASE_REPLICA_LAG seconds: it sends the PRIMARY_COOKIE
+       back, or its accesskey is pinned (see blog.routers)"""
+    return routers.get_replica() is not None and (
+        routers.PRIMARY_COOKIE in request.COOKIES or
+        routers.is_pinned(request.GET.get(ACCESSKEY_PARAM)))
+
+
+class CompactListModelMixin(mixins.ListModelMixin):
+    """ListModelMixin serializing pages through CompactListSerializer, which
+       renders the same output as the view's serializer from `.values()`
+       rows. Set COMPACT_LIST_SERIALIZERS = False to go back to the regular
+       serializer.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if getattr(settings, 'COMPACT_LIST_SERIALIZERS', True):
+            serializer = CompactListSerializer(self.get_serializer_class(),
+                                               self.get_serializer_context())
+            queryset = serializer.get_queryset(
+                queryset, *self.get_list_columns())
+            serialize = serializer.to_representation
+        else:
+            def serialize(rows):
+                return self.get_serializer(rows, many=True).data
+
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return self.get_list_response(list(queryset), serialize, False)
+        return self.get_list_response(page, serialize, True)
+
+    def get_list_columns(self):
+        """Columns the `.values()` rows need besides the serialized ones"""
+        return ()
+
+    def get_list_response(self, rows, serialize, paginated):
+        if paginated:
+            return self.get_paginated_response(serialize(rows))
+        return Response(serialize(rows))
+
+
+class ConditionalGetMixin(object):
+    """Answers If-None-Match (and If-Modified-Since on detail views) with a
+       304 before anything is serialized. Validators come from the model's
+       `updated_at`: the object's own on retrieve; on list, the `updated_at`
+       of every row in the page plus the count and links of the paginator,
+       so no query is added.
+
+       Lists carry no Last-Modified, as a delete doesn't move the latest
+       `updated_at`. Must come before CompactListModelMixin.
+    """
+    updated_at_field = 'updated_at'
+
+    def get_etag(self, *parts):
+        # representations depend on the url (hyperlinks, pagination) and
+        # the negotiated format, but not on who asks
+        uri = remove_query_param(self.request.build_absolute_uri(),
+                                 ACCESSKEY_PARAM)
+        key = [uri, self.request.accepted_media_type]
+        key.extend(six.text_type(part) for part in parts)
+        return hashlib.md5('|'.join(key).encode('utf-8')).hexdigest()
+
+    def set_validators(self, response, etag, last_modified=None):
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        updated_at = getattr(instance, self.updated_at_field)
+        etag = self.get_etag(updated_at.isoformat())
+        last_modified = calendar.timegm(updated_at.utctimetuple())
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return self.set_validators(response, etag, last_modified)
+
+    def get_list_columns(self):
+        return tuple(super(ConditionalGetMixin, self).get_list_columns()) + (
+            self.updated_at_field,)
+
+    def get_list_response(self, rows, serialize, paginated):
+        parts = []
+        for row in rows:
+            if isinstance(row, dict):
+                parts.extend((row['pk'], row[self.updated_at_field]))
+            else:
+                parts.extend((row.pk, getattr(row, self.updated_at_field)))
+        if paginated:
+            parts.extend((getattr(self.paginator, 'count', None),
+                          self.paginator.get_next_link(),
+                          self.paginator.get_previous_link()))
+        etag = self.get_etag(*parts)
+
+        response = get_conditional_response(self.request, etag=etag)
+        if response is None:
+            response = super(ConditionalGetMixin, self).get_list_response(
+                rows, serialize, paginated)
+        return self.set_validators(response, etag)
+
+
+class CachedResponseMixin(object):
+    """Caches the rendered list and retrieve responses of views whose
+       output is the same for every reader: the key is the url minus the
+       accesskey param, plus the negotiated media type. Entries are dropped
+       on any write to `cache_models` (see blog.signals) and only kept for
+       `cached_formats` (the browsable API shows who is logged in).
+
+       Authentication and permissions still run on hits, but
+       has_object_permission() doesn't: reads must be allowed on every
+       object. The requester's accesskey is put back in pagination links.
+       Clients which wrote recently (see ReplicaReadMixin) skip the cache,
+       so they read their writes even from a process that cached the rows
+       before them. Must come before ConditionalGetMixin.
+    """
+    cache_models = ()
+    cached_formats = ('json',)
+    cached_headers = ('Content-Type', 'ETag', 'Last-Modified', 'Allow',
+                      'Vary')
+    # stands for the accesskey in cached bodies, never part of JSON output
+    accesskey_marker = b'\x00'
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super(CachedResponseMixin, self).list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super(CachedResponseMixin, self).retrieve,
+            request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        params = sorted(
+            ((name, value)
+             for name, values in request.query_params.lists()
+             for value in values if name != ACCESSKEY_PARAM),
+            key=itemgetter(0))
+        return (request.scheme, request.get_host(), request.path,
+                tuple(params), request.accepted_media_type)
+
+    def get_accesskey_param(self, request):
+        accesskey = request.query_params.get(ACCESSKEY_PARAM)
+        if not accesskey:
+            return None
+        return urlencode({ACCESSKEY_PARAM: accesskey}).encode('ascii')
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if (response_cache is None or
+                request.accepted_renderer.format not in self.cached_formats or
+                wrote_recently(request)):
+            return handler(request, *args, **kwargs)
+
+        key = response_cache.key(
+            self.get_cache_key(request),
+            [model._meta.label_lower for model in self.cache_models])
+        accesskey_param = self.get_accesskey_param(request)
+        marker = ACCESSKEY_PARAM.encode('ascii') + b'=' + self.accesskey_marker
+
+        cached = response_cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            # once invalidated, not filled again from a lagging replica
+            if (response.status_code == 200 and
+                    not routers.may_be_stale(self.cache_models)):
+                content = self.render(response)
+                if accesskey_param:
+                    content = content.replace(accesskey_param, marker)
+                # finalize_response() adds the view's headers (Allow,
+                # Vary) after this
+                headers = dict(self.headers)
+                headers.update(response.items())
+                response_cache.set(key, (content, dict(
+                    (header, headers[header])
+                    for header in self.cached_headers if header in headers)))
+            response['X-Cache'] = 'MISS'
+            return response
+
+        content, headers = cached
+        if accesskey_param:
+            content = content.replace(marker, accesskey_param)
+        response = HttpResponse(content)
+        for header, value in headers.items():
+            response[header] = value
+        response['X-Cache'] = 'HIT'
+
+        etag = headers.get('ETag')
+        conditional_response = get_conditional_response(
+            request, etag=etag and parse_etags(etag)[0],
+            last_modified=parse_http_date_safe(
+                headers.get('Last-Modified', '')),
+            response=response)
+        if conditional_response is not response:
+            # a 304, which still carries the validators
+            for header in ('ETag', 'Last-Modified'):
+                if header in headers:
+                    conditional_response[header] = headers[header]
+        return conditional_response
+
+    def render(self, response):
+        """Renders response as finalize_response() would, returns the body"""
+        response.accepted_renderer = self.request.accepted_renderer
+        response.accepted_media_type = self.request.accepted_media_type
+        response.renderer_context = self.get_renderer_context()
+        with timed('rendering'):
+            return response.render().content
+
+
+class ReplicaReadMixin(object):
+    """Runs the reads of safe requests on the DATABASE_REPLICA, those of
+       authentication included, unless the client made a write in the
+       last DATABASE_REPLICA_LAG seconds: it sends the PRIMARY_COOKIE back,
+       or its accesskey is pinned (see blog.routers). Other requests stay
+       on the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        accesskey = request.GET.get(ACCESSKEY_PARAM)
+        safe = request.method in permissions.SAFE_METHODS
+        pinned = wrote_recently(request)
+        with routers.replica_reads(safe and not pinned):
+            response = super(ReplicaReadMixin, self).dispatch(
+                request, *args, **kwargs)
+        if (not safe and response.status_code < 400 and
+                routers.get_replica() is not None):
+            response.set_cookie(
+                routers.PRIMARY_COOKIE, '1', httponly=True,
+                max_age=getattr(settings, 'DATABASE_REPLICA_LAG', 5))
+            if accesskey:
+                routers.pin_primary(accesskey)
+        return response
+
+
+class InstrumentedViewMixin(object):
+    """Times authentication and permission checks as phases of sampled
+       requests (see blog.instrumentation)"""
+
+    def perform_authentication(self, request):
+        with timed('authentication'):
+            super(InstrumentedViewMixin, self).perform_authentication(request)
+
+    def check_permissions(self, request):
+        with timed('permissions'):
+            super(InstrumentedViewMixin, self).check_permissions(request)
+
+    def check_object_permissions(self, request, obj):
+        with timed('permissions'):
+            super(InstrumentedViewMixin, self).check_object_permissions(
+                request, obj)
@@ -1,8 +1,12 @@
 
 from __future__ import unicode_literals
 
-from django.db import models
-from django.core.exceptions import ValidationError
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.contrib.auth.models import AbstractUser
 
 
@@ -13,26 +17,135 @@ def validate_authkey(value):
             'Value must be a string containing 32 alphanumeric characters')
 
 
+def digest_secretkey(value):
+    """Returns the HMAC-SHA256 hex digest of given secretkey, keyed with
+       settings.SECRETKEY_HMAC_KEY. That key is required: falling back to
+       SECRET_KEY would lock every user out when SECRET_KEY is rotated."""
+    key = getattr(settings, 'SECRETKEY_HMAC_KEY', None)
+    if not key:
+        raise ImproperlyConfigured(
+            'SECRETKEY_HMAC_KEY must be set in the environment to a key of '
+            'its own.')
+    return hmac.new(key.encode('utf-8'), value.encode('utf-8'),
+                    hashlib.sha256).hexdigest()
+
+
+def fold(value):
+    """Case-folds given value for the indexed prefix search columns"""
+    return value.lower()
+
+
+def add_update_field(kwargs, field, derived):
+    """Makes a save(update_fields=...) touching `field` also write the
+       `derived` field computed from it"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and field in update_fields:
+        kwargs['update_fields'] = set(update_fields) | {derived}
+
+
+def add_updated_at(kwargs):
+    """Makes a save(update_fields=...) also write `updated_at`"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields:
+        kwargs['update_fields'] = set(update_fields) | {'updated_at'}
+
+
 class User(AbstractUser):
 
     accesskey = models.CharField(max_length=32, unique=True,
                                  validators=[validate_authkey])
     secretkey = models.CharField(max_length=32,
                                  validators=[validate_authkey])
+    secretkey_digest = models.CharField(max_length=64, blank=True,
+                                        editable=False)
+    # case-folded username, for indexed prefix searches
+    username_folded = models.CharField(max_length=30, db_index=True,
+                                       editable=False)
+    # validator for conditional GETs (see blog.mixins.ConditionalGetMixin)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __unicode__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        """Keeps username_folded and secretkey_digest in sync. When
+           settings.SECRETKEY_STORAGE is 'hmac' only the digest is written
+           to the database; the raw secretkey stays on this instance.
+        """
+        self.username_folded = fold(self.username)
+        add_update_field(kwargs, 'username', 'username_folded')
+        add_updated_at(kwargs)
+
+        secretkey = self.secretkey
+        if secretkey:
+            self.secretkey_digest = digest_secretkey(secretkey)
+            add_update_field(kwargs, 'secretkey', 'secretkey_digest')
+            if getattr(settings, 'SECRETKEY_STORAGE', 'raw') == 'hmac':
+                self.secretkey = ''
+        try:
+            super(User, self).save(*args, **kwargs)
+        finally:
+            self.secretkey = secretkey
+
     __str__ = __unicode__
 
 
+class StatsQuerySet(models.QuerySet):
+    """QuerySet whose delete() updates the blog stats once per blog (see
+       blog.stats.batched_blog_stats)"""
+
+    def delete(self):
+        from blog.stats import batched_blog_stats
+        with batched_blog_stats(self.db):
+            return super(StatsQuerySet, self).delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Blog(models.Model):
     name = models.CharField(max_length=100)
+    # case-folded name, for indexed prefix searches
+    name_folded = models.CharField(max_length=100, db_index=True,
+                                   editable=False)
     tagline = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # stats of the blog's entries, kept up to date by blog.stats
+    entry_count = models.IntegerField(default=0, editable=False)
+    total_comments = models.IntegerField(default=0, editable=False)
+    total_scoring = models.DecimalField(max_digits=12, decimal_places=2,
+                                        default=0, editable=False)
+
+    objects = StatsQuerySet.as_manager()
+
+    # only ever written by blog.stats, never from a (possibly stale) instance
+    stats_fields = ('entry_count', 'total_comments', 'total_scoring')
 
     def __unicode__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.name_folded = fold(self.name)
+        if (self.pk is not None and not self._state.adding and
+                not kwargs.get('force_insert')):
+            # the UPDATE of a save() leaves the stats alone, inserts set them
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name
+                                 for field in self._meta.concrete_fields
+                                 if not field.primary_key]
+            kwargs['update_fields'] = (
+                set(update_fields) - set(self.stats_fields))
+        add_update_field(kwargs, 'name', 'name_folded')
+        add_updated_at(kwargs)
+        super(Blog, self).save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        from blog.stats import batched_blog_stats
+        with batched_blog_stats(
+                using or router.db_for_write(Blog, instance=self)):
+            return super(Blog, self).delete(using, keep_parents)
+
     __str__ = __unicode__
 
 
@@ -45,8 +158,52 @@ class Entry(models.Model):
     users = models.ManyToManyField(User)
     number_comments = models.IntegerField()
     scoring = models.DecimalField(max_digits=3, decimal_places=2)
+    # unlike mod_date, precise enough to tell every change apart; also
+    # bumped when `users` change (see blog.signals)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = StatsQuerySet.as_manager()
+
+    class Meta:
+        # one per EntryViewSet.ordering_fields, ties broken by id (see
+        # blog.filters.IndexedOrderingFilter)
+        index_together = (
+            ('pub_date', 'id'),
+            ('mod_date', 'id'),
+            ('scoring', 'id'),
+            ('number_comments', 'id'),
+        )
+
+    # what an entry adds to the stats of its blog (see blog.stats)
+    stats_fields = ('blog_id', 'number_comments', 'scoring')
 
     def __unicode__(self):
         return self.headline
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Entry, cls).from_db(db, field_names, values)
+        # the stats_fields as stored, which a delete takes back from the
+        # blog stats (saves read them again, see blog.signals)
+        if set(cls.stats_fields).issubset(field_names):
+            instance._stored_stats = instance.get_stats()
+        return instance
+
+    def get_stats(self):
+        return tuple(getattr(self, field) for field in self.stats_fields)
+
+    def save(self, *args, **kwargs):
+        add_updated_at(kwargs)
+        # along with the blog stats (see blog.signals)
+        using = kwargs.get('using') or router.db_for_write(
+            Entry, instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super(Entry, self).save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        from blog.stats import batched_blog_stats
+        with batched_blog_stats(
+                using or router.db_for_write(Entry, instance=self)):
+            return super(Entry, self).delete(using, keep_parents)
+
     __str__ = __unicode__
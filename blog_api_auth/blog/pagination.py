@@ -0,0 +1,190 @@
+from collections import OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import connections, DatabaseError
+from django.utils import six
+
+from rest_framework import pagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from blog import routers
+from blog.cache import LRUCache
+
+
+# (model, generation, count SQL) -> row count
+count_cache = LRUCache(
+    max_size=getattr(settings, 'PAGINATION_COUNT_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'PAGINATION_COUNT_CACHE_TTL', 10))
+
+# model label -> generation, bumped on every save/delete of that model so
+# cached counts are dropped without scanning the cache
+_count_generations = defaultdict(int)
+
+
+def invalidate_counts(model):
+    _count_generations[model._meta.label_lower] += 1
+
+
+def estimate_count(queryset):
+    """Returns the planner's row estimate for an unfiltered queryset, or
+       None when it has filters or the backend has no statistics.
+    """
+    if queryset.query.where:
+        return None
+
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [table])
+            elif connection.vendor == 'sqlite':
+                # only populated once ANALYZE has run
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+
+    if row is None:
+        return None
+    count = int(str(row[0]).split()[0].split('.')[0])
+    return count if count >= 0 else None
+
+
+class CachedCountLimitOffsetPagination(pagination.LimitOffsetPagination):
+    """LimitOffsetPagination whose COUNT(*) is cached per model and query
+       for a short TTL and dropped on save/delete of the model.
+
+       The `count` query param selects how the total is computed:
+         - `exact` (default): cached COUNT(*)
+         - `estimated`: planner statistics, falling back to `exact`
+         - `none`: no count at all, the field is left out of the response
+    """
+    count_query_param = 'count'
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'none':
+            return None
+        if mode == 'estimated':
+            count = estimate_count(queryset)
+            if count is not None:
+                return count
+
+        label = queryset.model._meta.label_lower
+        key = (label, _count_generations[label], str(queryset.query))
+        count = count_cache.get(key)
+        if count is None:
+            count = queryset.count()
+            # a lagging replica's count would outlive the next replication
+            if not routers.may_be_stale((queryset.model,)):
+                count_cache.set(key, count)
+        return count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.count = self.get_count(queryset, request)
+        self.request = request
+        if (self.count is not None and self.count > self.limit and
+                self.template is not None):
+            self.display_page_controls = True
+
+        # one extra row tells whether there is a next page, whatever the
+        # (possibly cached, estimated or missing) count says
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_paginated_response(self, data):
+        if self.count is None:
+            return Response(OrderedDict([
+                ('next', self.get_next_link()),
+                ('previous', self.get_previous_link()),
+                ('results', data)
+            ]))
+        return super(CachedCountLimitOffsetPagination,
+                     self).get_paginated_response(data)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        offset = self.offset + self.limit
+        return replace_query_param(url, self.offset_query_param, offset)
+
+
+class IdCursorPagination(pagination.CursorPagination):
+    """Keyset pagination on `id` (or the view's OrderingFilter ordering).
+       Pages are fetched with `WHERE id > <last seen>` instead of an OFFSET
+       and no total count is computed.
+    """
+    ordering = 'id'
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+
+    def _get_position_from_instance(self, instance, ordering):
+        if not isinstance(instance, dict):
+            return super(IdCursorPagination, self)._get_position_from_instance(
+                instance, ordering)
+        # `.values()` rows, see blog.serializers.CompactListSerializer
+        field = ordering[0].lstrip('-')
+        if field == 'id' and field not in instance:
+            field = 'pk'
+        return six.text_type(instance[field])
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+
+class LimitOffsetOrCursorPagination(pagination.BasePagination):
+    """CachedCountLimitOffsetPagination by default, IdCursorPagination when
+       the client opts in with `?pagination=cursor`. The `next`/`previous`
+       links keep the parameter, so a client only has to ask for it once.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+
+    def __init__(self):
+        self.paginator = CachedCountLimitOffsetPagination()
+
+    def __getattr__(self, name):
+        # delegate everything else (display_page_controls, ...) to the
+        # paginator selected for this request
+        if name == 'paginator':
+            raise AttributeError(name)
+        return getattr(self.paginator, name)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = request.query_params.get(self.mode_query_param)
+        if mode == self.cursor_mode:
+            self.paginator = IdCursorPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
@@ -1,6 +1,51 @@
 from rest_framework import permissions
 
+from blog.models import Entry
+
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
-    # implement your logic here
-    pass
+    """Allows write actions on an Entry only to the users who created it.
+       Ownership is resolved with a single EXISTS query on the
+       entry <-> user through-table (covered by its unique index) and cached
+       on the request, however many users the entry has.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+
+        return obj.pk in self.owned_entry_ids(request, [obj.pk])
+
+    @staticmethod
+    def owned_entry_ids(request, ids):
+        """Returns which of given entry ids request.user owns, with at most
+           one set-based query for the ids not cached on the request yet.
+        """
+        owned = getattr(request, '_owned_entries', None)
+        if owned is None:
+            owned = request._owned_entries = {}
+
+        missing = [pk for pk in ids if pk not in owned]
+        if len(missing) == 1:
+            owned[missing[0]] = Entry.users.through.objects.filter(
+                entry_id=missing[0], user_id=request.user.pk).exists()
+        elif missing:
+            found = set(Entry.users.through.objects.filter(
+                entry_id__in=missing, user_id=request.user.pk,
+            ).values_list('entry_id', flat=True))
+            for pk in missing:
+                owned[pk] = pk in found
+
+        return set(pk for pk in ids if owned[pk])
+
+
+class IsSelfOrReadOnly(permissions.BasePermission):
+    """Allows write actions on an User only to that same user, so nobody
+       can rewrite the credentials (secretkey, password) of someone else.
+    """
+
+    def has_object_permission(self, request, view, obj):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+
+        return obj.pk == request.user.pk
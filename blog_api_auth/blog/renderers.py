@@ -0,0 +1,62 @@
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+_encoder = JSONEncoder()
+
+
+def encode_default(obj):
+    """Encodes what orjson can't (or shouldn't) the way DRF's JSONEncoder
+       does: Decimal as a number, dates and times in DRF's ISO format,
+       lazy strings, querysets..."""
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer encoding with orjson when it is installed, with the
+       same output as the stdlib encoder. Indented output (eg: the browsable
+       API), ensure_ascii and anything orjson refuses (eg: integers over 64
+       bits) go through JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii or data is None:
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or not self.compact:
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+
+        try:
+            # dates go through encode_default too: orjson's isoformat differs
+            # from DRF's for datetimes
+            ret = orjson.dumps(data, default=encode_default,
+                               option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super(FastJSONRenderer, self).render(
+                data, accepted_media_type, renderer_context)
+
+        # keep the output a strict javascript subset, like JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """Newline delimited JSON, one object per line. Only used for content
+       negotiation: views stream the body themselves (see
+       EntryViewSet.export)."""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # errors raised before streaming starts (eg: authentication)
+        return FastJSONRenderer().render(data) + b'\n'
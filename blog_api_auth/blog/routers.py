@@ -0,0 +1,104 @@
+"""Sends the reads of safe API requests (GET, HEAD, OPTIONS) to the
+DATABASE_REPLICA alias, a replica of 'default'. Everything else, writes
+included, stays on 'default', the primary.
+
+Reads only go to the replica inside replica_reads() blocks, which
+blog.mixins.ReplicaReadMixin opens around the safe requests of the API
+views. So that a client reads its own writes, it reads from the primary
+for DATABASE_REPLICA_LAG seconds after each write it makes: the response
+to the write sets the PRIMARY_COOKIE for that long, and its accesskey is
+pinned too, for clients that don't keep cookies.
+
+Pins and recent writes are kept per process, or in RESPONSE_CACHE_DIR,
+shared by the processes of a host, along with the cached responses when
+RESPONSE_CACHE_BACKEND is 'file'.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from blog.cache import FileCache, LRUCache
+
+# set on the responses to writes: requests sending it back read from the
+# primary, whichever process serves them
+PRIMARY_COOKIE = 'read_primary'
+
+_state = threading.local()
+
+
+def get_recent_cache(name, max_size):
+    """Returns a cache of entries that expire after DATABASE_REPLICA_LAG
+       seconds, shared like the response cache"""
+    ttl = getattr(settings, 'DATABASE_REPLICA_LAG', 5)
+    if getattr(settings, 'RESPONSE_CACHE_BACKEND', 'file') == 'file':
+        return FileCache(os.path.join(settings.RESPONSE_CACHE_DIR, name),
+                         max_size, ttl)
+    return LRUCache(max_size, ttl)
+
+
+# accesskey -> True while the requests made with it read from the primary
+pinned_accesskeys = get_recent_cache(
+    'pinned_accesskeys', getattr(settings, 'DATABASE_REPLICA_PIN_SIZE', 4096))
+
+# model label -> True while the replica may not have its latest writes
+written_models = get_recent_cache('written_models', 1024)
+
+
+def get_replica():
+    """Returns the replica alias, None if reads all go to the primary"""
+    return getattr(settings, 'DATABASE_REPLICA', None)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Reads in the block go to the replica (if enabled and configured)"""
+    previous = getattr(_state, 'replica', None)
+    _state.replica = get_replica() if enabled else None
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+def reading_replica():
+    return getattr(_state, 'replica', None) is not None
+
+
+def pin_primary(accesskey):
+    """Reads with given accesskey go to the primary for a while"""
+    if get_replica() is not None:
+        pinned_accesskeys.set(accesskey, True)
+
+
+def is_pinned(accesskey):
+    return accesskey in pinned_accesskeys
+
+
+def may_be_stale(models):
+    """Tells whether the current reads come from a replica that may lag
+       behind a recent write to any of given models"""
+    return reading_replica() and any(
+        model._meta.label_lower in written_models for model in models)
+
+
+class ReplicaRouter(object):
+
+    def db_for_read(self, model, **hints):
+        # None falls back to the hinted instance's database, then 'default'
+        return getattr(_state, 'replica', None)
+
+    def db_for_write(self, model, **hints):
+        if get_replica() is not None:
+            written_models.set(model._meta.label_lower, True)
+        # also for instances read from the replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both hold the same rows
+        aliases = (DEFAULT_DB_ALIAS, get_replica())
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
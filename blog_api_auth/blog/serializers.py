@@ -1,30 +1,195 @@
+from collections import OrderedDict
+
 from rest_framework import serializers
 
+from blog.instrumentation import timed
 from blog.models import User, Entry, Blog
 
 
-class UserSerializer(serializers.HyperlinkedModelSerializer):
+class TimedListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        with timed('serialization'):
+            return super(TimedListSerializer, self).data
+
+
+class TimedDataMixin(object):
+    """Times `.data` as the serialization phase of sampled requests (see
+       blog.instrumentation). Lists need TimedListSerializer as
+       Meta.list_serializer_class.
+    """
+
+    @property
+    def data(self):
+        with timed('serialization'):
+            return super(TimedDataMixin, self).data
+
+
+class AverageField(serializers.DecimalField):
+    """Read-only `total / count` of two fields of the object, None when
+       count is 0. Lists `columns` for CompactListSerializer."""
+
+    def __init__(self, total, count, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super(AverageField, self).__init__(**kwargs)
+        self.columns = (total, count)
+
+    def to_representation(self, obj):
+        if isinstance(obj, dict):
+            total, count = (obj[column] for column in self.columns)
+        else:
+            total, count = (getattr(obj, column) for column in self.columns)
+        if not count:
+            return None
+        return super(AverageField, self).to_representation(total / count)
+
+
+class UserSerializer(TimedDataMixin,
+                     serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = User
-        fields = ('id', 'username', 'accesskey', 'password',
+        list_serializer_class = TimedListSerializer
+        fields = ('id', 'username', 'accesskey', 'secretkey', 'password',
                   'first_name', 'last_name', 'email')
         extra_kwargs = {
+            'secretkey': {
+                'write_only': True
+            },
             'password': {
                 'write_only': True
             }
         }
 
 
-class BlogSerializer(serializers.HyperlinkedModelSerializer):
+class BlogSerializer(TimedDataMixin,
+                     serializers.HyperlinkedModelSerializer):
+    # entry_count and total_comments are read-only too (see blog.stats)
+    average_scoring = AverageField('total_scoring', 'entry_count',
+                                   max_digits=3, decimal_places=2)
 
     class Meta:
         model = Blog
-        fields = '__all__'
+        list_serializer_class = TimedListSerializer
+        exclude = ('name_folded', 'updated_at', 'total_scoring')
 
 
-class EntrySerializer(serializers.HyperlinkedModelSerializer):
+class EntrySerializer(TimedDataMixin,
+                      serializers.HyperlinkedModelSerializer):
 
     class Meta:
         model = Entry
-        fields = '__all__'
+        list_serializer_class = TimedListSerializer
+        exclude = ('updated_at',)
+
+
+class CompactListSerializer(object):
+    """Read-only fast path for lists, producing the same output as
+       `serializer_class` from `.values()` rows instead of model instances.
+
+       The fields of `serializer_class` are introspected once per request,
+       hyperlinks are rendered from URL templates reversed once instead of
+       once per object, and many-to-many hyperlinks come from a single query
+       on the through-table.
+    """
+    marker = '__pk__'
+
+    def __init__(self, serializer_class, context):
+        self.context = context
+        self.model = serializer_class.Meta.model
+        serializer = serializer_class(context=context)
+        self.plan = [self.get_field_plan(field)
+                     for field in serializer._readable_fields]
+
+    def get_url_template(self, field):
+        """Returns the (prefix, suffix) around the pk of field's urls"""
+        url = field.reverse(
+            field.view_name, kwargs={field.lookup_url_kwarg: self.marker},
+            request=self.context.get('request'),
+            format=self.context.get('format'))
+        prefix, suffix = url.split(self.marker)
+        return prefix, suffix
+
+    def get_field_plan(self, field):
+        """Returns (name, kind, column, how to render the column value)"""
+        if isinstance(field, serializers.HyperlinkedIdentityField):
+            return (field.field_name, 'url', 'pk',
+                    self.get_url_template(field))
+        if isinstance(field, serializers.ManyRelatedField):
+            return (field.field_name, 'many', field.source,
+                    self.get_url_template(field.child_relation))
+        if isinstance(field, serializers.HyperlinkedRelatedField):
+            return (field.field_name, 'url',
+                    self.model._meta.get_field(field.source).attname,
+                    self.get_url_template(field))
+        if field.source == '*':
+            # computed from several columns of the row (eg: AverageField)
+            return (field.field_name, 'row', field.columns,
+                    field.to_representation)
+        return (field.field_name, 'field', field.source,
+                field.to_representation)
+
+    def get_values_fields(self):
+        columns = []
+        for name, kind, column, render in self.plan:
+            if kind == 'row':
+                columns.extend(column)
+            elif kind != 'many':
+                columns.append(column)
+        if 'pk' not in columns:
+            columns.append('pk')
+        return columns
+
+    def get_queryset(self, queryset, *columns):
+        """Turns a model queryset into the `.values()` one to paginate,
+           selecting given columns too"""
+        # extra selects (eg: search ranking) may be referenced by ORDER BY
+        extra = list(queryset.query.extra_select)
+        return queryset.prefetch_related(None).values(
+            *(self.get_values_fields() + list(columns) + extra))
+
+    def get_many(self, column, rows):
+        """Returns {pk: [related pks]} for a many-to-many column"""
+        field = self.model._meta.get_field(column)
+        through = field.remote_field.through
+        source = field.m2m_field_name() + '_id'
+        target = field.m2m_reverse_field_name() + '_id'
+        related = dict((row['pk'], []) for row in rows)
+        pairs = through.objects.filter(
+            **{source + '__in': list(related)}
+        ).order_by('pk').values_list(source, target)
+        for pk, related_pk in pairs:
+            related[pk].append(related_pk)
+        return related
+
+    def to_representation(self, rows):
+        with timed('serialization'):
+            rows = list(rows)
+            many = dict((column, self.get_many(column, rows))
+                        for name, kind, column, render in self.plan
+                        if kind == 'many')
+
+            data = []
+            for row in rows:
+                ret = OrderedDict()
+                for name, kind, column, render in self.plan:
+                    if kind == 'many':
+                        prefix, suffix = render
+                        ret[name] = [
+                            '{}{}{}'.format(prefix, pk, suffix)
+                            for pk in many[column][row['pk']]]
+                        continue
+                    if kind == 'row':
+                        ret[name] = render(row)
+                        continue
+                    value = row[column]
+                    if value is None:
+                        ret[name] = None
+                    elif kind == 'url':
+                        prefix, suffix = render
+                        ret[name] = '{}{}{}'.format(prefix, value, suffix)
+                    else:
+                        ret[name] = render(value)
+                data.append(ret)
+            return data
@@ -0,0 +1,179 @@
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    pre_save, post_save, post_delete, pre_delete, m2m_changed)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from blog.authentication import invalidate_user
+from blog.mixins import invalidate_responses
+from blog.models import User, Blog, Entry
+from blog.pagination import invalidate_counts
+from blog.stats import blog_deleted, update_blog_stats
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_accesskey_cache(sender, instance, **kwargs):
+    """Keeps the accesskey cache in sync when keys are rotated, users get
+       deactivated or deleted.
+    """
+    invalidate_user(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def invalidate_count_cache(sender, **kwargs):
+    """Drops the cached pagination counts of the saved/deleted model"""
+    invalidate_counts(sender)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def invalidate_response_cache(sender, using, **kwargs):
+    """Drops the cached responses rendering the saved/deleted model"""
+    invalidate_responses(sender, using)
+
+
+@receiver(m2m_changed, sender=Entry.users.through)
+def invalidate_response_cache_on_users_change(sender, action, using,
+                                              **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_responses(Entry, using)
+
+
+@receiver(m2m_changed, sender=Entry.users.through)
+def touch_entries_on_users_change(sender, instance, action, reverse, pk_set,
+                                  **kwargs):
+    """Bumps Entry.updated_at when its `users` change, which a save of the
+       entry itself wouldn't notice. Writes through the through-table
+       model (eg: blog.bulk.bulk_set_entry_users) must do it themselves.
+    """
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        entries = Entry.objects.filter(pk=instance.pk)
+    elif reverse and action in ('post_add', 'post_remove'):
+        entries = Entry.objects.filter(pk__in=pk_set)
+    elif reverse and action == 'pre_clear':
+        # the entries of `instance` are unknown once cleared
+        entries = Entry.objects.filter(users=instance)
+    else:
+        return
+    entries.update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=User)
+def touch_entries_on_user_delete(sender, instance, **kwargs):
+    """Deleting a user removes it from the `users` of its entries"""
+    Entry.objects.filter(users=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Blog)
+def skip_deleted_blog_stats(sender, instance, using, **kwargs):
+    """The entries deleted along with a blog need not update its stats"""
+    blog_deleted(instance.pk, using)
+
+
+def saves_entry_stats(update_fields):
+    """Tells whether a save with given update_fields writes any of the
+       Entry.stats_fields"""
+    return update_fields is None or any(
+        field in update_fields or
+        Entry._meta.get_field(field).name in update_fields
+        for field in Entry.stats_fields)
+
+
+@receiver(pre_save, sender=Entry)
+def load_stored_entry_stats(sender, instance, raw, using, update_fields,
+                            **kwargs):
+    """Reads what the row an entry save replaces adds to its blog stats.
+       The values seen when the entry was loaded won't do: another writer
+       may have saved it since. The row stays locked until Entry.save()
+       commits, so no other save can slip in between."""
+    if (raw or instance.pk is None or
+            not saves_entry_stats(update_fields)):
+        return
+    instance._stored_stats = Entry.objects.using(using).select_for_update(
+    ).filter(pk=instance.pk).values_list(*Entry.stats_fields).first()
+
+
+@receiver(post_save, sender=Entry)
+def update_blog_stats_on_save(sender, instance, raw, using, update_fields,
+                              **kwargs):
+    """Moves the saved entry's share of the blog stats from its stored
+       values to its new ones, which may be in another blog"""
+    if raw or not saves_entry_stats(update_fields):
+        return
+    stored = getattr(instance, '_stored_stats', None)
+    stats = instance.get_stats()
+    if stored is not None and update_fields is not None:
+        # the fields not saved keep their stored values
+        stats = tuple(
+            value if Entry._meta.get_field(field).name in update_fields
+            else stored_value
+            for field, value, stored_value in zip(
+                Entry.stats_fields, stats, stored))
+    update_blog_stats(added=[stats],
+                      removed=[stored] if stored is not None else [],
+                      using=using)
+    instance._stored_stats = stats
+
+
+@receiver(post_delete, sender=Entry)
+def update_blog_stats_on_delete(sender, instance, using, **kwargs):
+    stored = getattr(instance, '_stored_stats', None)
+    update_blog_stats(removed=[stored or instance.get_stats()], using=using)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Applies SQLITE_PRAGMAS to every new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', ()):
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
+
+
+@receiver(connection_created)
+def mark_connection_checked(sender, connection, **kwargs):
+    # a connection just made works, no need to check it before the
+    # CONN_HEALTH_CHECK_INTERVAL is up
+    connection.health_checked_at = time.time()
+
+
+@receiver(request_started)
+def check_persistent_connections(sender, **kwargs):
+    """Closes the persistent connections (CONN_MAX_AGE) that no longer
+       work before the request uses them, for the databases with
+       CONN_HEALTH_CHECKS. Django itself only checks after an error.
+       A connection is checked at most once per CONN_HEALTH_CHECK_INTERVAL
+       seconds (30 by default), so most requests run no check at all."""
+    for connection in connections.all():
+        if connection.settings_dict.get('CONN_HEALTH_CHECKS'):
+            close_if_unusable(connection, connection.settings_dict.get(
+                'CONN_HEALTH_CHECK_INTERVAL', 30))
+
+
+def close_if_unusable(connection, interval=0):
+    """Closes `connection` if it stopped working, unless it was made or
+       checked less than `interval` seconds ago"""
+    if connection.connection is None or connection.in_atomic_block:
+        return
+    now = time.time()
+    if now - getattr(connection, 'health_checked_at', 0) < interval:
+        return
+    connection.health_checked_at = now
+    if not connection.is_usable():
+        connection.close()
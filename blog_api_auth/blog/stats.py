@@ -0,0 +1,130 @@
+"""Stats of the entries of each blog, stored on Blog: entry_count,
+total_comments and total_scoring (the average scoring is total_scoring /
+entry_count), so listing blogs with them needs no aggregate over Entry.
+
+Entry creates, updates and deletes add their difference to the stats of
+the blogs involved (see blog.signals), in the same transaction and with
+F() expressions: concurrent writers to the entries of a blog add up
+instead of overwriting each other's counts, and an entry save takes back
+the values of the row it replaces, read under a row lock, not those seen
+when the entry was loaded. Writes that send no signals (eg: bulk_create)
+must call update_blog_stats() themselves. Deletes run in a
+batched_blog_stats() block, so a cascade or a bulk delete updates each
+blog once, and not at all the blogs deleted along.
+`python manage.py rebuild_blog_stats` recomputes them from scratch.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import router, transaction
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.utils import timezone
+
+from blog.mixins import invalidate_responses
+from blog.models import Blog, Entry
+
+number_comments_field = Entry._meta.get_field('number_comments')
+scoring_field = Entry._meta.get_field('scoring')
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_blog_stats(using):
+    """Runs the block in a transaction on `using`, collecting its
+       update_blog_stats() calls into one made at the end of the block,
+       which leaves out the blogs deleted in it (see blog_deleted()).
+       Blocks nested in another one join it."""
+    if getattr(_batch, 'stats', None) is not None:
+        yield
+        return
+    # database alias -> (added, removed, deleted blog ids)
+    _batch.stats = defaultdict(lambda: ([], [], set()))
+    try:
+        with transaction.atomic(using=using, savepoint=False):
+            yield
+            stats, _batch.stats = _batch.stats, None
+            for alias, (added, removed, deleted) in stats.items():
+                update_blog_stats(
+                    added=[row for row in added if row[0] not in deleted],
+                    removed=[row for row in removed
+                             if row[0] not in deleted],
+                    using=alias)
+    finally:
+        _batch.stats = None
+
+
+def blog_deleted(blog_id, using):
+    """Tells the batched_blog_stats() block running, if any, that the blog
+       is being deleted, so its stats need no update"""
+    stats = getattr(_batch, 'stats', None)
+    if stats is not None:
+        stats[using][2].add(blog_id)
+
+
+def update_blog_stats(added=(), removed=(), using=None):
+    """Adds the `added` and takes the `removed` Entry.get_stats() tuples
+       from the stats of their blogs, with one UPDATE of every blog
+       changed, or adds them to the batched_blog_stats() block running"""
+    stats = getattr(_batch, 'stats', None)
+    if stats is not None:
+        stats[using][0].extend(added)
+        stats[using][1].extend(removed)
+        return
+
+    deltas = defaultdict(lambda: [0, 0, Decimal(0)])
+    for sign, rows in ((1, added), (-1, removed)):
+        for blog_id, number_comments, scoring in rows:
+            delta = deltas[blog_id]
+            delta[0] += sign
+            delta[1] += sign * number_comments_field.to_python(
+                number_comments)
+            delta[2] += sign * scoring_field.to_python(scoring)
+    deltas = sorted((blog_id, delta) for blog_id, delta in deltas.items()
+                    if any(delta))
+    if not deltas:
+        return
+
+    def per_blog(field, index):
+        if len(deltas) == 1:
+            return F(field) + deltas[0][1][index]
+        return F(field) + Case(
+            *[When(pk=blog_id, then=Value(delta[index]))
+              for blog_id, delta in deltas],
+            output_field=Blog._meta.get_field(field))
+
+    Blog.objects.using(using).filter(
+        pk__in=[blog_id for blog_id, delta in deltas]).update(
+        entry_count=per_blog('entry_count', 0),
+        total_comments=per_blog('total_comments', 1),
+        total_scoring=per_blog('total_scoring', 2),
+        # stats are part of the blog representation and its validators
+        updated_at=timezone.now())
+    # update() sends no post_save
+    invalidate_responses(Blog, using)
+
+
+def rebuild_blog_stats(using=None):
+    """Recomputes the stats of every blog from its entries. Returns the
+       number of blogs with entries."""
+    using = using or router.db_for_write(Blog)
+    updated_at = timezone.now()
+    with transaction.atomic(using=using):
+        # entry writers wait for this to commit before touching the stats
+        list(Blog.objects.using(using).select_for_update().values_list(
+            'pk', flat=True))
+        rows = Entry.objects.using(using).order_by().values(
+            'blog_id').annotate(count=Count('pk'),
+                                comments=Sum('number_comments'),
+                                scoring=Sum('scoring'))
+        Blog.objects.using(using).update(
+            entry_count=0, total_comments=0, total_scoring=0,
+            updated_at=updated_at)
+        for row in rows:
+            Blog.objects.using(using).filter(pk=row['blog_id']).update(
+                entry_count=row['count'], total_comments=row['comments'],
+                total_scoring=row['scoring'], updated_at=updated_at)
+    invalidate_responses(Blog, using)
+    return len(rows)
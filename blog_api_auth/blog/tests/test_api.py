@@ -186,6 +186,32 @@ class UserTestCase(APITestCase):
         self.assertEqual(user.username, 'lpage')
         self.assertTrue(user.check_password('newpassword'))
 
+    def test_full_update_permission_denied(self):
+        """Should return 403 when an user tries to full update other user"""
+        other = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='c' * 32,
+            secretkey='d' * 32)
+        payload = {
+            'username': 'lpage',
+            'first_name': 'Larry',
+            'last_name': 'Page',
+            'accesskey': 'a' * 32,
+            'secretkey': 'e' * 32,
+            'password': 'newpassword'
+        }
+        headers = {'HTTP_X_SECRET_KEY': other.secretkey}
+        response = self.client.put(
+            '/api/users/{}?accesskey={}'.format(
+                self.user.id, other.accesskey), data=payload, **headers)
+        expected = {
+            'detail': 'You do not have permission to perform this action.'
+        }
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), expected)
+        user = User.objects.get(id=self.user.id)
+        self.assertEqual(user.username, 'larrypage')
+        self.assertTrue(user.check_password('abc123'))
+
     def test_full_update_missing_accesskey(self):
         """Should return 403 when no accesskey is given in url"""
         payload = {
@@ -269,6 +295,30 @@ class UserTestCase(APITestCase):
         user = User.objects.get(id=self.user.id)
         self.assertEqual(user.username, 'lpage')
 
+    def test_partial_update_permission_denied(self):
+        """Should return 403 when an user tries to partial update other user"""
+        other = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='c' * 32,
+            secretkey='d' * 32)
+        payload = {
+            'secretkey': 'e' * 32,
+        }
+        headers = {'HTTP_X_SECRET_KEY': other.secretkey}
+        response = self.client.patch(
+            '/api/users/{}?accesskey={}'.format(
+                self.user.id, other.accesskey), data=payload, **headers)
+        expected = {
+            'detail': 'You do not have permission to perform this action.'
+        }
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), expected)
+        # the old secretkey still authenticates its user
+        headers = {'HTTP_X_SECRET_KEY': self.user.secretkey}
+        response = self.client.patch(
+            '/api/users/{}?accesskey={}'.format(
+                self.user.id, self.user.accesskey), data={}, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
     def test_partial_update_missing_accesskey(self):
         """Should return 403 when no accesskey is given in url"""
         payload = {
@@ -331,6 +381,22 @@ class UserTestCase(APITestCase):
         with self.assertRaises(User.DoesNotExist):
             User.objects.get(username='larrypage')
 
+    def test_delete_permission_denied(self):
+        """Should return 403 when an user tries to delete other user"""
+        other = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='c' * 32,
+            secretkey='d' * 32)
+        headers = {'HTTP_X_SECRET_KEY': other.secretkey}
+        response = self.client.delete(
+            '/api/users/{}?accesskey={}'.format(
+                self.user.id, other.accesskey), **headers)
+        expected = {
+            'detail': 'You do not have permission to perform this action.'
+        }
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), expected)
+        self.assertTrue(User.objects.filter(id=self.user.id).exists())
+
     def test_delete_missing_accesskey(self):
         """Should return 403 when no accesskey is given in url"""
         headers = {'HTTP_X_SECRET_KEY': self.user.secretkey}
@@ -0,0 +1,117 @@
+import json
+import sys
+from unittest import skipIf
+
+from django.core.wsgi import get_wsgi_application
+from django.test import TransactionTestCase
+
+# blog.asgi is Python 3.5+ syntax
+if sys.version_info >= (3, 5):
+    import asyncio
+
+    from blog.asgi import ASGIHandler
+from blog.mixins import response_cache
+from blog.models import User, Blog
+from .fixtures import *
+
+
+@skipIf(sys.version_info < (3, 5), 'ASGI needs Python 3.5+')
+class ASGIHandlerTestCase(TransactionTestCase):
+    # the requests run on other threads, which only see committed rows
+
+    def setUp(self):
+        super(ASGIHandlerTestCase, self).setUp()
+        if response_cache is not None:
+            response_cache.clear()
+        self.user = User.objects.create(
+            username='larrypage', accesskey='a' * 32, secretkey='b' * 32)
+        self.entries = EntryFactory.create_batch(3)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.handler = ASGIHandler(get_wsgi_application(), 2)
+
+    def tearDown(self):
+        self.handler.executor.shutdown()
+        asyncio.set_event_loop(None)
+        self.loop.close()
+        super(ASGIHandlerTestCase, self).tearDown()
+
+    def call(self, scope, messages):
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        for message in messages:
+            incoming.put_nowait(message)
+        self.loop.run_until_complete(
+            self.handler(scope, incoming.get, outgoing.put))
+        sent = []
+        while not outgoing.empty():
+            sent.append(outgoing.get_nowait())
+        return sent
+
+    def request(self, method, path, body=b'', headers=(), chunks=1):
+        query = 'accesskey={}'.format(self.user.accesskey)
+        scope = {
+            'type': 'http', 'method': method, 'path': path,
+            'query_string': query.encode('ascii'), 'scheme': 'http',
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 5000),
+            'headers': [(b'host', b'testserver'),
+                        (b'x-secret-key', self.user.secretkey.encode())] +
+                       list(headers),
+        }
+        size = len(body) // chunks + 1
+        messages = [
+            {'type': 'http.request', 'body': body[i:i + size],
+             'more_body': i + size < len(body)}
+            for i in range(0, len(body), size)
+        ] or [{'type': 'http.request'}]
+        sent = self.call(scope, messages)
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertFalse(sent[-1].get('more_body', False))
+        return (sent[0]['status'], dict(sent[0]['headers']),
+                b''.join(message.get('body', b'') for message in sent[1:]))
+
+    def test_list(self):
+        """Should render the same list as the WSGI application"""
+        status, headers, body = self.request('GET', '/api/entries')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+
+        response = self.client.get('/api/entries', {
+            'accesskey': self.user.accesskey})
+        self.assertEqual(json.loads(body.decode('utf-8')), response.json())
+
+    def test_write(self):
+        """Should pass a body sent in several messages to a write"""
+        payload = json.dumps({'name': 'New blog', 'tagline': 'Tagline'})
+        status, headers, body = self.request(
+            'POST', '/api/blogs', payload.encode('utf-8'),
+            [(b'content-type', b'application/json')], chunks=3)
+        self.assertEqual(status, 201)
+        self.assertTrue(Blog.objects.filter(name='New blog').exists())
+
+    def test_streaming(self):
+        """Should send every line of a streaming response"""
+        status, headers, body = self.request(
+            'GET', '/api/entries/export', headers=[
+                (b'accept', b'application/x-ndjson')])
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body.splitlines()), 3)
+
+    def test_authentication_failed(self):
+        """Should answer 403 for an unknown accesskey"""
+        self.user.accesskey = 'c' * 32
+        status, headers, body = self.request('GET', '/api/entries')
+        self.assertEqual(status, 403)
+
+    def test_disconnect(self):
+        """Should not run a request whose client went away"""
+        sent = self.call({'type': 'http', 'method': 'POST',
+                          'path': '/api/blogs'},
+                         [{'type': 'http.disconnect'}])
+        self.assertEqual(sent, [])
+
+    def test_lifespan(self):
+        """Should complete the lifespan startup and shutdown"""
+        sent = self.call({'type': 'lifespan'}, [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        self.assertEqual([message['type'] for message in sent], [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete'])
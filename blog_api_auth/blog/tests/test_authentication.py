@@ -0,0 +1,197 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.test import override_settings
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog import authentication
+from blog.authentication import (
+    user_cache, unknown_accesskey_cache, verified_secretkeys)
+from blog.mixins import response_cache
+from blog.models import User, digest_secretkey
+from blog.pagination import count_cache
+
+
+class AccesskeyCacheTestCase(APITestCase):
+
+    def setUp(self):
+        super(AccesskeyCacheTestCase, self).setUp()
+        user_cache.clear()
+        unknown_accesskey_cache.clear()
+        count_cache.clear()
+        response_cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+
+    def test_cache_hit_skips_user_query(self):
+        """Should resolve the accesskey from the cache on repeated reads"""
+        params = {'accesskey': self.user.accesskey}
+        self.client.get('/api/blogs', params)
+        self.assertEqual(user_cache.misses, 1)
+
+        # only the (empty) blogs count, no User lookup
+        response_cache.clear()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/blogs', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(user_cache.hits, 1)
+
+    def test_rotated_accesskey_is_invalidated(self):
+        """Should reject the old accesskey as soon as it is rotated"""
+        old_accesskey = self.user.accesskey
+        self.client.get('/api/blogs', {'accesskey': old_accesskey})
+        self.assertIn(old_accesskey, user_cache)
+
+        self.user.accesskey = 'c' * 32
+        self.user.save()
+        self.assertNotIn(old_accesskey, user_cache)
+
+        response = self.client.get('/api/blogs', {'accesskey': old_accesskey})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), {'detail': 'Invalid Accesskey'})
+
+    def test_deactivated_user_is_invalidated(self):
+        """Should reject a cached user once it has been deactivated"""
+        params = {'accesskey': self.user.accesskey}
+        self.client.get('/api/blogs', params)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/api/blogs', params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(),
+                         {'detail': 'User inactive or deleted.'})
+
+    def test_deleted_user_is_invalidated(self):
+        """Should reject a cached user once it has been deleted"""
+        params = {'accesskey': self.user.accesskey}
+        self.client.get('/api/blogs', params)
+
+        self.user.delete()
+
+        response = self.client.get('/api/blogs', params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), {'detail': 'Invalid Accesskey'})
+
+    def test_malformed_accesskey_skips_database(self):
+        """Should reject accesskeys with an invalid length without queries"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/blogs', {'accesskey': 'INVALID'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), {'detail': 'Invalid Accesskey'})
+
+    def test_unknown_accesskey_is_negatively_cached(self):
+        """Should only hit the database once for a repeated unknown key"""
+        params = {'accesskey': 'z' * 32}
+        with self.assertNumQueries(1):
+            self.client.get('/api/blogs', params)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/blogs', params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), {'detail': 'Invalid Accesskey'})
+
+    def test_created_user_clears_negative_cache(self):
+        """Should accept a previously unknown key once its user exists"""
+        params = {'accesskey': 'z' * 32}
+        self.client.get('/api/blogs', params)
+
+        User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='z' * 32,
+            secretkey='y' * 32)
+
+        response = self.client.get('/api/blogs', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_evicted_user_forgets_accesskey(self):
+        """Should drop the pk -> accesskey entry along with the cached user"""
+        self.client.get('/api/blogs', {'accesskey': self.user.accesskey})
+        self.assertIn(self.user.pk, authentication._cached_accesskeys)
+
+        max_size = user_cache.max_size
+        user_cache.max_size = 1
+        self.addCleanup(setattr, user_cache, 'max_size', max_size)
+        other = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='z' * 32,
+            secretkey='y' * 32)
+        self.client.get('/api/blogs', {'accesskey': other.accesskey})
+
+        self.assertNotIn(self.user.accesskey, user_cache)
+        self.assertEqual(authentication._cached_accesskeys,
+                         {other.pk: other.accesskey})
+
+    def test_expired_user_forgets_accesskey(self):
+        """Should drop the pk -> accesskey entry once the user expires"""
+        self.client.get('/api/blogs', {'accesskey': self.user.accesskey})
+
+        user_cache.set(self.user.accesskey, self.user, ttl=-1)
+        self.assertIsNone(user_cache.get(self.user.accesskey))
+        self.assertNotIn(self.user.pk, authentication._cached_accesskeys)
+
+
+@override_settings(SECRETKEY_STORAGE='hmac')
+class SecretkeyDigestTestCase(APITestCase):
+
+    def setUp(self):
+        super(SecretkeyDigestTestCase, self).setUp()
+        verified_secretkeys.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.url = '/api/blogs?accesskey={}'.format(self.user.accesskey)
+        self.payload = {'name': 'New blog', 'tagline': 'Some tagline'}
+
+    def test_only_digest_is_stored(self):
+        """Should store the HMAC digest instead of the raw secretkey"""
+        user = User.objects.get(id=self.user.id)
+        self.assertEqual(user.secretkey, '')
+        self.assertEqual(user.secretkey_digest, digest_secretkey('b' * 32))
+
+    def test_valid_secretkey(self):
+        """Should authenticate and memoize a valid secretkey"""
+        response = self.client.post(self.url, data=self.payload,
+                                    HTTP_X_SECRET_KEY='b' * 32)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(verified_secretkeys), 1)
+
+        response = self.client.post(self.url, data=self.payload,
+                                    HTTP_X_SECRET_KEY='b' * 32)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(verified_secretkeys.hits, 1)
+        self.assertNotIn('b' * 32, verified_secretkeys.get(
+            (self.user.accesskey, self.user.secretkey_digest)))
+
+    def test_invalid_secretkey(self):
+        """Should reject a wrong secretkey, even with a warm memo"""
+        self.client.post(self.url, data=self.payload,
+                         HTTP_X_SECRET_KEY='b' * 32)
+        response = self.client.post(self.url, data=self.payload,
+                                    HTTP_X_SECRET_KEY='c' * 32)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.json(), {'detail': 'Invalid Secretkey'})
+
+    def test_rotated_secretkey(self):
+        """Should reject the old secretkey once it has been rotated"""
+        self.client.post(self.url, data=self.payload,
+                         HTTP_X_SECRET_KEY='b' * 32)
+        self.user.secretkey = 'c' * 32
+        self.user.save()
+
+        response = self.client.post(self.url, data=self.payload,
+                                    HTTP_X_SECRET_KEY='b' * 32)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(self.url, data=self.payload,
+                                    HTTP_X_SECRET_KEY='c' * 32)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_independent_of_secret_key(self):
+        """Should keep verifying stored digests once SECRET_KEY rotates"""
+        with override_settings(SECRET_KEY='rotated'):
+            response = self.client.post(self.url, data=self.payload,
+                                        HTTP_X_SECRET_KEY='b' * 32)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_hmac_key_required(self):
+        with override_settings(SECRETKEY_HMAC_KEY=None):
+            self.assertRaises(ImproperlyConfigured, digest_secretkey, 'b' * 32)
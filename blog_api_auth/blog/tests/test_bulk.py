@@ -0,0 +1,266 @@
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog import bulk, views
+from blog.bulk import bulk_insert
+from blog.models import User
+from .fixtures import *
+
+
+class EntryBulkTestCase(APITestCase):
+
+    def setUp(self):
+        super(EntryBulkTestCase, self).setUp()
+        self.blog = BlogFactory()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.user_2 = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='x' * 32,
+            secretkey='z' * 32)
+        self.entry = EntryFactory(blog=self.blog)
+        self.entry.users.add(self.user)
+        self.entry_2 = EntryFactory(blog=self.blog)
+        self.entry_2.users.add(self.user)
+        self.url = '/api/entries/bulk?accesskey={}'.format(
+            self.user.accesskey)
+        self.client.credentials(HTTP_X_SECRET_KEY=self.user.secretkey)
+
+    def payload(self, headline, **kwargs):
+        payload = {
+            'blog': 'http://testserver/api/blogs/1',
+            'users': ['http://testserver/api/users/1'],
+            'headline': headline,
+            'body_text': 'Some body text',
+            'number_comments': 15,
+            'scoring': 4.25
+        }
+        payload.update(kwargs)
+        return payload
+
+    def test_bulk_create(self):
+        """Should create every entry, with its users, in input order"""
+        payload = [
+            self.payload('First'),
+            self.payload('Second', users=['http://testserver/api/users/1',
+                                          'http://testserver/api/users/2']),
+        ]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [entry['headline'] for entry in response.json()],
+            ['First', 'Second'])
+        self.assertEqual(Entry.objects.count(), 4)
+        second = Entry.objects.get(headline='Second')
+        self.assertEqual(second.users.count(), 2)
+        self.assertEqual(response.json()[1]['url'],
+                         'http://testserver/api/entries/{}'.format(second.id))
+
+    def test_bulk_create_item_errors(self):
+        """Should report errors per item and create nothing"""
+        payload = [self.payload('First'), self.payload('', scoring='foo')]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertEqual(sorted(errors[1]), ['headline', 'scoring'])
+        self.assertEqual(Entry.objects.count(), 2)
+
+    def test_bulk_create_not_a_list(self):
+        """Should reject a body which is not a list"""
+        response = self.client.post(
+            self.url, self.payload('First'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """Should partially update every entry"""
+        payload = [
+            {'id': self.entry.id, 'headline': 'New headline'},
+            {'id': self.entry_2.id,
+             'users': ['http://testserver/api/users/2']},
+        ]
+        with self.assertNumQueries(14):
+            response = self.client.patch(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Entry.objects.get(id=self.entry.id).headline,
+                         'New headline')
+        self.assertEqual(list(self.entry_2.users.all()), [self.user_2])
+        self.assertEqual(response.json()[1]['users'],
+                         ['http://testserver/api/users/2'])
+
+    def test_bulk_update_unknown_id(self):
+        """Should report unknown ids per item"""
+        payload = [{'id': self.entry.id}, {'id': 999}, {'headline': 'x'}]
+        response = self.client.patch(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()[0], {})
+        self.assertEqual(list(response.json()[2]), ['id'])
+
+    def test_bulk_update_permission_denied(self):
+        """Should return 403 when any entry is not owned by the user"""
+        self.entry_2.users.set([self.user_2])
+        payload = [
+            {'id': self.entry.id, 'headline': 'New headline'},
+            {'id': self.entry_2.id, 'headline': 'New headline'},
+        ]
+        response = self.client.patch(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Entry.objects.get(id=self.entry.id).headline,
+                         'Some headline')
+
+    def test_bulk_delete(self):
+        """Should delete every entry"""
+        response = self.client.delete(
+            self.url, [self.entry.id, self.entry_2.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Entry.objects.count(), 0)
+
+    def test_bulk_delete_permission_denied(self):
+        """Should delete nothing when any entry is not owned by the user"""
+        other = EntryFactory(blog=self.blog)
+        response = self.client.delete(
+            self.url, [self.entry.id, other.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Entry.objects.count(), 3)
+
+    def test_bulk_missing_secretkey(self):
+        """Should require AK + SK"""
+        self.client.credentials()
+        response = self.client.delete(
+            self.url, [self.entry.id], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Entry.objects.count(), 2)
+
+
+class UserBulkTestCase(APITestCase):
+
+    def setUp(self):
+        super(UserBulkTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.url = '/api/users/bulk?accesskey={}'.format(
+            self.user.accesskey)
+        self.client.credentials(HTTP_X_SECRET_KEY=self.user.secretkey)
+
+    def payload(self, username, accesskey, **kwargs):
+        payload = {
+            'username': username,
+            'accesskey': accesskey,
+            'secretkey': 'c' * 32,
+            'password': 'secret-{}'.format(username),
+        }
+        payload.update(kwargs)
+        return payload
+
+    def test_bulk_create(self):
+        """Should create every user, with a hashed password, in input
+           order"""
+        payload = [self.payload('sergeybrin', 'c' * 32),
+                   self.payload('ericschmidt', 'd' * 32)]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([user['username'] for user in response.json()],
+                         ['sergeybrin', 'ericschmidt'])
+        user = User.objects.get(username='ericschmidt')
+        self.assertEqual(response.json()[1]['id'], user.id)
+        self.assertEqual(user.username_folded, 'ericschmidt')
+        self.assertTrue(user.check_password('secret-ericschmidt'))
+
+    @override_settings(PASSWORD_HASHING_THREADS=2)
+    def test_bulk_create_thread_pool(self):
+        """Should hash passwords in worker threads just the same"""
+        payload = [self.payload('user{}'.format(i), str(i).zfill(32))
+                   for i in range(4)]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for i in range(4):
+            user = User.objects.get(username='user{}'.format(i))
+            self.assertTrue(user.check_password('secret-user{}'.format(i)))
+
+    def test_bulk_create_duplicates(self):
+        """Should report per item the usernames or accesskeys already
+           taken, in the database or earlier in the request"""
+        payload = [self.payload('sergeybrin', 'c' * 32),
+                   self.payload('larrypage', 'd' * 32),
+                   self.payload('ericschmidt', 'c' * 32)]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [
+            {},
+            {'username': ['user with this username already exists.']},
+            {'accesskey': ['user with this accesskey already exists.']},
+        ])
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_bulk_create_concurrent_duplicates(self):
+        """Should report the usernames taken by a request that committed
+           after the checks, not fail with a server error"""
+        def make_passwords(passwords):
+            User.objects.create(username='ericschmidt', accesskey='e' * 32,
+                                secretkey='b' * 32)
+            return original(passwords)
+        original = views.make_passwords
+        views.make_passwords = make_passwords
+        self.addCleanup(setattr, views, 'make_passwords', original)
+
+        payload = [self.payload('sergeybrin', 'c' * 32),
+                   self.payload('ericschmidt', 'd' * 32)]
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), [
+            {},
+            {'username': ['user with this username already exists.']},
+        ])
+        self.assertEqual(User.objects.count(), 2)
+
+
+class BulkInsertTestCase(TestCase):
+
+    def entries(self, count):
+        blog = BlogFactory()
+        return [Entry(blog=blog, headline='Headline {}'.format(i),
+                      body_text='Some body text', pub_date=timezone.now(),
+                      number_comments=0, scoring=0)
+                for i in range(count)]
+
+    def test_ids(self):
+        """Should set the ids the rows were inserted with, never reusing
+           the ids of deleted rows nor giving them to later inserts"""
+        with transaction.atomic():
+            entries = bulk_insert(Entry, self.entries(2))
+        self.assertEqual(
+            [Entry.objects.get(pk=entry.pk).headline for entry in entries],
+            ['Headline 0', 'Headline 1'])
+
+        Entry.objects.filter(pk=entries[1].pk).delete()
+        with transaction.atomic():
+            more = bulk_insert(Entry, self.entries(2))
+        self.assertGreater(more[0].pk, entries[1].pk)
+        self.assertEqual(more[1].pk, more[0].pk + 1)
+        later = EntryFactory()
+        self.assertGreater(later.pk, more[1].pk)
+
+    def test_stats(self):
+        """Should add the entries to the stats of their blog once"""
+        entries = self.entries(2)
+        with transaction.atomic():
+            bulk_insert(Entry, entries)
+        blog = Blog.objects.get(pk=entries[0].blog_id)
+        self.assertEqual(blog.entry_count, 2)
+
+    def test_stats_without_reserved_ids(self):
+        """Should add the entries to the stats of their blog once when
+           they are saved one by one"""
+        self.addCleanup(setattr, bulk, 'reserve_ids', bulk.reserve_ids)
+        bulk.reserve_ids = lambda connection, model, count: None
+        entries = self.entries(2)
+        with transaction.atomic():
+            bulk_insert(Entry, entries)
+        blog = Blog.objects.get(pk=entries[0].blog_id)
+        self.assertEqual(blog.entry_count, 2)
+        self.assertTrue(all(entry.pk for entry in entries))
@@ -0,0 +1,98 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.mixins import response_cache
+from blog.models import User
+from blog.pagination import count_cache
+from .fixtures import *
+
+
+class ConditionalGetTestCase(APITestCase):
+
+    def setUp(self):
+        super(ConditionalGetTestCase, self).setUp()
+        count_cache.clear()
+        response_cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.user_2 = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='x' * 32,
+            secretkey='z' * 32)
+        self.entries = EntryFactory.create_batch(3)
+        for entry in self.entries:
+            entry.users.add(self.user)
+        self.params = {'accesskey': self.user.accesskey}
+
+    def get(self, url, etag=None, **headers):
+        if etag is not None:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(url, self.params, **headers)
+
+    def assertModified(self, url, etag):
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def assertNotModified(self, url, etag):
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_detail_if_none_match(self):
+        """Should answer 304 until the object changes"""
+        url = '/api/entries/{}'.format(self.entries[0].id)
+        etag = self.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.entries[0].headline = 'New headline'
+        self.entries[0].save()
+        etag = self.assertModified(url, etag)
+        self.assertNotModified(url, etag)
+
+        self.entries[0].users.add(self.user_2)
+        self.assertModified(url, etag)
+
+    def test_detail_if_modified_since(self):
+        url = '/api/blogs/{}'.format(self.entries[0].blog_id)
+        response = self.get(url)
+        response = self.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_if_none_match(self):
+        """Should answer 304 until a row of the page, or the count,
+           changes"""
+        url = '/api/entries'
+        etag = self.get(url)['ETag']
+        self.assertNotModified(url, etag)
+
+        self.entries[1].users.remove(self.user)
+        etag = self.assertModified(url, etag)
+
+        EntryFactory()
+        count_cache.clear()
+        etag = self.assertModified(url, etag)
+
+        self.entries[2].delete()
+        etag = self.assertModified(url, etag)
+        self.assertNotModified(url, etag)
+        self.assertNotIn('Last-Modified', self.get(url))
+
+    def test_user_delete_touches_entries(self):
+        """Should change the entries rendering the deleted user"""
+        url = '/api/entries/{}'.format(self.entries[0].id)
+        self.entries[0].users.add(self.user_2)
+        etag = self.get(url)['ETag']
+        self.user_2.delete()
+        self.assertModified(url, etag)
+
+    def test_etag_depends_on_representation(self):
+        """Should not share validators between formats or pages"""
+        etag = self.get('/api/entries')['ETag']
+        self.params['limit'] = 1
+        self.assertModified('/api/entries', etag)
+        self.params['format'] = 'api'
+        self.assertModified('/api/entries', etag)
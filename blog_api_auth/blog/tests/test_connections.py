@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase
+
+from blog.backends.pool import ConnectionPool
+from blog.signals import close_if_unusable
+
+
+class FakeConnection(object):
+
+    def __init__(self):
+        self.closed = False
+        self.works = True
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(SimpleTestCase):
+
+    def get_pool(self, **kwargs):
+        return ConnectionPool(FakeConnection, lambda conn: conn.works,
+                              **kwargs)
+
+    def test_reuse(self):
+        """Should hand out a returned connection again"""
+        pool = self.get_pool()
+        first = pool.get()
+        pool.put(first)
+        self.assertIs(pool.get(), first)
+        self.assertEqual(pool.stats()['hits'], 1)
+
+    def test_max_idle(self):
+        """Should close the connections returned beyond max_idle"""
+        pool = self.get_pool(max_idle=1)
+        first, second = pool.get(), pool.get()
+        pool.put(first)
+        pool.put(second)
+        self.assertFalse(first.closed)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['idle'], 1)
+
+    def test_health_check(self):
+        """Should discard a broken connection idle for too long"""
+        pool = self.get_pool(check_interval=0)
+        first = pool.get()
+        pool.put(first)
+        first.works = False
+        second = pool.get()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+
+    def test_max_lifetime(self):
+        """Should not reuse connections older than max_lifetime"""
+        pool = self.get_pool(max_lifetime=0)
+        first = pool.get()
+        pool.put(first)
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.get(), first)
+
+    def test_reset_failed(self):
+        """Should discard a connection that can't be reset"""
+        def reset(conn):
+            raise ValueError()
+        pool = self.get_pool(reset=reset)
+        first = pool.get()
+        pool.put(first)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.stats()['idle'], 0)
+
+
+class SQLiteConnectionTestCase(SimpleTestCase):
+
+    def setUp(self):
+        super(SQLiteConnectionTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.connection = DatabaseWrapper(dict(
+            connection.settings_dict,
+            NAME=os.path.join(self.directory, 'db.sqlite3')), 'pragmas')
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory)
+        super(SQLiteConnectionTestCase, self).tearDown()
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute('PRAGMA {}'.format(name))
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """Should apply SQLITE_PRAGMAS on connect"""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('mmap_size'), 256 * 1024 * 1024)
+
+    def test_close_if_unusable(self):
+        """Should close a connection that stopped working only"""
+        self.connection.ensure_connection()
+        close_if_unusable(self.connection)
+        self.assertIsNotNone(self.connection.connection)
+
+        self.connection.is_usable = lambda: False
+        close_if_unusable(self.connection)
+        self.assertIsNone(self.connection.connection)
+
+    def test_check_interval(self):
+        """Should not check a connection made or checked within the
+           interval"""
+        def is_usable():
+            checks.append(True)
+            return False
+        checks = []
+        self.connection.ensure_connection()
+        self.connection.is_usable = is_usable
+        close_if_unusable(self.connection, interval=60)
+        self.assertEqual(checks, [])
+        self.assertIsNotNone(self.connection.connection)
+
+        self.connection.health_checked_at -= 61
+        close_if_unusable(self.connection, interval=60)
+        self.assertEqual(checks, [True])
+        self.assertIsNone(self.connection.connection)
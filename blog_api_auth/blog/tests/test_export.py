@@ -0,0 +1,60 @@
+import json
+
+from django.test import override_settings
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.models import User
+from .fixtures import *
+
+
+class EntryExportTestCase(APITestCase):
+
+    def setUp(self):
+        super(EntryExportTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.entries = EntryFactory.create_batch(5)
+        for entry in self.entries:
+            entry.users.add(self.user)
+        self.entries[2].headline = 'Python tips'
+        self.entries[2].save()
+        self.params = {'accesskey': self.user.accesskey, 'format': 'ndjson'}
+
+    def export(self, **params):
+        self.params.update(params)
+        response = self.client.get('/api/entries/export', self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        body = b''.join(response.streaming_content).decode('utf-8')
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_export(self):
+        """Should stream every entry, one detail representation per line"""
+        rows = self.export()
+        self.assertEqual(len(rows), 5)
+        detail = self.client.get(
+            '/api/entries/{}'.format(self.entries[0].id),
+            {'accesskey': self.user.accesskey}).json()
+        self.assertEqual(rows[0], detail)
+
+    def test_export_search(self):
+        """Should only export entries matching ?search="""
+        rows = self.export(search='python')
+        self.assertEqual([row['headline'] for row in rows], ['Python tips'])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_chunks(self):
+        """Should read entries and their users a chunk at a time"""
+        self.client.get('/api/blogs', {'accesskey': self.user.accesskey})
+        # 3 chunks of entries + 3 users prefetches
+        with self.assertNumQueries(6):
+            rows = self.export()
+        self.assertEqual(len(rows), 5)
+
+    def test_export_missing_accesskey(self):
+        """Should return 403 when no accesskey is given in url"""
+        response = self.client.get('/api/entries/export', {'format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,53 @@
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import (
+    check_password, get_hasher, make_password)
+from django.test import TestCase, override_settings
+
+from blog.hashers import make_passwords
+from blog.models import User
+
+
+class HasherPolicyTestCase(TestCase):
+
+    def setUp(self):
+        super(HasherPolicyTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+
+    def test_configured_cost(self):
+        """Should hash with the configured number of iterations"""
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            algorithm, iterations, salt, hash = make_password(
+                'abc123').split('$')
+        self.assertEqual(algorithm, 'pbkdf2_sha256')
+        self.assertEqual(iterations, '1000')
+
+    def test_rehash_on_login(self):
+        """Should rehash a password of another cost on the next login
+           only"""
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            self.assertTrue(get_hasher().must_update(self.user.password))
+            user = User.objects.get(pk=self.user.pk)
+            self.assertEqual(user.password, self.user.password)
+
+            authenticate(username='larrypage', password='abc123')
+            password = User.objects.get(pk=self.user.pk).password
+            self.assertEqual(password.split('$')[1], '1000')
+            self.assertTrue(authenticate(
+                username='larrypage', password='abc123'))
+
+    def test_no_rehash_on_failed_login(self):
+        """Should leave the password alone on a failed login"""
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            authenticate(username='larrypage', password='wrong')
+        self.assertEqual(User.objects.get(pk=self.user.pk).password,
+                         self.user.password)
+
+    @override_settings(PASSWORD_HASHING_THREADS=0)
+    def test_make_passwords(self):
+        """Should hash every password, each one with its own salt"""
+        passwords = make_passwords(['abc123', 'abc123'])
+        self.assertNotEqual(passwords[0], passwords[1])
+        for password in passwords:
+            self.assertTrue(check_password('abc123', password))
@@ -0,0 +1,72 @@
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.instrumentation import samples, PHASES
+from blog.mixins import response_cache
+from blog.models import User
+from blog.pagination import count_cache
+from .fixtures import *
+
+
+@override_settings(INSTRUMENTATION_SAMPLE_RATE=1.0)
+class InstrumentationTestCase(APITestCase):
+
+    def setUp(self):
+        super(InstrumentationTestCase, self).setUp()
+        samples.clear()
+        count_cache.clear()
+        response_cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32, is_staff=True)
+        EntryFactory.create_batch(3)
+        self.params = {'accesskey': self.user.accesskey}
+
+    def test_sample(self):
+        """Should record the route, queries and phases of the request"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/entries', self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(samples), 1)
+        sample = samples[0]
+        self.assertEqual(sample['route'], 'entry-list')
+        self.assertEqual(sample['method'], 'GET')
+        self.assertEqual(sample['status'], 200)
+        # and still visible to the connection's own log
+        self.assertEqual(sample['queries'], len(queries))
+        self.assertGreater(sample['duration'], 0)
+        for phase in PHASES:
+            self.assertGreaterEqual(sample['phases'][phase], 0)
+        self.assertLessEqual(sum(sample['phases'].values()),
+                             sample['duration'])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        self.client.get('/api/entries', self.params)
+        self.assertEqual(len(samples), 0)
+
+    def test_stats(self):
+        """Should aggregate the samples per route, for admin users only"""
+        self.client.get('/api/entries', self.params)
+        self.client.get('/api/entries', self.params)
+        self.client.get('/api/blogs', self.params)
+
+        response = self.client.get('/api/metrics/requests', self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        routes = response.json()['routes']
+        self.assertEqual(routes['GET entry-list']['count'], 2)
+        self.assertEqual(
+            sum(routes['GET entry-list']['latency_histogram'].values()), 2)
+        self.assertEqual(routes['GET blog-list']['count'], 1)
+        self.assertEqual(sorted(routes['GET blog-list']['phases_ms']),
+                         sorted(PHASES))
+
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get('/api/metrics/requests', self.params)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
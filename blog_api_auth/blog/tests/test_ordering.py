@@ -0,0 +1,68 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.mixins import response_cache
+from blog.models import User, Entry
+from blog.views import EntryViewSet
+from .fixtures import *
+
+
+class EntryOrderingTestCase(APITestCase):
+
+    def setUp(self):
+        super(EntryOrderingTestCase, self).setUp()
+        if response_cache is not None:
+            response_cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.low = EntryFactory(scoring='1.50', headline='B')
+        self.high = EntryFactory(scoring='8.00', headline='A')
+        self.tied = EntryFactory(scoring='1.50', headline='C')
+
+    def get_ids(self, **params):
+        params['accesskey'] = self.user.accesskey
+        response = self.client.get('/api/entries', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [int(entry['url'].rsplit('/', 1)[1])
+                for entry in response.json()['results']]
+
+    def test_ordering_fields_are_indexed(self):
+        """Should only allow orderings leading an index of Entry"""
+        leading = set(fields[0] for fields in Entry._meta.index_together)
+        leading.update(field.name for field in Entry._meta.fields
+                       if field.db_index or field.primary_key)
+        for field in EntryViewSet.ordering_fields:
+            self.assertIn(field, leading)
+
+    def test_ties_broken_by_id(self):
+        """Should break ties by id, in the direction of the ordering"""
+        self.assertEqual(self.get_ids(ordering='scoring'),
+                         [self.low.id, self.tied.id, self.high.id])
+        self.assertEqual(self.get_ids(ordering='-scoring'),
+                         [self.high.id, self.tied.id, self.low.id])
+
+    def test_unindexed_ordering_ignored(self):
+        """Should keep the default ordering for fields not allowed"""
+        self.assertEqual(self.get_ids(ordering='headline'),
+                         [self.low.id, self.high.id, self.tied.id])
+
+    def test_only_first_field(self):
+        """Should ignore any ordering field after the first one"""
+        self.assertEqual(self.get_ids(ordering='-scoring,number_comments'),
+                         [self.high.id, self.tied.id, self.low.id])
+
+    def test_cursor_pagination(self):
+        """Should walk every entry once through cursor pages"""
+        params = {'ordering': '-scoring', 'pagination': 'cursor',
+                  'limit': 1, 'accesskey': self.user.accesskey}
+        ids = []
+        response = self.client.get('/api/entries', params)
+        while True:
+            data = response.json()
+            ids.extend(int(entry['url'].rsplit('/', 1)[1])
+                       for entry in data['results'])
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(ids, [self.high.id, self.tied.id, self.low.id])
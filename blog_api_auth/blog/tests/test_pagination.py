@@ -0,0 +1,125 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.models import User
+from blog.pagination import count_cache
+from .fixtures import *
+
+
+class CursorPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        super(CursorPaginationTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.entries = EntryFactory.create_batch(5)
+
+    def walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertNotIn('count', data)
+            ids.extend(
+                int(entry['url'].rsplit('/', 1)[1])
+                for entry in data['results'])
+            if not data['next']:
+                return ids
+            response = self.client.get(data['next'])
+
+    def test_walk_all_entries(self):
+        """Should return every entry exactly once, ordered by id"""
+        params = {'accesskey': self.user.accesskey, 'pagination': 'cursor',
+                  'limit': 2}
+        ids = self.walk('/api/entries', params)
+        self.assertEqual(ids, [entry.id for entry in self.entries])
+
+    def test_walk_all_entries_descending(self):
+        """Should honour the ordering query param"""
+        params = {'accesskey': self.user.accesskey, 'pagination': 'cursor',
+                  'limit': 2, 'ordering': '-id'}
+        ids = self.walk('/api/entries', params)
+        self.assertEqual(ids, [entry.id for entry in reversed(self.entries)])
+
+    def test_limit_offset_by_default(self):
+        """Should keep LimitOffsetPagination when not opted in"""
+        params = {'accesskey': self.user.accesskey, 'limit': 2}
+        response = self.client.get('/api/entries', params)
+        self.assertEqual(response.json()['count'], 5)
+        self.assertEqual(len(response.json()['results']), 2)
+
+
+class CachedCountPaginationTestCase(APITestCase):
+
+    def setUp(self):
+        super(CachedCountPaginationTestCase, self).setUp()
+        count_cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.blog = BlogFactory()
+        EntryFactory.create_batch(3, blog=self.blog)
+        self.params = {'accesskey': self.user.accesskey, 'limit': 2}
+        # warm up the accesskey cache
+        self.client.get('/api/users', self.params)
+
+    def test_count_is_cached(self):
+        """Should only run COUNT(*) once for the same list"""
+        with self.assertNumQueries(3):
+            self.client.get('/api/entries', self.params)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/entries', self.params)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertFalse(
+            [q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
+
+    def test_count_is_cached_per_search(self):
+        """Should not reuse the count of a different search"""
+        self.client.get('/api/entries', self.params)
+        self.params['search'] = 'foobar'
+        response = self.client.get('/api/entries', self.params)
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_count_is_invalidated_on_save(self):
+        """Should count again once an entry has been created"""
+        self.client.get('/api/entries', self.params)
+        EntryFactory(blog=self.blog)
+        response = self.client.get('/api/entries', self.params)
+        self.assertEqual(response.json()['count'], 4)
+
+    def test_count_none(self):
+        """Should skip the count and still link to the next page"""
+        self.params['count'] = 'none'
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/entries', self.params)
+        data = response.json()
+        self.assertNotIn('count', data)
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNotNone(data['next'])
+
+        response = self.client.get(data['next'])
+        data = response.json()
+        self.assertEqual(len(data['results']), 1)
+        self.assertIsNone(data['next'])
+
+    def test_count_estimated_without_statistics(self):
+        """Should fall back to an exact count without planner statistics"""
+        self.params['count'] = 'estimated'
+        response = self.client.get('/api/entries', self.params)
+        self.assertEqual(response.json()['count'], 3)
+
+    def test_count_estimated_with_statistics(self):
+        """Should read the row count from planner statistics"""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.params['count'] = 'estimated'
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/entries', self.params)
+        self.assertEqual(response.json()['count'], 3)
+        self.assertFalse(
+            [q for q in ctx.captured_queries if 'COUNT(' in q['sql']])
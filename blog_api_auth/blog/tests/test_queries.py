@@ -0,0 +1,87 @@
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
+
+from blog.models import User
+from blog.pagination import count_cache
+from blog.permissions import IsOwnerOrReadOnly
+from .fixtures import *
+
+
+class EntryListQueriesTestCase(APITestCase):
+
+    def setUp(self):
+        super(EntryListQueriesTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.user_2 = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='x' * 32,
+            secretkey='z' * 32)
+        for blog in BlogFactory.create_batch(3):
+            for entry in EntryFactory.create_batch(20, blog=blog):
+                entry.users.add(self.user, self.user_2)
+        self.params = {'accesskey': self.user.accesskey}
+        # warm up the accesskey cache
+        self.client.get('/api/blogs', self.params)
+
+    def test_list_query_count_is_constant(self):
+        """Should run count + page + users prefetch whatever the page size"""
+        for limit in (1, 10, 60):
+            count_cache.clear()
+            self.params['limit'] = limit
+            with self.assertNumQueries(3):
+                response = self.client.get('/api/entries', self.params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.json()['results']), limit)
+            self.assertEqual(len(response.json()['results'][0]['users']), 2)
+
+    def test_update_renders_fresh_users(self):
+        """Should not render the prefetched users after changing them"""
+        entry = Entry.objects.filter(users=self.user).first()
+        headers = {'HTTP_X_SECRET_KEY': self.user.secretkey}
+        user_url = 'http://testserver/api/users/{}'.format(self.user.pk)
+        response = self.client.patch(
+            '/api/entries/{}?accesskey={}'.format(
+                entry.id, self.user.accesskey),
+            data={'users': [user_url]}, format='json', **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['users'], [user_url])
+
+
+class EntryOwnershipQueriesTestCase(APITestCase):
+
+    def setUp(self):
+        super(EntryOwnershipQueriesTestCase, self).setUp()
+        self.factory = APIRequestFactory()
+        self.users = [
+            User.objects.create(
+                username='user{}'.format(i), accesskey=str(i).zfill(32),
+                secretkey='b' * 32)
+            for i in range(50)]
+        self.entry = EntryFactory()
+        self.entry.users.add(*self.users[1:])
+
+    def check(self, request, user):
+        request.user = user
+        return IsOwnerOrReadOnly().has_object_permission(
+            request, None, self.entry)
+
+    def test_single_exists_query_cached_on_request(self):
+        """Should resolve ownership with one query per request and entry"""
+        request = Request(self.factory.patch('/api/entries/1'))
+        with self.assertNumQueries(1):
+            self.assertTrue(self.check(request, self.users[-1]))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check(request, self.users[-1]))
+
+    def test_not_owner(self):
+        """Should deny write access to users out of the entry"""
+        request = Request(self.factory.delete('/api/entries/1'))
+        self.assertFalse(self.check(request, self.users[0]))
+
+    def test_safe_method_skips_query(self):
+        """Should not query the database for read-only requests"""
+        request = Request(self.factory.get('/api/entries/1'))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.check(request, self.users[0]))
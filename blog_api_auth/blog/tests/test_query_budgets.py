@@ -0,0 +1,188 @@
+from __future__ import print_function
+
+import os
+import sys
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APITestCase
+
+from blog.authentication import (
+    user_cache, unknown_accesskey_cache, verified_secretkeys)
+from blog.mixins import response_cache
+from blog.models import User
+from blog.pagination import count_cache
+from blog_api_auth.urls import router
+from .fixtures import *
+
+
+# (route name, method) -> most queries allowed, with cold caches and
+# lists of several entries sharing several users, so any N+1 shows up.
+# Writes still resolve each hyperlink of the payload with its own query,
+# and entry writes update the stats of their blogs (see blog.stats), each
+# entry update reading the stats of the row it replaces first.
+QUERY_BUDGETS = {
+    ('api-root', 'GET'): 1,
+    ('user-list', 'GET'): 3,
+    ('user-list', 'POST'): 4,
+    ('user-detail', 'GET'): 2,
+    ('user-detail', 'PUT'): 5,
+    ('user-detail', 'PATCH'): 5,
+    ('user-detail', 'DELETE'): 9,
+    ('user-bulk', 'POST'): 7,
+    ('blog-list', 'GET'): 3,
+    ('blog-list', 'POST'): 2,
+    ('blog-detail', 'GET'): 2,
+    ('blog-detail', 'PUT'): 3,
+    ('blog-detail', 'PATCH'): 3,
+    ('blog-detail', 'DELETE'): 7,
+    ('entry-list', 'GET'): 4,
+    ('entry-list', 'POST'): 13,
+    ('entry-detail', 'GET'): 3,
+    ('entry-detail', 'PUT'): 14,
+    ('entry-detail', 'PATCH'): 14,
+    ('entry-detail', 'DELETE'): 8,
+    ('entry-bulk', 'POST'): 24,
+    ('entry-bulk', 'PATCH'): 18,
+    ('entry-bulk', 'DELETE'): 7,
+    ('entry-export', 'GET'): 3,
+}
+
+# QUERY_BUDGETS_REPORT=1 prints the actual counts, to tighten the budgets
+REPORT = bool(os.environ.get('QUERY_BUDGETS_REPORT'))
+
+
+def get_routes():
+    """Returns the (route name, method) of every route of the router"""
+    routes = set()
+    for pattern in router.urls:
+        actions = getattr(pattern.callback, 'actions', None) or {'get': None}
+        routes.update((pattern.name, method.upper()) for method in actions)
+    return routes
+
+
+class QueryBudgetTestCase(APITestCase):
+
+    def setUp(self):
+        super(QueryBudgetTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.users = [self.user] + [
+            User.objects.create(
+                username='user{}'.format(i), accesskey=str(i).zfill(32),
+                secretkey='b' * 32)
+            for i in range(3)]
+        self.blogs = BlogFactory.create_batch(3)
+        self.entries = []
+        for blog in self.blogs:
+            for entry in EntryFactory.create_batch(2, blog=blog):
+                entry.users.add(*self.users)
+                self.entries.append(entry)
+        self.client.credentials(HTTP_X_SECRET_KEY=self.user.secretkey)
+
+    def url(self, name, *args):
+        return 'http://testserver/api/{}{}'.format(
+            name, ''.join('/{}'.format(arg) for arg in args))
+
+    def entry_payload(self, **attrs):
+        payload = {
+            'blog': self.url('blogs', self.blogs[0].id),
+            'users': [self.url('users', user.id) for user in self.users],
+            'headline': 'New entry',
+            'body_text': 'Some body text',
+            'number_comments': 15,
+            'scoring': 4.25,
+        }
+        payload.update(attrs)
+        return payload
+
+    def get_request(self, name, method):
+        """Returns the (url, data) to exercise given route and method"""
+        user_payload = {'username': 'newuser', 'password': 'abc123',
+                        'accesskey': 'c' * 32, 'secretkey': 'd' * 32}
+        blog_payload = {'name': 'New blog', 'tagline': 'Some tagline'}
+        entries = self.entries[:3]
+        requests = {
+            'api-root': ('/api/', None),
+            'user-list': ('/api/users', user_payload),
+            'user-detail': (
+                '/api/users/{}'.format(self.user.id), user_payload),
+            'user-bulk': ('/api/users/bulk', [
+                dict(user_payload, username='newuser{}'.format(i),
+                     accesskey=str(i).rjust(32, 'c'))
+                for i in range(3)]),
+            'blog-list': ('/api/blogs', blog_payload),
+            'blog-detail': (
+                '/api/blogs/{}'.format(self.blogs[0].id), blog_payload),
+            'entry-list': ('/api/entries', self.entry_payload()),
+            'entry-detail': (
+                '/api/entries/{}'.format(self.entries[0].id),
+                self.entry_payload()),
+            'entry-bulk': ('/api/entries/bulk', {
+                'POST': [self.entry_payload() for _ in entries],
+                'PATCH': [{'id': entry.id, 'headline': 'New headline',
+                           'users': [self.url('users', self.user.id)]}
+                          for entry in entries],
+                'DELETE': [entry.id for entry in entries],
+            }[method] if name == 'entry-bulk' else None),
+            'entry-export': ('/api/entries/export', None),
+        }
+        url, data = requests[name]
+        params = '?accesskey={}'.format(self.user.accesskey)
+        if name == 'entry-export':
+            params += '&format=ndjson'
+        return url + params, data
+
+    def count_queries(self, name, method):
+        url, data = self.get_request(name, method)
+        for cache in (user_cache, unknown_accesskey_cache,
+                      verified_secretkeys, count_cache, response_cache):
+            cache.clear()
+
+        # every request starts from the same rows
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                if method == 'GET':
+                    response = self.client.get(url)
+                else:
+                    response = getattr(self.client, method.lower())(
+                        url, data, format='json')
+                if response.streaming:
+                    content = b''.join(response.streaming_content)
+                else:
+                    content = response.content
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, '{} {}: {}'.format(
+            method, url, content))
+        return len(queries)
+
+    def test_every_route_has_a_budget(self):
+        """Should declare a budget for each route and method"""
+        missing = get_routes() - set(QUERY_BUDGETS)
+        self.assertEqual(missing, set())
+
+    def test_query_budgets(self):
+        """Should stay within the query budget of each route and method"""
+        results = []
+        for name, method in sorted(get_routes()):
+            budget = QUERY_BUDGETS.get((name, method))
+            results.append(
+                (name, method, budget, self.count_queries(name, method)))
+
+        if REPORT:
+            print('\n{:<16}{:<8}{:>8}{:>8}'.format(
+                'route', 'method', 'budget', 'actual'), file=sys.stderr)
+            for name, method, budget, count in results:
+                print('{:<16}{:<8}{:>8}{:>8}{}'.format(
+                    name, method, budget, count,
+                    '  <- can be tightened'
+                    if budget is not None and count < budget else ''),
+                    file=sys.stderr)
+
+        over = ['{} {}: {} queries, budget {}'.format(
+                    method, name, count, budget)
+                for name, method, budget, count in results
+                if budget is not None and count > budget]
+        self.assertEqual(over, [])
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+import io
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from blog import renderers
+from blog.parsers import FastJSONParser
+from blog.renderers import FastJSONRenderer
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+
+    data = [OrderedDict([
+        ('id', 1),
+        ('scoring', Decimal('4.25')),
+        ('ratio', 0.1),
+        ('pub_date', datetime.date(2016, 10, 17)),
+        ('created', datetime.datetime(2016, 10, 17, 9, 30, 15, 123456,
+                                      tzinfo=timezone.utc)),
+        ('at', datetime.time(9, 30)),
+        ('headline', 'Caf\xe9 \u2028 "quoted" </script>'),
+        ('users', ['http://testserver/api/users/1', None, True]),
+    ])]
+
+    def assertSameOutput(self, data, accepted_media_type=None):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type))
+
+    def test_same_output_as_json_renderer(self):
+        """Should render Decimal, dates and unicode exactly like before"""
+        self.assertSameOutput(self.data)
+        self.assertSameOutput({'detail': 'Not found.'})
+        self.assertSameOutput(None)
+
+    def test_indent(self):
+        """Should pretty print when asked to"""
+        self.assertSameOutput(self.data, 'application/json; indent=4')
+
+    def test_fallback(self):
+        """Should render with the stdlib when orjson is missing or refuses
+           the data"""
+        self.assertSameOutput({'big': 2 ** 70})
+        orjson, renderers.orjson = renderers.orjson, None
+        try:
+            self.assertSameOutput(self.data)
+        finally:
+            renderers.orjson = orjson
+
+    def test_unencodable(self):
+        """Should raise like JSONRenderer"""
+        with self.assertRaises(TypeError):
+            FastJSONRenderer().render({'obj': object()})
+
+
+class FastJSONParserTestCase(SimpleTestCase):
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {})
+
+    def test_same_output_as_json_parser(self):
+        body = json.dumps({
+            'headline': 'Caf\xe9', 'scoring': 4.25, 'users': [1, None],
+        }).encode('utf-8')
+        self.assertEqual(self.parse(FastJSONParser(), body),
+                         self.parse(JSONParser(), body))
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            self.parse(FastJSONParser(), b'{"headline": ')
@@ -0,0 +1,182 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import override_settings
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog import authentication, routers
+from blog.cache import FileCache, LRUCache
+from blog.mixins import response_cache
+from blog.models import Blog, Entry, User
+from blog.pagination import count_cache
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICA=REPLICA)
+class ReplicaRoutingTestCase(APITestCase):
+    """The test database is the primary, a second SQLite file the replica.
+       Nothing copies rows from one to the other, so which database served
+       a request shows in its output."""
+    multi_db = True
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        call_command('migrate', database=REPLICA, verbosity=0,
+                     interactive=False)
+        super(ReplicaRoutingTestCase, cls).setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super(ReplicaRoutingTestCase, cls).tearDownClass()
+        connections[REPLICA].close()
+        del connections.databases[REPLICA]
+        if hasattr(connections._connections, REPLICA):
+            delattr(connections._connections, REPLICA)
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        super(ReplicaRoutingTestCase, self).setUp()
+        for cache in (authentication.user_cache,
+                      authentication.unknown_accesskey_cache,
+                      routers.pinned_accesskeys, routers.written_models,
+                      count_cache, response_cache):
+            cache.clear()
+        self.user = self.create_user('larrypage', 'a' * 32, 'b' * 32)
+        self.user_2 = self.create_user('sergeybrin', 'x' * 32, 'z' * 32)
+
+    def create_user(self, username, accesskey, secretkey):
+        """Creates a user on both databases"""
+        user = User.objects.create(username=username, accesskey=accesskey,
+                                   secretkey=secretkey)
+        user.save(using=REPLICA)
+        return user
+
+    def get_names(self, user):
+        response = self.client.get('/api/blogs',
+                                   {'accesskey': user.accesskey})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = json.loads(response.content.decode('utf-8'))['results']
+        return [blog['name'] for blog in results]
+
+    def create_blog(self, user, name):
+        response = self.client.post(
+            '/api/blogs?accesskey={}'.format(user.accesskey),
+            {'name': name, 'tagline': 'Some tagline'},
+            HTTP_X_SECRET_KEY=user.secretkey)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_safe_requests_read_replica(self):
+        Blog.objects.create(name='Primary', tagline='Some tagline')
+        Blog.objects.using(REPLICA).create(name='Replica',
+                                           tagline='Some tagline')
+        self.assertEqual(self.get_names(self.user), ['Replica'])
+        response = self.client.get('/api/blogs/{}'.format(
+            Blog.objects.using(REPLICA).get().pk),
+            {'accesskey': self.user.accesskey})
+        self.assertEqual(response.data['name'], 'Replica')
+
+    def test_no_replica(self):
+        Blog.objects.create(name='Primary', tagline='Some tagline')
+        with override_settings(DATABASE_REPLICA=None):
+            self.assertEqual(self.get_names(self.user), ['Primary'])
+
+    def test_accesskey_lookup_on_replica(self):
+        """Should authenticate safe requests against the replica, falling
+           back to the primary for users it doesn't have yet"""
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.get_names(self.user)
+
+        user = User.objects.create(username='newuser', accesskey='c' * 32,
+                                   secretkey='d' * 32)
+        self.get_names(user)
+
+    def test_writes_on_primary(self):
+        self.create_blog(self.user, 'New blog')
+        self.assertTrue(Blog.objects.filter(name='New blog').exists())
+        self.assertFalse(
+            Blog.objects.using(REPLICA).filter(name='New blog').exists())
+
+    def test_read_your_writes(self):
+        """Should read from the primary for a while after a write made with
+           the same accesskey only"""
+        self.create_blog(self.user, 'New blog')
+        self.client.cookies.clear()
+        self.assertEqual(self.get_names(self.user), ['New blog'])
+        response_cache.clear()
+        self.assertEqual(self.get_names(self.user_2), [])
+
+        routers.pinned_accesskeys.clear()
+        response_cache.clear()
+        self.assertEqual(self.get_names(self.user), [])
+
+    def test_read_your_writes_cookie(self):
+        """Should read from the primary while the client sends back the
+           cookie set by its write, whichever process pinned it"""
+        self.create_blog(self.user, 'New blog')
+        routers.pinned_accesskeys.clear()
+        self.assertEqual(self.get_names(self.user_2), ['New blog'])
+
+        self.client.cookies.clear()
+        response_cache.clear()
+        self.assertEqual(self.get_names(self.user_2), [])
+
+    def test_no_cached_response_from_lagging_replica(self):
+        """Should not cache what the replica renders right after a write"""
+        self.create_blog(self.user, 'New blog')
+        self.client.cookies.clear()
+        for _ in range(2):
+            response = self.client.get('/api/blogs',
+                                       {'accesskey': self.user_2.accesskey})
+            self.assertEqual(response['X-Cache'], 'MISS')
+
+        routers.written_models.clear()
+        self.client.get('/api/blogs', {'accesskey': self.user_2.accesskey})
+        response = self.client.get('/api/blogs',
+                                   {'accesskey': self.user_2.accesskey})
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_no_cached_count_from_lagging_replica(self):
+        """Should not cache the count the replica makes right after a
+           write"""
+        self.create_blog(self.user, 'New blog')
+        self.client.cookies.clear()
+        self.get_names(self.user_2)
+        self.assertEqual(len(count_cache), 0)
+
+        routers.written_models.clear()
+        response_cache.clear()
+        self.get_names(self.user_2)
+        self.assertEqual(len(count_cache), 1)
+
+    def test_shared_pins(self):
+        """Should share the pins and writes between the processes of a
+           host along with the file response cache"""
+        with override_settings(RESPONSE_CACHE_BACKEND='file',
+                               RESPONSE_CACHE_DIR=self.directory):
+            cache = routers.get_recent_cache('written_models', 10)
+        self.assertIsInstance(cache, FileCache)
+        with override_settings(RESPONSE_CACHE_BACKEND='memory'):
+            cache = routers.get_recent_cache('written_models', 10)
+        self.assertIsInstance(cache, LRUCache)
+
+    def test_relations_across_databases(self):
+        """Should relate rows of the primary to users read from the
+           replica"""
+        entry = Entry.objects.create(
+            blog=Blog.objects.create(name='Blog', tagline='Some tagline'),
+            headline='Headline', body_text='Some body text',
+            number_comments=0, scoring=0)
+        entry.users.add(User.objects.using(REPLICA).get(pk=self.user.pk))
+        self.assertEqual(list(entry.users.all()), [self.user])
@@ -0,0 +1,205 @@
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog import routers
+from blog.cache import FileCache, LRUCache, TaggedCache
+from blog.mixins import response_cache
+from blog.models import User
+from blog.pagination import count_cache
+from .fixtures import *
+
+
+class ResponseCacheTestCase(APITestCase):
+
+    def setUp(self):
+        super(ResponseCacheTestCase, self).setUp()
+        count_cache.clear()
+        response_cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.user_2 = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='x' * 32,
+            secretkey='z' * 32)
+        self.entries = EntryFactory.create_batch(3)
+        self.blog = self.entries[0].blog
+
+    def get(self, url, user=None, **params):
+        params['accesskey'] = (user or self.user).accesskey
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_shared_between_readers(self):
+        """Should serve the second reader from the cache"""
+        url = '/api/blogs/{}'.format(self.blog.id)
+        response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        # the accesskey lookup only
+        with self.assertNumQueries(1):
+            cached = self.get(url, self.user_2)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, response.content)
+        self.assertEqual(cached['Content-Type'], response['Content-Type'])
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_headers(self):
+        """Should serve hits with the headers of the response cached"""
+        url = '/api/blogs/{}'.format(self.blog.id)
+        response = self.get(url)
+        cached = self.get(url, self.user_2)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        for header in ('Content-Type', 'ETag', 'Last-Modified', 'Allow',
+                       'Vary'):
+            self.assertEqual(cached[header], response[header])
+
+    def test_skipped_after_write(self):
+        """Should not serve the client of a recent write from the cache"""
+        url = '/api/blogs/{}'.format(self.blog.id)
+        self.get(url)
+        # as if written from another process
+        Blog.objects.filter(pk=self.blog.pk).update(name='New name')
+        self.assertEqual(self.get(url)['X-Cache'], 'HIT')
+
+        self.client.cookies[routers.PRIMARY_COOKIE] = '1'
+        # a replica of the primary itself
+        with override_settings(DATABASE_REPLICA='default'):
+            response = self.get(url)
+        self.assertNotIn('X-Cache', response)
+        self.assertEqual(response.json()['name'], 'New name')
+
+    def test_requires_authentication(self):
+        self.get('/api/blogs')
+        response = self.client.get('/api/blogs')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalidated_on_save(self):
+        """Should drop responses rendering the saved model"""
+        url = '/api/blogs/{}'.format(self.blog.id)
+        self.get(url)
+        self.blog.name = 'New name'
+        self.blog.save()
+        response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['name'], 'New name')
+
+    def test_invalidated_on_users_change(self):
+        url = '/api/entries/{}'.format(self.entries[0].id)
+        self.get(url)
+        self.entries[0].users.add(self.user_2)
+        response = self.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['users']), 1)
+
+    def test_invalidated_on_bulk_create(self):
+        self.get('/api/entries')
+        self.client.credentials(HTTP_X_SECRET_KEY=self.user.secretkey)
+        response = self.client.post(
+            '/api/entries/bulk?accesskey={}'.format(self.user.accesskey), [{
+                'blog': 'http://testserver/api/blogs/{}'.format(self.blog.id),
+                'users': ['http://testserver/api/users/{}'.format(
+                    self.user.id)],
+                'headline': 'New entry',
+                'body_text': 'Some body text',
+                'number_comments': 0,
+                'scoring': 4.25,
+            }], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.get('/api/entries')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results']), 4)
+
+    def test_pagination_links_keep_accesskey(self):
+        """Should link to the next page with the requester's accesskey"""
+        self.get('/api/entries', limit=1)
+        response = self.get('/api/entries', self.user_2, limit=1)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertIn('accesskey=' + self.user_2.accesskey,
+                      response.json()['next'])
+        self.assertNotIn(self.user.accesskey.encode('ascii'),
+                         response.content)
+
+    def test_if_none_match(self):
+        url = '/api/blogs/{}'.format(self.blog.id)
+        etag = self.get(url)['ETag']
+        response = self.client.get(url, {'accesskey': self.user.accesskey},
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_browsable_api_not_cached(self):
+        self.get('/api/blogs', format='api')
+        response = self.get('/api/blogs', format='api')
+        self.assertNotIn('X-Cache', response)
+
+    def test_stats(self):
+        """Should expose the counters to admin users only"""
+        response = self.client.get(
+            '/api/metrics/caches', {'accesskey': self.user.accesskey})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.get('/api/blogs')
+        self.get('/api/blogs')
+        self.user.is_staff = True
+        self.user.save()
+        response = self.get('/api/metrics/caches')
+        self.assertEqual(response.json()['responses']['hits'], 1)
+        self.assertIn('evictions', response.json()['counts'])
+
+
+class FileCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.cache = FileCache(self.directory, max_size=2)
+
+    def test_get_set(self):
+        self.cache.set(('key', 1), b'value')
+        self.assertEqual(self.cache.get(('key', 1)), b'value')
+        self.assertIsNone(self.cache.get(('key', 2)))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+        # another process
+        cache = FileCache(self.directory, max_size=2)
+        self.assertEqual(cache.get(('key', 1)), b'value')
+
+    def test_lru_eviction(self):
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        time.sleep(0.01)
+        self.cache.get('a')
+        time.sleep(0.01)
+        self.cache.set('c', 3)
+        self.assertIn('a', self.cache)
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+        self.assertEqual(len(self.cache), 2)
+
+    def test_ttl(self):
+        self.cache.set('a', 1, ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('a'))
+
+
+class TaggedCacheTestCase(SimpleTestCase):
+
+    def test_invalidate(self):
+        cache = TaggedCache(LRUCache(), LRUCache())
+        key = cache.key('url', ['blog.blog', 'blog.user'])
+        cache.set(key, 'response')
+        self.assertEqual(cache.get(cache.key('url', ['blog.blog'])), None)
+        self.assertEqual(
+            cache.get(cache.key('url', ['blog.blog', 'blog.user'])),
+            'response')
+
+        cache.invalidate('blog.user')
+        self.assertIsNone(
+            cache.get(cache.key('url', ['blog.blog', 'blog.user'])))
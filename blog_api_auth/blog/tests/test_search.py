@@ -0,0 +1,148 @@
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.filters import postgresql_tsquery
+from blog.models import User
+from .fixtures import *
+
+
+class EntrySearchTestCase(APITestCase):
+
+    def setUp(self):
+        super(EntrySearchTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.python = EntryFactory(
+            headline='Python tips', body_text='Some body text')
+        self.django = EntryFactory(
+            headline='Django tips', body_text='Python web framework, '
+                                              'written in python')
+        self.rust = EntryFactory(
+            headline='Rust tips', body_text='Some body text')
+
+    def search(self, term, **params):
+        params.update({'accesskey': self.user.accesskey, 'search': term})
+        response = self.client.get('/api/entries', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [int(entry['url'].rsplit('/', 1)[1])
+                for entry in response.json()['results']]
+
+    def test_search_headline_and_body_text(self):
+        """Should match entries by headline or body_text"""
+        self.assertEqual(
+            sorted(self.search('python')),
+            sorted([self.python.id, self.django.id]))
+
+    def test_search_all_terms(self):
+        """Should only match entries containing every term"""
+        self.assertEqual(self.search('django python'), [self.django.id])
+
+    def test_search_prefix(self):
+        """Should match words by prefix"""
+        self.assertEqual(self.search('fram'), [self.django.id])
+
+    def test_search_ranked(self):
+        """Should return the most relevant entries first"""
+        self.assertEqual(self.search('python'),
+                         [self.django.id, self.python.id])
+
+    def test_search_explicit_ordering(self):
+        """Should honour an explicit ordering over the ranking"""
+        self.assertEqual(self.search('python', ordering='id'),
+                         [self.python.id, self.django.id])
+
+    def test_search_syntax_is_escaped(self):
+        """Should not choke on full-text query syntax in search terms"""
+        self.assertEqual(self.search('"python AND OR NEAR('), [])
+
+    def test_index_follows_updates_and_deletes(self):
+        """Should keep the index in sync with the entries table"""
+        self.rust.headline = 'Python is not Rust'
+        self.rust.save()
+        self.python.delete()
+        self.assertEqual(
+            sorted(self.search('python')),
+            sorted([self.django.id, self.rust.id]))
+        self.assertEqual(self.search('rust'), [self.rust.id])
+
+    def test_index_skips_other_columns(self):
+        """Should only rewrite the index on headline and body_text
+           updates"""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND "
+                "name = 'blog_entry_fts_update'")
+            sql, = cursor.fetchone()
+        self.assertIn('AFTER UPDATE OF headline, body_text ON blog_entry',
+                      sql)
+
+
+class PrefixSearchTestCase(APITestCase):
+
+    def setUp(self):
+        super(PrefixSearchTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='LarryPage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        for username in ('larryellison', 'sergeybrin', 'lar'):
+            User.objects.create(username=username,
+                                accesskey=username.ljust(32, 'x'))
+        BlogFactory(name='Python tips')
+        BlogFactory(name='python weekly')
+        BlogFactory(name='Jython and Python')
+
+    def search(self, url, term):
+        params = {'accesskey': self.user.accesskey, 'search': term}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['results']
+
+    def test_username_prefix(self):
+        """Should match usernames by case-insensitive prefix, in order"""
+        results = self.search('/api/users', '^LARRY')
+        self.assertEqual([user['username'] for user in results],
+                         ['larryellison', 'LarryPage'])
+
+    def test_username_prefix_uses_folded_column(self):
+        """Should filter on the indexed case-folded column"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.search('/api/users', '^lar')
+        self.assertIn('"blog_user"."username_folded" >=',
+                      ctx.captured_queries[-1]['sql'])
+
+    def test_blog_name_prefix(self):
+        """Should match blog names by case-insensitive prefix only"""
+        results = self.search('/api/blogs', '^python')
+        self.assertEqual([blog['name'] for blog in results],
+                         ['Python tips', 'python weekly'])
+        self.assertNotIn('name_folded', results[0])
+
+    def test_contains_search_is_kept(self):
+        """Should keep the unanchored search without the ^ marker"""
+        results = self.search('/api/blogs', 'python')
+        self.assertEqual(len(results), 3)
+
+    def test_folded_column_follows_renames(self):
+        """Should keep the folded column in sync on save"""
+        blog = Blog.objects.get(name='Jython and Python')
+        blog.name = 'PYTHON and Jython'
+        blog.save(update_fields=['name'])
+        self.assertEqual(Blog.objects.get(id=blog.id).name_folded,
+                         'python and jython')
+
+
+class PostgreSQLQueryTestCase(SimpleTestCase):
+
+    def test_prefix_terms(self):
+        """Should match every term as a prefix, like the FTS5 query"""
+        self.assertEqual(postgresql_tsquery(['django', 'fram']),
+                         "'django':* & 'fram':*")
+
+    def test_syntax_is_escaped(self):
+        self.assertEqual(postgresql_tsquery(["it's", '\\|!']),
+                         "'it''s':* & '\\\\|!':*")
@@ -0,0 +1,51 @@
+from django.test import override_settings
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.mixins import response_cache
+from blog.models import User
+from .fixtures import *
+
+
+class CompactListSerializerTestCase(APITestCase):
+
+    def setUp(self):
+        super(CompactListSerializerTestCase, self).setUp()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.user_2 = User.objects.create_user(
+            username='sergeybrin', password='abc123', accesskey='x' * 32,
+            secretkey='z' * 32)
+        for entry in EntryFactory.create_batch(5):
+            entry.users.add(self.user, self.user_2)
+        EntryFactory.create_batch(2)
+        self.params = {'accesskey': self.user.accesskey}
+
+    def get_both(self, url, **params):
+        self.params.update(params)
+        response_cache.clear()
+        response = self.client.get(url, self.params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_cache.clear()
+        with override_settings(COMPACT_LIST_SERIALIZERS=False):
+            expected = self.client.get(url, self.params)
+        return response.content, expected.content
+
+    def test_same_output_as_serializer(self):
+        """Should render lists exactly like the regular serializers"""
+        for url in ('/api/users', '/api/blogs', '/api/entries'):
+            compact, expected = self.get_both(url)
+            self.assertEqual(compact, expected)
+
+    def test_same_output_with_cursor_pagination(self):
+        """Should build the same cursor links from `.values()` rows"""
+        compact, expected = self.get_both(
+            '/api/entries', pagination='cursor', limit=2)
+        self.assertEqual(compact, expected)
+
+    def test_same_output_with_search(self):
+        """Should keep the search ranking"""
+        compact, expected = self.get_both('/api/entries', search='a')
+        self.assertEqual(compact, expected)
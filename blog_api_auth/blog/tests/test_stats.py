@@ -0,0 +1,214 @@
+import json
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from blog.mixins import response_cache
+from blog.models import Blog, Entry, User
+from .fixtures import *
+
+
+class BlogStatsTestCase(APITestCase):
+
+    def setUp(self):
+        super(BlogStatsTestCase, self).setUp()
+        response_cache.clear()
+        self.user = User.objects.create_user(
+            username='larrypage', password='abc123', accesskey='a' * 32,
+            secretkey='b' * 32)
+        self.blog = BlogFactory()
+        self.blog_2 = BlogFactory()
+        self.entry = EntryFactory(blog=self.blog, number_comments=10,
+                                  scoring=Decimal('2.00'))
+        self.entry_2 = EntryFactory(blog=self.blog, number_comments=5,
+                                    scoring=Decimal('3.50'))
+        self.entry.users.add(self.user)
+
+    def assertStats(self, blog, entry_count, total_comments, total_scoring):
+        blog = Blog.objects.get(pk=blog.pk)
+        self.assertEqual(
+            (blog.entry_count, blog.total_comments, blog.total_scoring),
+            (entry_count, total_comments, Decimal(total_scoring)))
+
+    def stats_updates(self, queries):
+        return [query for query in queries.captured_queries
+                if query['sql'].startswith('UPDATE "blog_blog"')]
+
+    def get_blog(self, blog):
+        response = self.client.get('/api/blogs/{}'.format(blog.pk),
+                                   {'accesskey': self.user.accesskey})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_create(self):
+        self.assertStats(self.blog, 2, 15, '5.50')
+        self.assertStats(self.blog_2, 0, 0, '0')
+
+    def test_update(self):
+        self.entry.number_comments = 20
+        self.entry.scoring = Decimal('1.25')
+        self.entry.save()
+        self.assertStats(self.blog, 2, 25, '4.75')
+
+    def test_update_stale(self):
+        """Should move the stats from the row as stored, not as it was when
+           each writer loaded it"""
+        entry = Entry.objects.get(pk=self.entry.pk)
+        stale = Entry.objects.get(pk=self.entry.pk)
+        entry.number_comments = 20
+        entry.save()
+        stale.number_comments = 7
+        stale.blog = self.blog_2
+        stale.save()
+        self.assertStats(self.blog, 1, 5, '3.50')
+        self.assertStats(self.blog_2, 1, 7, '2.00')
+
+    def test_update_not_loaded(self):
+        """Should read the stored values of an entry not loaded from the
+           database"""
+        entry = Entry(pk=self.entry.pk, blog=self.blog, headline='Headline',
+                      pub_date=self.entry.pub_date,
+                      body_text='Some body text', number_comments=0,
+                      scoring=Decimal('1.00'))
+        entry.save()
+        self.assertStats(self.blog, 2, 5, '4.50')
+
+    def test_update_fields(self):
+        """Should only count the fields saved"""
+        entry = Entry.objects.get(pk=self.entry.pk)
+        entry.number_comments = 100
+        entry.headline = 'New headline'
+        entry.save(update_fields=['headline'])
+        self.assertStats(self.blog, 2, 15, '5.50')
+
+    def test_update_other_fields_deferred(self):
+        """Should not read the stored stats of a save that doesn't write
+           them"""
+        entry = Entry.objects.only('headline').get(pk=self.entry.pk)
+        entry.headline = 'New headline'
+        with CaptureQueriesContext(connection) as queries:
+            entry.save(update_fields=['headline'])
+        self.assertEqual(len(queries), 1)
+        self.assertStats(self.blog, 2, 15, '5.50')
+
+    def test_blog_reassignment(self):
+        entry = Entry.objects.get(pk=self.entry.pk)
+        entry.blog = self.blog_2
+        entry.save()
+        self.assertStats(self.blog, 1, 5, '3.50')
+        self.assertStats(self.blog_2, 1, 10, '2.00')
+
+    def test_delete(self):
+        Entry.objects.get(pk=self.entry.pk).delete()
+        self.assertStats(self.blog, 1, 5, '3.50')
+        Entry.objects.all().delete()
+        self.assertStats(self.blog, 0, 0, '0')
+
+    def test_delete_batched(self):
+        """Should update each blog once for many entries deleted, and not
+           at all the blogs deleted along"""
+        entry = EntryFactory(blog=self.blog_2, number_comments=1,
+                             scoring=Decimal('1.00'))
+        with CaptureQueriesContext(connection) as queries:
+            Entry.objects.filter(
+                pk__in=[self.entry.pk, self.entry_2.pk, entry.pk]).delete()
+        self.assertEqual(len(self.stats_updates(queries)), 1)
+        self.assertStats(self.blog, 0, 0, '0')
+        self.assertStats(self.blog_2, 0, 0, '0')
+
+        EntryFactory.create_batch(2, blog=self.blog)
+        with CaptureQueriesContext(connection) as queries:
+            Blog.objects.get(pk=self.blog.pk).delete()
+        self.assertEqual(self.stats_updates(queries), [])
+
+    def test_bulk_delete(self):
+        response = self.client.delete(
+            '/api/entries/bulk?accesskey={}'.format(self.user.accesskey),
+            [self.entry.pk], format='json',
+            HTTP_X_SECRET_KEY=self.user.secretkey)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertStats(self.blog, 1, 5, '3.50')
+
+    def test_stale_blog_save(self):
+        """Should not write back the stats of a blog loaded before entry
+           writes"""
+        blog = Blog.objects.get(pk=self.blog.pk)
+        EntryFactory(blog=self.blog, number_comments=1,
+                     scoring=Decimal('1.00'))
+        blog.tagline = 'New tagline'
+        blog.save()
+        self.assertStats(self.blog, 3, 16, '6.50')
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).tagline,
+                         'New tagline')
+
+    def test_stale_blog_save_update_fields(self):
+        """Should leave the stats out of the update_fields of a save"""
+        blog = Blog.objects.get(pk=self.blog.pk)
+        EntryFactory(blog=self.blog, number_comments=1,
+                     scoring=Decimal('1.00'))
+        blog.name = 'New name'
+        blog.save(update_fields=['name', 'entry_count'])
+        self.assertStats(self.blog, 3, 16, '6.50')
+        self.assertEqual(Blog.objects.get(pk=self.blog.pk).name, 'New name')
+
+    def test_api(self):
+        """Should render the stats as read-only fields, in the list too"""
+        data = json.loads(self.get_blog(self.blog).content.decode('utf-8'))
+        self.assertEqual(data['entry_count'], 2)
+        self.assertEqual(data['total_comments'], 15)
+        self.assertEqual(data['average_scoring'], '2.75')
+        self.assertNotIn('total_scoring', data)
+        self.assertIsNone(
+            self.get_blog(self.blog_2).data['average_scoring'])
+
+        response = self.client.get('/api/blogs',
+                                   {'accesskey': self.user.accesskey})
+        results = json.loads(response.content.decode('utf-8'))['results']
+        self.assertEqual(results[0], data)
+
+        response = self.client.patch(
+            '/api/blogs/{}?accesskey={}'.format(self.blog.pk,
+                                                self.user.accesskey),
+            {'entry_count': 100, 'average_scoring': '1.00'},
+            HTTP_X_SECRET_KEY=self.user.secretkey)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertStats(self.blog, 2, 15, '5.50')
+
+    def test_invalidates_blog_responses(self):
+        """Should drop the cached blog and change its ETag on entry
+           writes"""
+        response = self.get_blog(self.blog)
+        self.assertEqual(self.get_blog(self.blog)['X-Cache'], 'HIT')
+
+        EntryFactory(blog=self.blog, number_comments=1,
+                     scoring=Decimal('1.00'))
+        updated = self.get_blog(self.blog)
+        self.assertEqual(updated['X-Cache'], 'MISS')
+        self.assertNotEqual(updated['ETag'], response['ETag'])
+
+    def test_bulk_create(self):
+        response = self.client.post(
+            '/api/entries/bulk?accesskey={}'.format(self.user.accesskey),
+            [{'blog': 'http://testserver/api/blogs/{}'.format(self.blog_2.pk),
+              'users': ['http://testserver/api/users/{}'.format(
+                  self.user.pk)],
+              'headline': 'Headline',
+              'body_text': 'Some body text', 'number_comments': 3,
+              'scoring': 1.5}] * 2,
+            format='json', HTTP_X_SECRET_KEY=self.user.secretkey)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertStats(self.blog_2, 2, 6, '3.00')
+
+    def test_rebuild(self):
+        Blog.objects.update(entry_count=7, total_comments=7, total_scoring=7)
+        out = StringIO()
+        call_command('rebuild_blog_stats', stdout=out)
+        self.assertIn('1 blogs', out.getvalue())
+        self.assertStats(self.blog, 2, 15, '5.50')
+        self.assertStats(self.blog_2, 0, 0, '0')
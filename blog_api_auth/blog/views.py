@@ -1,59 +1,379 @@
+import copy
+from collections import OrderedDict
+
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import six
 
-from rest_framework import viewsets, mixins, filters, status
+from rest_framework import (
+    viewsets, mixins, filters, status, permissions, exceptions)
+from rest_framework.decorators import list_route
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+from rest_framework.views import APIView
 
+from blog import authentication
+from blog.bulk import (
+    bulk_delete, bulk_insert, bulk_insert_users, bulk_set_entry_users)
+from blog.filters import (
+    EntrySearchFilter, IndexedOrderingFilter, PrefixSearchFilter)
+from blog.hashers import make_passwords
+from blog.instrumentation import get_stats
+from blog.mixins import (
+    CachedResponseMixin, CompactListModelMixin, ConditionalGetMixin,
+    InstrumentedViewMixin, ReplicaReadMixin, invalidate_responses,
+    response_cache)
 from blog.models import User, Entry, Blog
-from blog.permissions import IsOwnerOrReadOnly
+from blog.permissions import IsOwnerOrReadOnly, IsSelfOrReadOnly
+from blog.pagination import count_cache, invalidate_counts
+from blog.renderers import FastJSONRenderer, NDJSONRenderer
 from blog.serializers import UserSerializer, EntrySerializer, BlogSerializer
 
 
-class UserViewSet(mixins.RetrieveModelMixin,
+class UserViewSet(InstrumentedViewMixin,
+                  ReplicaReadMixin,
+                  CachedResponseMixin,
+                  ConditionalGetMixin,
+                  mixins.RetrieveModelMixin,
                   mixins.CreateModelMixin,
                   mixins.UpdateModelMixin,
                   mixins.DestroyModelMixin,
-                  mixins.ListModelMixin,
+                  CompactListModelMixin,
                   viewsets.GenericViewSet):
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter)
+    permission_classes = (permissions.IsAuthenticated, IsSelfOrReadOnly)
+    filter_backends = (filters.OrderingFilter, PrefixSearchFilter)
     search_fields = ('username',)
+    prefix_search_field = 'username_folded'
     ordering_fields = ('id',)
+    ordering = ('id',)
+    cache_models = (User,)
+
+    def perform_create(self, serializer):
+        serializer.save(
+            password=make_password(serializer.validated_data['password']))
+
+    def perform_update(self, serializer):
+        password = serializer.validated_data.get('password')
+        if password is None:
+            serializer.save()
+        else:
+            serializer.save(password=make_password(password))
+
+    def get_unique_errors(self, validated_data, fields):
+        """Errors per item for the values of `fields` already taken, in the
+           database or earlier in the list, with one query per field"""
+        errors = [{} for _ in validated_data]
+        for field in fields:
+            values = [attrs[field] for attrs in validated_data]
+            taken = set(User.objects.filter(**{
+                '{}__in'.format(field): values,
+            }).values_list(field, flat=True))
+            for i, value in enumerate(values):
+                if value in taken:
+                    errors[i][field] = [
+                        'user with this {} already exists.'.format(field)]
+                taken.add(value)
+        return errors
+
+    @list_route(methods=['post'])
+    def bulk(self, request):
+        """Creates the users of a JSON array body in a single transaction.
+           Passwords are hashed by a pool of threads (see
+           blog.hashers.make_passwords). Validation errors are reported per
+           item, in input order, and nothing is written unless every item
+           is valid.
+        """
+        items = get_bulk_items(request)
+        serializer = self.get_serializer(data=items, many=True)
+        # uniqueness is checked below with one query per field instead of
+        # one per item and field
+        unique_fields = ('username', 'accesskey')
+        for field in unique_fields:
+            field = serializer.child.fields[field]
+            field.validators = [
+                validator for validator in field.validators
+                if not isinstance(validator, UniqueValidator)]
+        serializer.is_valid(raise_exception=True)
 
-    def update(self, request, *args, **kwargs):
-        # you will probably do some custom actions about the `password` here
-        pass
+        errors = self.get_unique_errors(serializer.validated_data,
+                                        unique_fields)
+        if any(errors):
+            raise exceptions.ValidationError(errors)
 
-    def create(self, request, *args, **kwargs):
-        # you will probably do some custom actions about the `password` here
-        pass
+        passwords = make_passwords(
+            attrs['password'] for attrs in serializer.validated_data)
+        users = [User(**dict(attrs, password=password))
+                 for attrs, password in zip(serializer.validated_data,
+                                            passwords)]
+        try:
+            with transaction.atomic():
+                bulk_insert_users(users)
+        except IntegrityError:
+            # another request took a username or accesskey in the meantime
+            errors = self.get_unique_errors(serializer.validated_data,
+                                            unique_fields)
+            raise exceptions.ValidationError(
+                errors if any(errors) else
+                ['users conflict with users created concurrently.'])
 
+        # bulk_create() sends no post_save
+        invalidate_counts(User)
+        invalidate_responses(User)
+        return Response(self.get_serializer(users, many=True).data,
+                        status=status.HTTP_201_CREATED)
 
-class BlogViewSet(mixins.RetrieveModelMixin,
+
+class BlogViewSet(InstrumentedViewMixin,
+                  ReplicaReadMixin,
+                  CachedResponseMixin,
+                  ConditionalGetMixin,
+                  mixins.RetrieveModelMixin,
                   mixins.CreateModelMixin,
                   mixins.UpdateModelMixin,
                   mixins.DestroyModelMixin,
-                  mixins.ListModelMixin,
+                  CompactListModelMixin,
                   viewsets.GenericViewSet):
 
     queryset = Blog.objects.all()
     serializer_class = BlogSerializer
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter)
+    filter_backends = (filters.OrderingFilter, PrefixSearchFilter)
     search_fields = ('name',)
+    prefix_search_field = 'name_folded'
     ordering_fields = ('id',)
+    ordering = ('id',)
+    cache_models = (Blog,)
 
 
-class EntryViewSet(mixins.RetrieveModelMixin,
+class EntryViewSet(InstrumentedViewMixin,
+                   ReplicaReadMixin,
+                   CachedResponseMixin,
+                   ConditionalGetMixin,
+                   mixins.RetrieveModelMixin,
                    mixins.CreateModelMixin,
                    mixins.UpdateModelMixin,
                    mixins.DestroyModelMixin,
-                   mixins.ListModelMixin,
+                   CompactListModelMixin,
                    viewsets.GenericViewSet):
 
-    queryset = Entry.objects.all()
+    # `blog` is rendered from blog_id alone, `users` needs one prefetch query
+    # per page instead of one per entry; hyperlinks only read the pk and the
+    # username (through User.__str__)
+    queryset = Entry.objects.prefetch_related(
+        Prefetch('users', queryset=User.objects.only('id', 'username')))
     serializer_class = EntrySerializer
-    filter_backends = (filters.SearchFilter, filters.OrderingFilter)
-    search_fields = ('headline',)
-    ordering_fields = ('id',)
-    # configure the custom permission class here
+    filter_backends = (IndexedOrderingFilter, EntrySearchFilter)
+    search_fields = ('headline', 'body_text')
+    # only orderings backed by an index, see Entry.Meta.index_together
+    ordering_fields = ('id', 'pub_date', 'mod_date', 'scoring',
+                       'number_comments')
+    ordering = ('id',)
+    permission_classes = (permissions.IsAuthenticated, IsOwnerOrReadOnly)
+    # users are rendered as links, which go away when the user is deleted
+    cache_models = (Entry, User)
+
+    def perform_update(self, serializer):
+        super(EntryViewSet, self).perform_update(serializer)
+        # `users` may have changed, don't render the stale prefetched set
+        serializer.instance._prefetched_objects_cache = {}
+
+    @list_route(methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """Bulk writes with a JSON array body, in a single transaction:
+             - POST: entries to create
+             - PATCH: partial updates, each one with the `id` to update
+             - DELETE: ids of the entries to delete
+           Validation errors are reported per item, in input order. Nothing
+           is written unless every item is valid and owned by the user.
+        """
+        items = get_bulk_items(request)
+        if request.method == 'POST':
+            response = self.bulk_create(request, items)
+        elif request.method == 'PATCH':
+            response = self.bulk_update(request, items)
+        else:
+            response = self.bulk_destroy(request, items)
+        # bulk_create() sends no post_save
+        invalidate_counts(Entry)
+        invalidate_responses(Entry)
+        return response
+
+    def bulk_create(self, request, items):
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        entries, users = [], []
+        for attrs in serializer.validated_data:
+            attrs = dict(attrs)
+            users.append(attrs.pop('users', []))
+            entries.append(Entry(**attrs))
+        with transaction.atomic():
+            bulk_insert(Entry, entries)
+            bulk_set_entry_users(
+                dict((entry.pk, entry_users)
+                     for entry, entry_users in zip(entries, users)),
+                clear=False)
+
+        return Response(self.serialize_entries([e.pk for e in entries]),
+                        status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, items):
+        entries = self.get_bulk_entries(request, [
+            item.get('id') if isinstance(item, dict) else None
+            for item in items])
+
+        serializers = [
+            self.get_serializer(entry, data=item, partial=True)
+            for entry, item in zip(entries, items)]
+        if not all([serializer.is_valid() for serializer in serializers]):
+            raise exceptions.ValidationError(
+                [serializer.errors for serializer in serializers])
+
+        users_by_entry = {}
+        with transaction.atomic():
+            for entry, serializer in zip(entries, serializers):
+                attrs = dict(serializer.validated_data)
+                if 'users' in attrs:
+                    users_by_entry[entry.pk] = attrs.pop('users')
+                for attr, value in attrs.items():
+                    setattr(entry, attr, value)
+                entry.save()
+            bulk_set_entry_users(users_by_entry)
+
+        return Response(self.serialize_entries([e.pk for e in entries]))
+
+    def bulk_destroy(self, request, items):
+        bulk_delete(Entry, self.get_bulk_entries(request, items))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def get_bulk_entries(self, request, ids):
+        """Returns the entries for given ids, in order. Raises a per-item
+           ValidationError for invalid or unknown ids, and PermissionDenied
+           unless request.user owns all of them (checked in one query).
+        """
+        errors = [{} for _ in ids]
+        for i, pk in enumerate(ids):
+            if (not isinstance(pk, six.integer_types) or
+                    isinstance(pk, bool)):
+                errors[i] = {'id': ['A valid integer is required.']}
+        if any(errors):
+            raise exceptions.ValidationError(errors)
+
+        entries = Entry.objects.in_bulk(ids)
+        for i, pk in enumerate(ids):
+            if pk not in entries:
+                errors[i] = {'id': ['Not found.']}
+        if any(errors):
+            raise exceptions.ValidationError(errors)
+
+        if IsOwnerOrReadOnly.owned_entry_ids(request, ids) != set(ids):
+            self.permission_denied(request)
+        return [entries[pk] for pk in ids]
+
+    def serialize_entries(self, ids):
+        entries = self.get_queryset().in_bulk(ids)
+        return self.get_serializer(
+            [entries[pk] for pk in ids], many=True).data
+
+    @list_route(methods=['get'], renderer_classes=(NDJSONRenderer,
+                                                   FastJSONRenderer))
+    def export(self, request):
+        """Streams every entry (honouring `?search=`) as NDJSON, one entry
+           per line in id order, with the same representation as the
+           detail endpoint. Rows are read in keyset chunks of
+           EXPORT_CHUNK_SIZE, so memory stays flat whatever the table size.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        # the rows are read once the view has returned, from the database
+        # chosen now (see blog.routers)
+        queryset = queryset.using(queryset.db)
+        chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 1000)
+
+        # hyperlinks carry over `?format=` from the request, which would
+        # make them differ from the detail endpoint ones
+        http_request = copy.copy(request._request)
+        http_request.GET = http_request.GET.copy()
+        http_request.GET.pop(api_settings.URL_FORMAT_OVERRIDE, None)
+        context = self.get_serializer_context()
+        context['request'] = Request(http_request)
+        serializer_class = self.get_serializer_class()
+        renderer = FastJSONRenderer()
+
+        def lines():
+            for entry in iter_chunks(queryset, chunk_size):
+                data = serializer_class(entry, context=context).data
+                yield renderer.render(data) + b'\n'
+
+        return StreamingHttpResponse(
+            lines(), content_type=NDJSONRenderer.media_type)
+
+
+class CacheStatsView(InstrumentedViewMixin, APIView):
+    """Size, hits, misses and evictions of the caches, to tune their sizes.
+       Counters are per process. Admin users only.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        caches = OrderedDict([
+            ('responses', response_cache),
+            ('accesskeys', authentication.user_cache),
+            ('unknown_accesskeys', authentication.unknown_accesskey_cache),
+            ('verified_secretkeys', authentication.verified_secretkeys),
+            ('counts', count_cache),
+        ])
+        return Response(OrderedDict(
+            (name, cache.stats() if cache is not None else None)
+            for name, cache in caches.items()))
+
+
+class RequestStatsView(InstrumentedViewMixin, APIView):
+    """Per route and method stats of the requests sampled by
+       blog.instrumentation.InstrumentationMiddleware: count, latency
+       histogram, mean latency, queries, SQL time and time per phase.
+       Per process. Admin users only.
+    """
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_stats())
+
+
+def iter_chunks(queryset, chunk_size):
+    """Iterates over queryset in id order, `chunk_size` rows (plus their
+       prefetches, which .iterator() would skip) at a time, using
+       `id > <last seen>` instead of an OFFSET between chunks.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = None
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        for obj in chunk:
+            yield obj
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def get_bulk_items(request):
+    """Returns the JSON array body of a bulk request, at most
+       BULK_MAX_ITEMS long"""
+    items = request.data
+    if not isinstance(items, list):
+        raise exceptions.ValidationError(
+            {'non_field_errors': ['Expected a list of items.']})
+    max_items = getattr(settings, 'BULK_MAX_ITEMS', 1000)
+    if len(items) > max_items:
+        raise exceptions.ValidationError({'non_field_errors': [
+            'At most {} items are allowed.'.format(max_items)]})
+    return items
@@ -0,0 +1,17 @@
+"""
+ASGI config for blog_api_auth project, for Python 3.5+.
+
+It exposes the ASGI callable as a module-level variable named
+``application``, eg: ``uvicorn blog_api_auth.asgi:application``. Requests
+run the WSGI application on a thread pool, see blog.asgi.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+from blog.asgi import ASGIHandler
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "blog_api_auth.settings")
+
+application = ASGIHandler(get_wsgi_application())
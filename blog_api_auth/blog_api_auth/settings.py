@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    # per route timings of sampled requests, see /api/metrics/requests
+    'blog.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,9 +86,51 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # seconds a connection is kept open across requests, 0 to close it
+        # after each request
+        'CONN_MAX_AGE': 60,
+        # check a kept connection still works before a request, once per
+        # interval in seconds (see
+        # blog.signals.check_persistent_connections)
+        'CONN_HEALTH_CHECKS': True,
+        'CONN_HEALTH_CHECK_INTERVAL': 30,
     }
 }
 
+# On PostgreSQL, connections can instead come from a pool shared by the
+# threads of a process, checked before reuse once idle for a while:
+#
+#     'ENGINE': 'blog.backends.postgresql_pool',
+#     'CONN_MAX_AGE': 0,
+#     'POOL': {'MAX_IDLE': 10, 'CHECK_INTERVAL': 30, 'MAX_LIFETIME': 3600},
+#
+# see blog/backends/postgresql_pool/base.py
+
+# Reads of safe API requests (GET, HEAD, OPTIONS) go to the DATABASE_REPLICA
+# alias, None to read everything from 'default' (see blog.routers). A client
+# reads from 'default' for DATABASE_REPLICA_LAG seconds after each of its
+# writes, so it sees them. Locally, a copy of the SQLite file can stand in
+# for the replica:
+#
+#     DATABASES['replica'] = {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+#     }
+#     DATABASE_REPLICA = 'replica'
+DATABASE_ROUTERS = ['blog.routers.ReplicaRouter']
+DATABASE_REPLICA = None
+DATABASE_REPLICA_LAG = 5  # seconds
+DATABASE_REPLICA_PIN_SIZE = 4096
+
+# Applied to every new SQLite connection: the write-ahead log lets readers
+# run during a write, NORMAL sync is safe under WAL (only the last commits
+# may be lost on power loss) and reads go through a memory map
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.9/ref/settings/#auth-password-validators
@@ -106,6 +150,26 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# The first hasher hashes new passwords, the others still verify older
+# hashes. A password hashed by another hasher or at another cost is rehashed
+# with the first one on the next login, never all at once: to move to
+# Argon2 (needs argon2-cffi) put blog.hashers.Argon2PasswordHasher first.
+PASSWORD_HASHERS = [
+    'blog.hashers.PBKDF2PasswordHasher',
+    'blog.hashers.Argon2PasswordHasher',
+    'blog.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = 24000
+PASSWORD_BCRYPT_ROUNDS = 12
+PASSWORD_ARGON2_TIME_COST = 2
+PASSWORD_ARGON2_MEMORY_COST = 512  # KiB
+PASSWORD_ARGON2_PARALLELISM = 2
+
+# Threads hashing the passwords of /api/users/bulk: None for one per CPU,
+# 0 to hash in the request's own thread
+PASSWORD_HASHING_THREADS = None
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.9/topics/i18n/
@@ -129,9 +193,83 @@ STATIC_URL = '/static/'
 AUTH_USER_MODEL = 'blog.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    # limit/offset with cached counts (?count=exact|estimated|none), or keyset
+    # pagination with ?pagination=cursor
+    'DEFAULT_PAGINATION_CLASS':
+        'blog.pagination.LimitOffsetOrCursorPagination',
     'PAGE_SIZE': 100,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        # configure the authentication classes properly
+        # same as UserAccesskeyAuthentication + UserSecretkeyAuthentication,
+        # resolving the user once per request
+        'blog.authentication.UserAccesskeySecretkeyAuthentication',
+    ),
+    'DEFAULT_PERMISSION_CLASSES': (
+        'rest_framework.permissions.IsAuthenticated',
+    ),
+    # JSON encoded/decoded with orjson when it is installed, falling back to
+    # the stdlib json module
+    'DEFAULT_RENDERER_CLASSES': (
+        'blog.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'blog.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
+
+# In-process accesskey -> User cache used by the authentication classes.
+# Writes only invalidate it in their own process, so the TTL is how long
+# other processes keep accepting a deactivated user or a rotated key.
+ACCESSKEY_CACHE_SIZE = 1024
+ACCESSKEY_CACHE_TTL = 5  # seconds
+ACCESSKEY_NEGATIVE_CACHE_SIZE = 4096
+ACCESSKEY_NEGATIVE_CACHE_TTL = 30  # seconds
+
+# Secretkeys are verified against an HMAC-SHA256 digest keyed with
+# SECRETKEY_HMAC_KEY, which is required and kept apart from SECRET_KEY:
+# rotating it invalidates every stored digest. With SECRETKEY_STORAGE =
+# 'hmac' the raw secretkey is not written to the database at all.
+SECRETKEY_STORAGE = 'raw'
+# SECURITY WARNING: the key comes from the environment and must stay out
+# of the repository. Never rotate it along with SECRET_KEY!
+SECRETKEY_HMAC_KEY = os.environ.get('SECRETKEY_HMAC_KEY')
+SECRETKEY_VERIFIED_CACHE_SIZE = 1024
+
+# Paginated list counts are cached per model and query, and dropped on any
+# save/delete of the model
+PAGINATION_COUNT_CACHE_SIZE = 1024
+PAGINATION_COUNT_CACHE_TTL = 10  # seconds
+
+# Max items per request on the /api/entries/bulk and /api/users/bulk
+# endpoints
+BULK_MAX_ITEMS = 1000
+
+# Rows read per query by the streaming /api/entries/export endpoint
+EXPORT_CHUNK_SIZE = 1000
+
+
+# Serialize list pages from `.values()` rows
+# (blog.mixins.CompactListModelMixin)
+COMPACT_LIST_SERIALIZERS = True
+
+# Rendered list/detail responses shared by every reader, dropped on writes
+# to the models they render. Backend: 'file' (in RESPONSE_CACHE_DIR, shared
+# by the processes of a host), 'memory' (per process: the others serve
+# their copy until RESPONSE_CACHE_TTL) or None (off).
+# Hits, misses and evictions: /api/metrics/caches
+RESPONSE_CACHE_BACKEND = 'file'
+RESPONSE_CACHE_DIR = os.path.join(BASE_DIR, 'var', 'response_cache')
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL = 60  # seconds
+
+# Threads running the requests served by blog_api_auth/asgi.py. They also
+# bound the database connections in use.
+ASGI_THREADS = 32
+
+# Share of the requests whose timings, queries and SQL time are recorded
+# by blog.instrumentation.InstrumentationMiddleware, and how many of the
+# latest such requests are kept (per process)
+INSTRUMENTATION_SAMPLE_RATE = 0.01
+INSTRUMENTATION_BUFFER_SIZE = 10000
@@ -19,7 +19,9 @@ from django.contrib import admin
 
 from rest_framework import routers
 
-from blog.views import UserViewSet, EntryViewSet, BlogViewSet
+from blog.views import (
+    UserViewSet, EntryViewSet, BlogViewSet, CacheStatsView,
+    RequestStatsView)
 
 
 router = routers.DefaultRouter(trailing_slash=False)
@@ -29,5 +31,9 @@ router.register(r'blogs', BlogViewSet)
 
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
+    url(r'^api/metrics/caches$', CacheStatsView.as_view(),
+        name='cache-stats'),
+    url(r'^api/metrics/requests$', RequestStatsView.as_view(),
+        name='request-stats'),
     url(r'^api/', include(router.urls)),
 ]